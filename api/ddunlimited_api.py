@@ -1,33 +1,65 @@
+import hashlib
 import html as html_lib
 import json
 import os
 import re
+import time
 import unicodedata
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
 from urllib.parse import unquote
-from dataclasses import asdict
+from dataclasses import asdict, replace
 from datetime import datetime, timezone
-from threading import Event, RLock, Thread
+from threading import Event, Lock, RLock, Thread
 from dataclasses import dataclass
+from html.entities import name2codepoint
 from urllib.parse import urljoin, urlparse, parse_qs
 
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from rapidfuzz import fuzz, process
 
 from core import db_core
+from core.cache_core import LRUCache
 
 # ===== CONFIG =====
 DDU_BASE_URL = "https://ddunlimited.net"
 REQUEST_TIMEOUT = 10
+REFRESH_WORKERS = int(os.environ.get("MMC_DDU_REFRESH_WORKERS", "6"))           # pagine lista scaricate in parallelo
+HOST_MIN_INTERVAL = float(os.environ.get("MMC_DDU_HOST_MIN_INTERVAL", "0.5"))  # secondi minimi tra due richieste allo stesso host
+SEARCH_INDEX_CHECK = float(os.environ.get("MMC_DDU_SEARCH_INDEX_CHECK", "5"))  # secondi tra i controlli della versione della cache
+RELEASE_MEMORY_ENTRIES = int(os.environ.get("MMC_DDU_RELEASE_MEMORY_ENTRIES", "256"))  # release con link ed2k tenute in memoria per worker
+RELEASE_MEMORY_TTL = 3600                                                               # secondi in memoria (la copia su PostgreSQL dura di piu)
+PREFETCH_RESULTS = int(os.environ.get("MMC_DDU_PREFETCH_RESULTS", "0"))                # primi risultati di ricerca da precaricare (0 = no)
+PREFETCH_WORKERS = 2
+PARSE_WORKERS = int(os.environ.get("MMC_DDU_PARSE_WORKERS", "0"))             # processi per il parsing delle pagine (0 = nel processo)
 # ==================
 
-_CACHE_FILE = os.path.join("data", "ddunlimited_cache.json")
-_CACHE_LOCK = RLock()
-_CACHE = {
-    "items": {},
-    "updated_at": None,
-    "sources": 0
-}
+SEARCH_INFO_CHARS = 200
+SEARCH_MIN_SCORE = 78
+SEARCH_STOPWORDS = frozenset({
+    "il", "lo", "la", "i", "gli", "le", "un", "una", "uno",
+    "di", "da", "del", "della", "dello", "dei", "degli", "delle",
+    "the", "a", "an", "and", "of"
+})
+
+_COOKIE_FILE = os.path.join("data", "ddunlimited_cookies.json")
+_CLIENT_LOCK = Lock()
+_CLIENT: "DDUClient | None" = None
+
+_SEARCH_LOCK = Lock()
+_SEARCH_STATE = {"index": None, "checked_at": 0.0, "building": False}
+
+_RELEASE_CACHE: LRUCache[dict] = LRUCache(RELEASE_MEMORY_ENTRIES, RELEASE_MEMORY_TTL)
+_PREFETCH_LOCK = Lock()
+_PREFETCH_EXECUTOR: ThreadPoolExecutor | None = None
+_PREFETCH_PENDING: set[str] = set()
+
+_PARSE_POOL_LOCK = Lock()
+_PARSE_POOL: ProcessPoolExecutor | None = None
+_PARSE_POOL_PID: int | None = None
 
 _REFRESH_LOCK = RLock()
 _REFRESH_STATE = {
@@ -36,6 +68,9 @@ _REFRESH_STATE = {
     "processed_sources": 0,
     "current_source": None,
     "items_count": 0,
+    "changed_sources": 0,
+    "unchanged_sources": 0,
+    "failed_sources": 0,
     "started_at": None,
     "updated_at": None,
     "cancelled": False,
@@ -45,6 +80,33 @@ _CANCEL_EVENT = Event()
 _REFRESH_THREAD: Thread | None = None
 
 
+class _HostRateLimiter:
+    """Spaces requests to the same host at least `min_interval` seconds apart, across threads."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = max(0.0, min_interval)
+        self._lock = Lock()
+        self._next_slot: dict[str, float] = {}
+
+    def acquire(self, url: str, cancel: Event | None = None) -> bool:
+        """Wait for this host's next slot; returns False if `cancel` is set meanwhile."""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - time.monotonic()
+        if delay <= 0:
+            return not (cancel and cancel.is_set())
+        if cancel is None:
+            time.sleep(delay)
+            return True
+        return not cancel.wait(delay)
+
+
+_HOST_LIMITER = _HostRateLimiter(HOST_MIN_INTERVAL)
+
+
 @dataclass
 class DDUListSource:
     name: str
@@ -53,6 +115,16 @@ class DDUListSource:
     category: str | None = None
     quality: str | None = None
     language: str | None = None
+    id: int | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+    content_hash: str | None = None
+    items_signature: str | None = None
+    last_count: int | None = None
+
+    def signature(self) -> str:
+        """Fields copied into the parsed items: if one changes the page must be parsed again."""
+        return json.dumps([self.url, self.name, self.media_type, self.category, self.quality, self.language])
 
 
 @dataclass
@@ -94,29 +166,151 @@ def ddu_get_sources(db: db_core.MediaDB | None = None) -> list[DDUListSource]:
             media_type=row.get("media_type"),
             category=row.get("category"),
             quality=row.get("quality"),
-            language=row.get("language")
+            language=row.get("language"),
+            id=row.get("id"),
+            etag=row.get("etag"),
+            last_modified=row.get("last_modified"),
+            content_hash=row.get("content_hash"),
+            items_signature=row.get("items_signature"),
+            last_count=row.get("last_count")
         ))
     return sources
 
 
-def _build_session(db: db_core.MediaDB | None = None) -> tuple[requests.Session, dict]:
-    cfg = _get_config(db)
-    session = requests.Session()
-    session.headers.update({"User-Agent": "MyMediaCollection/1.0"})
-    username = cfg["username"]
-    password = cfg["password"]
-    if username and password:
-        login_url = f"{cfg['base_url']}/ucp.php?mode=login"
+class DDUClient:
+    """
+    Long-lived DDUnlimited HTTP client shared by every thread of the worker.
+
+    Connections are pooled and the login cookies are saved to _COOKIE_FILE, so a
+    restart reuses the forum session. A page served to a logged-out visitor triggers
+    one login (serialized across threads) and a retry of the request.
+    """
+
+    def __init__(self, base_url: str, username: str, password: str):
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": "MyMediaCollection/1.0"})
+        adapter = HTTPAdapter(pool_connections=REFRESH_WORKERS, pool_maxsize=REFRESH_WORKERS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._login_lock = Lock()
+        self._login_generation = 0
+        self._load_cookies()
+
+    @property
+    def has_credentials(self) -> bool:
+        return bool(self.username and self.password)
+
+    def _load_cookies(self) -> None:
+        if not os.path.exists(_COOKIE_FILE):
+            return
+        try:
+            with open(_COOKIE_FILE, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        # Cookie di un altro account o di un altro indirizzo: non riutilizzabili
+        if payload.get("base_url") != self.base_url or payload.get("username") != self.username:
+            return
+        for cookie in payload.get("cookies", []):
+            try:
+                self.session.cookies.set(
+                    cookie["name"],
+                    cookie["value"],
+                    domain=cookie.get("domain"),
+                    path=cookie.get("path") or "/",
+                    expires=cookie.get("expires"),
+                    secure=bool(cookie.get("secure"))
+                )
+            except (KeyError, TypeError):
+                continue
+
+    def _save_cookies(self) -> None:
         payload = {
-            "username": username,
-            "password": password,
+            "base_url": self.base_url,
+            "username": self.username,
+            "cookies": [
+                {
+                    "name": cookie.name,
+                    "value": cookie.value,
+                    "domain": cookie.domain,
+                    "path": cookie.path,
+                    "expires": cookie.expires,
+                    "secure": cookie.secure
+                }
+                for cookie in self.session.cookies
+            ]
+        }
+        try:
+            os.makedirs(os.path.dirname(_COOKIE_FILE), exist_ok=True)
+            # Cookie di sessione: leggibili solo dall'utente del processo
+            fd = os.open(_COOKIE_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+        except OSError as exc:
+            print(f"DDU cookie save failed: {exc}")
+
+    def login(self) -> bool:
+        if not self.has_credentials:
+            return False
+        payload = {
+            "username": self.username,
+            "password": self.password,
+            "autologin": "on",
             "login": "Login"
         }
         try:
-            session.post(login_url, data=payload, timeout=REQUEST_TIMEOUT)
-        except Exception:
-            pass
-    return session, cfg
+            r = self.session.post(f"{self.base_url}/ucp.php?mode=login", data=payload, timeout=REQUEST_TIMEOUT)
+        except Exception as exc:
+            print(f"DDU login failed: {exc}")
+            return False
+        self._save_cookies()
+        return not _is_logged_out(r)
+
+    def _relogin(self, generation: int) -> None:
+        with self._login_lock:
+            # Un altro thread ha gia rifatto il login mentre si aspettava il lock
+            if self._login_generation != generation:
+                return
+            self.login()
+            self._login_generation += 1
+
+    def get(self, url: str, headers: dict | None = None) -> requests.Response:
+        generation = self._login_generation
+        if self.has_credentials and generation == 0 and not self.session.cookies:
+            # Nessun cookie salvato: inutile scaricare la pagina da anonimi
+            self._relogin(generation)
+            generation = self._login_generation
+        r = self.session.get(url, timeout=REQUEST_TIMEOUT, headers=headers)
+        if self.has_credentials and r.status_code == 200 and _is_logged_out(r):
+            self._relogin(generation)
+            r = self.session.get(url, timeout=REQUEST_TIMEOUT, headers=headers)
+        return r
+
+
+def _is_logged_out(r: requests.Response) -> bool:
+    """phpBB pages show the logout link only to logged-in users."""
+    if "mode=login" in r.url:
+        return True
+    text = r.text
+    return "mode=logout" not in text and "mode=login" in text
+
+
+def _get_client(db: db_core.MediaDB | None = None) -> DDUClient:
+    """Shared client for the current DDUnlimited configuration (rebuilt when it changes)."""
+    global _CLIENT
+    cfg = _get_config(db)
+    with _CLIENT_LOCK:
+        client = _CLIENT
+        if client is None or (client.base_url, client.username, client.password) != (
+            cfg["base_url"], cfg["username"], cfg["password"]
+        ):
+            # Il client precedente non si chiude: altri thread potrebbero ancora usarlo
+            client = DDUClient(cfg["base_url"], cfg["username"], cfg["password"])
+            _CLIENT = client
+    return client
 
 
 def ddu_test_connection(
@@ -154,13 +348,50 @@ def ddu_test_connection(
         return False, f"DDUnlimited error: {exc}"
 
 
-def _fetch_html(url: str, session: requests.Session) -> str:
-    r = session.get(url, timeout=REQUEST_TIMEOUT)
+def _fetch_html(url: str, client: DDUClient) -> str:
+    r = client.get(url)
     r.raise_for_status()
     return r.text
 
 
+def _fetch_list_page(source: DDUListSource, client: DDUClient, conditional: bool) -> dict:
+    """
+    GET of one list page, conditional on the stored ETag/Last-Modified when `conditional`.
+    Returns {"modified": False} on 304, otherwise the html with its validators and sha256.
+    """
+    headers = {}
+    if conditional:
+        if source.etag:
+            headers["If-None-Match"] = source.etag
+        if source.last_modified:
+            headers["If-Modified-Since"] = source.last_modified
+    r = client.get(source.url, headers=headers or None)
+    if r.status_code == 304 and headers:
+        return {"modified": False}
+    r.raise_for_status()
+    return {
+        "modified": True,
+        "html": r.text,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "content_hash": hashlib.sha256(r.content).hexdigest()
+    }
+
+
+# Caratteri che urlparse/parse_qs ripuliscono o decodificano (o che possono far fallire urlparse)
+_URL_SLOW_CHARS_RE = re.compile(r"[%+\[\]\t\r\n]")
+_URL_SPACE_RE = re.compile(r"[\t\r\n]")
+
+
 def _extract_topic_id(url: str) -> str | None:
+    if url[:1] > " " and not _URL_SLOW_CHARS_RE.search(url):
+        # Niente da decodificare o ripulire: stessa lettura di parse_qs, senza urlparse
+        query = url.partition("#")[0].partition("?")[2]
+        for pair in query.split("&"):
+            name, _, value = pair.partition("=")
+            if name == "t" and value:
+                return value
+        return None
     parsed = urlparse(url)
     qs = parse_qs(parsed.query)
     topic_vals = qs.get("t")
@@ -169,10 +400,110 @@ def _extract_topic_id(url: str) -> str | None:
     return None
 
 
+_YEAR_RE = re.compile(r"\b(19\d{2}|20\d{2})\b")
+# In ordine di priorita: vince la prima parola presente nel testo, non la piu a sinistra
+_QUALITY_WORDS = (
+    "2160p", "1080p", "720p", "480p", "BDRIP", r"BLU[-\s]?RAY", "WEBRIP", "WEB",
+    "HD", "SD", "MUX", "RIP", "FOUND", "DVD", "HDTV", "DVB"
+)
+_QUALITY_RE = re.compile(r"\b(?:" + "|".join(f"({word})" for word in _QUALITY_WORDS) + r")\b")
+
+# Scansione dei tag che riproduce html.parser + BeautifulSoup (pagine lista e post).
+# Attributi di un tag fino al ">" fuori dalle virgolette, scritto "srotolato" perche un
+# tag senza chiusura non faccia esplodere il backtracking
+_HTML_ATTRS = r"""[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*"""
+# Markup che html.parser interpreta a modo suo: tag di chiusura senza una lettera dopo
+# "</" e "/" finale che potrebbe appartenere a un valore senza virgolette (<div class=x/>)
+_LOOSE_ENDTAG_RE = re.compile(r"</(?![a-zA-Z])")
+_UNQUOTED_SLASH_RE = re.compile(r"""=\s*(?:[^\s"']\S*)?/$""")
+# Elementi vuoti di BeautifulSoup: chiusi subito, non entrano nello stack
+_VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem",
+    "meta", "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame",
+    "image", "isindex", "nextid", "spacer"
+})
+# Fine del contenuto CDATA di script/style, cercata una volta sola da _tag_tokens
+_CDATA_END_RES = {name: re.compile(rf"</{name}\s*>", re.IGNORECASE) for name in ("script", "style")}
+
+
+def _tag_tokens(token_re: re.Pattern, html: str, comment_end_re: re.Pattern, markup_re: re.Pattern | None = None):
+    """
+    (match, end) of the tokens of `token_re` in document order. Comments (group 1) and
+    script/style (group 2) match only their opening: the end is found with one search,
+    so an unterminated one costs a single scan instead of one per later "<". The scan
+    stops after yielding end=None for a comment or script/style without its end.
+    With `markup_re`, every match of it must start a token: the first one that does not
+    yields (None, None) and stops the scan, instead of retrying at every later "<".
+    """
+    pos = 0
+    while True:
+        if markup_re is None:
+            match = token_re.search(html, pos)
+        else:
+            start = markup_re.search(html, pos)
+            match = token_re.match(html, start.start()) if start else None
+            if start is not None and match is None:
+                yield None, None
+                return
+        if match is None:
+            return
+        end = match.end()
+        if match.group(1):
+            close = comment_end_re.search(html, end)
+            end = close.end() if close else None
+        elif match.group(2):
+            close = _CDATA_END_RES[match.group(2).lower()].search(html, end)
+            end = close.end() if close else None
+        yield match, end
+        if end is None:
+            return
+        pos = end
+
+
+# Token delle pagine lista: apertura di commenti e script/style (la fine la cerca
+# _tag_tokens), dichiarazioni, processing instruction e tag di apertura/chiusura, <br>
+# compresi. Le sezioni <![CDATA[ ]]> fuori dagli script restano nel testo e fanno usare BeautifulSoup
+_LIST_TOKEN_RE = re.compile(
+    r"""<(?:(!--)|!(?!--|\[)[^>]*>|\?[^>]*>"""
+    r"""|(script|style)\b""" + _HTML_ATTRS + r"""(?<!/)>"""
+    r"""|(/?)([a-zA-Z][^\s/<>]*)((?:[\s/]""" + _HTML_ATTRS + r""")?)>)""",
+    re.IGNORECASE
+)
+# Fine dei commenti delle pagine lista: html.parser accetta anche "-- >"
+_LIST_COMMENT_END_RE = re.compile(r"--\s*>")
+# "<" seguito da uno di questi caratteri e markup per html.parser: nel testo tra due token
+# vuol dire un tag che la scansione non ha riconosciuto
+_MARKUP_START_RE = re.compile(r"<[a-zA-Z/!?]")
+# Attributi come li legge html.parser (attrfind_tolerant): le virgolette contano solo dopo "="
+_PARSER_ATTR = r"""((?<=['"\s/])[^\s/>][^\s/=>]*)(\s*=+\s*('[^']*'|"[^"]*"|(?!['"])[^>\s]*))?(?:\s|/(?!>))*"""
+_PARSER_ATTR_RE = re.compile(r"[\s/]*" + _PARSER_ATTR)
+_PARSER_ATTRS_RE = re.compile(r"[\s/]*+(?:" + _PARSER_ATTR + r")*+")
+_ASCII_SPACES = " \n\t\x0c\r"
+# Riferimenti nel testo: nomi HTML 4 o codici con ";", gli altri li decide BeautifulSoup
+_TEXT_REF_RE = re.compile(r"&(?:([a-zA-Z][a-zA-Z0-9]*);|#([0-9]{1,7});|#[xX]([0-9a-fA-F]{1,6});|(?=[#a-zA-Z]))")
+
+
+def _join_url(base: str, href: str, joined: dict[str, str]) -> str:
+    """
+    urljoin(base, href), resolving the path part once per page: for a relative href
+    with a query and no fragment urljoin only appends "?query" to the joined path.
+    """
+    path, sep, query = href.partition("?")
+    if (
+        not sep or not path or not query or path.startswith("//") or ":" in path or "#" in href
+        or href[:1] <= " " or _URL_SPACE_RE.search(href)
+    ):
+        return urljoin(base, href)
+    resolved = joined.get(path)
+    if resolved is None:
+        resolved = joined[path] = urljoin(base, path)
+    return f"{resolved}?{query}"
+
+
 def _parse_year(title: str) -> int | None:
     if not title:
         return None
-    match = re.search(r"\b(19\d{2}|20\d{2})\b", title)
+    match = _YEAR_RE.search(title)
     if match:
         try:
             return int(match.group(1))
@@ -185,17 +516,17 @@ def _parse_language(text: str | None) -> str | None:
     if not text:
         return None
     upper = text.upper()
-    if "ITA" in upper and "ENG" in upper and "JPN" in upper:
-        return "ITA-ENG-JPN"
-    if "ITA" in upper and "JPN" in upper:
-        return "ITA-JPN"
-    if "ITA" in upper and "ENG" in upper:
-        return "ITA-ENG"
-    if "ITALIANO" in upper or "ITA" in upper:
-        return "ITA"
-    if "INGLESE" in upper or "ENG" in upper:
+    # Ogni sigla cercata una volta sola ("ITALIANO" contiene gia "ITA")
+    ita = "ITA" in upper
+    eng = "ENG" in upper
+    jpn = "JPN" in upper
+    if ita:
+        if jpn:
+            return "ITA-ENG-JPN" if eng else "ITA-JPN"
+        return "ITA-ENG" if eng else "ITA"
+    if eng or "INGLESE" in upper:
         return "ENG"
-    if "JPN" in upper or "JAP" in upper:
+    if jpn or "JAP" in upper:
         return "JPN"
     return None
 
@@ -203,71 +534,228 @@ def _parse_language(text: str | None) -> str | None:
 def _parse_quality(text: str | None) -> str | None:
     if not text:
         return None
-    patterns = [
-        r"\b2160p\b",
-        r"\b1080p\b",
-        r"\b720p\b",
-        r"\b480p\b",
-        r"\bBDRIP\b",
-        r"\bBLU[-\s]?RAY\b",
-        r"\bWEBRIP\b",
-        r"\bWEB\b",
-        r"\bHD\b",
-        r"\bSD\b",
-        r"\bMUX\b",
-        r"\bRIP\b",
-        r"\bFOUND\b",
-        r"\bDVD\b",
-        r"\bHDTV\b",
-        r"\bDVB\b"
+    best = None
+    for match in _QUALITY_RE.finditer(text.upper()):
+        if best is None or match.lastindex < best.lastindex:
+            best = match
+            if best.lastindex == 1:
+                break
+    if best is None:
+        return None
+    return best.group(0).replace(" ", "")
+
+
+def _safe_charref(code: int) -> bool:
+    # Codici che BeautifulSoup e html.unescape traducono nello stesso carattere
+    return (
+        code in (9, 10, 13)
+        or 32 <= code <= 126
+        or 128 <= code <= 0xD7FF
+        or 0xE000 <= code <= 0xFDCF
+        or 0xFDF0 <= code <= 0xFFFD
+        or (0x10000 <= code <= 0x10FFFF and code & 0xFFFE != 0xFFFE)
+    )
+
+
+def _list_text(raw: str) -> str | None:
+    """Text between two tags decoded as BeautifulSoup would, None if html.unescape could differ."""
+    if "&" not in raw:
+        return raw
+    for match in _TEXT_REF_RE.finditer(raw):
+        name, decimal, hexadecimal = match.group(1, 2, 3)
+        if name is not None:
+            if name not in name2codepoint:
+                return None
+        elif decimal is not None or hexadecimal is not None:
+            if not _safe_charref(int(decimal) if decimal is not None else int(hexadecimal, 16)):
+                return None
+        else:
+            return None
+    return html_lib.unescape(raw)
+
+
+def _parser_tag_end(html: str, start: int, end: int) -> bool:
+    # Vero se html.parser chiude il tag allo stesso ">" della scansione
+    match = _PARSER_ATTRS_RE.match(html, start, end)
+    return html[match.end():end].strip() in ("", "/")
+
+
+def _parser_attrs(html: str, start: int, end: int) -> dict[str, str] | None:
+    """
+    Attributes in html[start:end] as html.parser reads them, with BeautifulSoup's
+    defaults (no value -> "", the last duplicate wins). None if html.parser would not
+    end the tag where the scan did.
+    """
+    if not _parser_tag_end(html, start, end):
+        return None
+    attrs = {}
+    for name, rest, value in _PARSER_ATTR_RE.findall(html, start, end):
+        if not rest:
+            value = None
+        elif value[:1] == "'" == value[-1:] or value[:1] == '"' == value[-1:]:
+            value = value[1:-1]
+        attrs[name.lower()] = html_lib.unescape(value) if value else ""
+    return attrs
+
+
+def _read_list_text(html: str, start: int, end: int, names: list[str], reading: list[list], anchors: list) -> bool:
+    # Testo tra due token, aggiunto alle ancore in lettura; False se html.parser ci vedrebbe
+    # markup o BeautifulSoup decodificherebbe i riferimenti in altro modo
+    if html.find("<", start, end) >= 0 and _MARKUP_START_RE.search(html, start, end):
+        return False
+    if not reading:
+        return True
+    text = _list_text(html[start:end])
+    if text is None:
+        return False
+    if not text.strip(_ASCII_SPACES) and "pre" not in names and "textarea" not in names:
+        # BeautifulSoup riduce le stringhe di soli spazi a un "\n" o a uno spazio
+        text = "\n" if "\n" in text else " "
+    for _, inside, index in reading:
+        anchors[index][1 if inside else 2].append(text)
+    return True
+
+
+def _scan_list_anchors(html: str) -> list[tuple[str, str, str | None]] | None:
+    """
+    (href, text, info) of every `a.postlink-local` with an href, in document order: the
+    anchor text and the words of the following siblings up to the first <br>, as read
+    from the html.parser + BeautifulSoup tree. One pass over the tags, without building
+    the tree; None when the page has markup the scan does not reproduce.
+    """
+    if _LOOSE_ENDTAG_RE.search(html):
+        return None
+    anchors: list[tuple[str, list[str], list[str]]] = []
+    # Ancore di cui si sta leggendo il testo o i fratelli: [indice nello stack, dentro l'ancora, indice in anchors]
+    reading: list[list] = []
+    names: list[str] = []
+    checked: dict[str, bool] = {}
+    pos = 0
+    for match, end in _tag_tokens(_LIST_TOKEN_RE, html, _LIST_COMMENT_END_RE, _MARKUP_START_RE):
+        if end is None:
+            # Tag non riconosciuto, o commento e script senza chiusura: decide html.parser
+            return None
+        start = match.start()
+        if pos < start and not _read_list_text(html, pos, start, names, reading, anchors):
+            return None
+        pos = end
+        closing, name, attrs = match.group(3, 4, 5)
+        if name is None:
+            # Commenti, dichiarazioni e script: BeautifulSoup li tratta a parte nel testo
+            if reading:
+                return None
+            continue
+        name = name.lower()
+        if closing:
+            # html.parser chiude il tag al primo ">", anche tra virgolette
+            if "'" in attrs or '"' in attrs:
+                return None
+            if names and names[-1] == name:
+                depth = len(names) - 1
+            elif name in names:
+                depth = len(names) - 1 - names[::-1].index(name)
+            else:
+                continue
+            if reading:
+                # Chiuso il genitore: finiti i fratelli. Chiusa l'ancora: si passa ai fratelli
+                reading = [entry for entry in reading if depth >= entry[0]]
+                for entry in reading:
+                    if depth == entry[0]:
+                        entry[1] = False
+            del names[depth:]
+            continue
+        if name == "br":
+            if reading:
+                level = len(names)
+                reading = [entry for entry in reading if entry[1] or entry[0] != level]
+            continue
+        values = None
+        if name == "a" and ("postlink-local" in attrs or "&" in attrs):
+            values = _parser_attrs(html, match.start(5), match.end(5))
+            if values is None:
+                return None
+        elif "'" in attrs or '"' in attrs:
+            # I tag di formattazione si ripetono uguali: ognuno verificato una volta
+            valid = checked.get(attrs)
+            if valid is None:
+                valid = checked[attrs] = _parser_tag_end(attrs, 0, len(attrs))
+            if not valid:
+                return None
+        entry = None
+        if values is not None and "href" in values and "postlink-local" in values.get("class", "").split():
+            anchors.append((values["href"], [], []))
+            entry = [len(names), True, len(anchors) - 1]
+        if name in _VOID_TAGS:
+            continue
+        if attrs.endswith("/"):
+            if _UNQUOTED_SLASH_RE.search(attrs):
+                return None
+            if entry is not None:
+                # <a/> vuota: subito chiusa, restano i fratelli
+                entry[1] = False
+                reading.append(entry)
+            continue
+        names.append(name)
+        if entry is not None:
+            reading.append(entry)
+    if pos < len(html) and not _read_list_text(html, pos, len(html), names, reading, anchors):
+        return None
+    return [
+        (href, "".join(text), " ".join(" ".join(info).split()) or None)
+        for href, text, info in anchors
     ]
-    upper = text.upper()
-    for pat in patterns:
-        match = re.search(pat, upper)
-        if match:
-            return match.group(0).replace(" ", "")
-    return None
 
 
-def parse_list_page(html: str, source: DDUListSource, base_url: str) -> list[DDUItem]:
+def _soup_info_text(anchor_tag) -> str | None:
+    parts = []
+    for sibling in anchor_tag.next_siblings:
+        if getattr(sibling, "name", None) == "br":
+            break
+        if isinstance(sibling, str):
+            parts.append(sibling)
+            continue
+        text = sibling.get_text(" ", strip=True)
+        if text:
+            parts.append(text)
+    info = " ".join(" ".join(parts).split()).strip()
+    return info or None
+
+
+def _soup_list_anchors(html: str) -> list[tuple[str, str, str | None]]:
+    # Stessi dati dall'albero di BeautifulSoup, per il markup che la scansione non riproduce
     soup = BeautifulSoup(html, "html.parser")
+    return [
+        (anchor.get("href") or "", anchor.get_text() or "", _soup_info_text(anchor))
+        for anchor in soup.find_all("a", href=True, class_="postlink-local")
+    ]
+
+
+def parse_list_page(html: str, source: DDUListSource, base_url: str) -> list[DDUItem]:
+    anchors = _scan_list_anchors(html)
+    if anchors is None:
+        anchors = _soup_list_anchors(html)
     items: list[DDUItem] = []
     seen_topics = set()
+    joined: dict[str, str] = {}
 
-    def _extract_info_text(anchor_tag) -> str | None:
-        parts = []
-        for sibling in anchor_tag.next_siblings:
-            if getattr(sibling, "name", None) == "br":
-                break
-            if isinstance(sibling, str):
-                parts.append(sibling)
-                continue
-            text = sibling.get_text(" ", strip=True)
-            if text:
-                parts.append(text)
-        info = " ".join(" ".join(parts).split()).strip()
-        return info or None
-
-    for anchor in soup.find_all("a", href=True, class_="postlink-local"):
-        href = anchor.get("href") or ""
+    for href, text, info_text in anchors:
         if href.startswith("#"):
             continue
         if "viewtopic.php" not in href or "t=" not in href:
             continue
-        title = (anchor.get_text() or "").strip()
+        title = text.strip()
         if not title or len(title) < 3:
             continue
         if title.lower().startswith("lista"):
             continue
 
-        detail_url = urljoin(base_url + "/", href)
+        detail_url = _join_url(base_url + "/", href, joined)
         topic_id = _extract_topic_id(detail_url)
         if topic_id and topic_id in seen_topics:
             continue
         if topic_id:
             seen_topics.add(topic_id)
 
-        info_text = _extract_info_text(anchor)
         quality = source.quality or _parse_quality(info_text)
         language = source.language or _parse_language(info_text)
         year = _parse_year(title)
@@ -288,8 +776,88 @@ def parse_list_page(html: str, source: DDUListSource, base_url: str) -> list[DDU
     return items
 
 
+# ----- parsing in processi separati -----
+
+def _parse_pool() -> ProcessPoolExecutor | None:
+    global _PARSE_POOL, _PARSE_POOL_PID
+    if PARSE_WORKERS <= 0:
+        return None
+    pid = os.getpid()
+    with _PARSE_POOL_LOCK:
+        # Creato al primo uso (dopo il fork dei worker), uno per processo. "spawn": i
+        # processi figli non ereditano lock e thread del worker
+        if _PARSE_POOL is None or _PARSE_POOL_PID != pid:
+            _PARSE_POOL = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=get_context("spawn"))
+            _PARSE_POOL_PID = pid
+        return _PARSE_POOL
+
+
+def _drop_parse_pool(exc: Exception) -> None:
+    global _PARSE_POOL
+    print(f"DDU parse pool non disponibile, parsing nel processo: {exc}")
+    with _PARSE_POOL_LOCK:
+        pool, _PARSE_POOL = _PARSE_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit_parse(fn, *args) -> Future | None:
+    """Queue fn(*args) on the parse pool; None when the pool is disabled or unusable."""
+    try:
+        pool = _parse_pool()
+        return pool.submit(fn, *args) if pool is not None else None
+    except (BrokenProcessPool, RuntimeError, OSError) as exc:
+        _drop_parse_pool(exc)
+        return None
+
+
+def _parse_result(future: Future | None, fn, *args):
+    """Result of a queued parse, or fn(*args) in this thread if it was not queued or the pool broke."""
+    if future is not None:
+        try:
+            return future.result()
+        except BrokenProcessPool as exc:
+            _drop_parse_pool(exc)
+    return fn(*args)
+
+
+def _list_page_tuples(html: str, source: DDUListSource, base_url: str) -> list[tuple]:
+    # Eseguita nel pool: solo i campi letti dalla pagina, quelli della sorgente li rimette il chiamante
+    return [
+        (item.title, item.detail_url, item.topic_id, item.info, item.quality, item.language, item.year)
+        for item in parse_list_page(html, source, base_url)
+    ]
+
+
+def _items_from_tuples(rows: list[tuple], source: DDUListSource) -> list[DDUItem]:
+    return [
+        DDUItem(
+            title=title,
+            detail_url=detail_url,
+            topic_id=topic_id,
+            info=info,
+            quality=quality,
+            language=language,
+            media_type=source.media_type,
+            category=source.category,
+            year=year,
+            source_name=source.name
+        )
+        for title, detail_url, topic_id, info, quality, language, year in rows
+    ]
+
+
+def parse_list_page_pooled(html: str, source: DDUListSource, base_url: str) -> list[DDUItem]:
+    """
+    parse_list_page run in the parse pool when MMC_DDU_PARSE_WORKERS is set, so a big
+    page does not hold the GIL of the worker serving requests; in this thread otherwise.
+    """
+    future = _submit_parse(_list_page_tuples, html, source, base_url)
+    return _items_from_tuples(_parse_result(future, _list_page_tuples, html, source, base_url), source)
+
+
 def search_lists(query: str, db: db_core.MediaDB | None = None, max_results: int = 200) -> list[DDUItem]:
-    return search_cache(query, max_results=max_results)
+    return search_cache(query, db, max_results=max_results)
 
 
 def _merge_item(existing: DDUItem, incoming: DDUItem) -> DDUItem:
@@ -311,7 +879,222 @@ def _merge_item(existing: DDUItem, incoming: DDUItem) -> DDUItem:
             existing.source_name = incoming.source_name
     return existing
 
-def start_refresh(db: db_core.MediaDB | None = None) -> dict:
+
+def _normalize_search(value: str | None) -> str:
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(ch for ch in value.lower() if ch.isalnum() or ch.isspace())
+    return " ".join(value.split())
+
+
+def _item_key(item: DDUItem) -> str:
+    return item.detail_url or (item.topic_id or "")
+
+
+def _row_hash(payload) -> str:
+    data = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.md5(data.encode("utf-8")).hexdigest()
+
+
+def _source_rows(items: list[DDUItem]) -> list[dict]:
+    """
+    ddunlimited_source_items rows of one parsed page, one per item in page order. Repeated
+    keys are kept as they are: _merge_sources folds them with the other sources in one pass.
+    """
+    rows = []
+    for item in items:
+        key = _item_key(item)
+        if not key:
+            continue
+        data = asdict(item)
+        rows.append({"item_key": key, "position": len(rows), "data": data, "row_hash": _row_hash([key, data])})
+    return rows
+
+
+def _merge_sources(item_lists: list[list[DDUItem]]) -> dict[str, DDUItem]:
+    """Merged cache built from the per-source lists, in source order."""
+    merged: dict[str, DDUItem] = {}
+    for items in item_lists:
+        for item in items:
+            key = _item_key(item)
+            if not key:
+                continue
+            existing = merged.get(key)
+            if not existing:
+                # Copia: _merge_item modifica l'elemento, la lista della sorgente resta intatta
+                merged[key] = replace(item)
+            else:
+                merged[key] = _merge_item(existing, item)
+    return merged
+
+
+def _search_text(item: DDUItem) -> str:
+    text = _normalize_search(item.title or "")
+    if item.info:
+        text = f"{text} {_normalize_search(item.info[:SEARCH_INFO_CHARS])}"
+    return text
+
+
+def _trigrams(word: str) -> set[str]:
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class _SearchIndex:
+    """
+    Inverted index of the merged cache search texts, kept in memory by each worker.
+
+    Built from the (item_key, search_text) rows of ddunlimited_items, tagged with the
+    items_version it was read at. Words map to the ids of the rows containing them, and
+    the trigrams of the vocabulary map to words, so a query token matches as a substring
+    of any word like the LIKE filter, without touching the rows that cannot match.
+    """
+
+    def __init__(self, rows: list[tuple[str, str]], version: int | None):
+        self.version = version
+        self.keys: list[str] = []
+        self.texts: list[str] = []
+        self.postings: dict[str, list[int]] = {}
+        self.grams: dict[str, list[str]] = {}
+        for item_id, (key, text) in enumerate(rows):
+            self.keys.append(key)
+            self.texts.append(text)
+            for word in set(text.split()):
+                posting = self.postings.get(word)
+                if posting is None:
+                    self.postings[word] = [item_id]
+                    for gram in _trigrams(word):
+                        self.grams.setdefault(gram, []).append(word)
+                else:
+                    posting.append(item_id)
+
+    def _words_containing(self, token: str) -> list[str]:
+        if len(token) < 3:
+            # Nessun trigramma: si scorre il vocabolario (parole distinte, non elementi)
+            return [word for word in self.postings if token in word]
+        lists = [self.grams.get(gram) for gram in _trigrams(token)]
+        if not all(lists):
+            return []
+        lists.sort(key=len)
+        return [word for word in lists[0] if token in word]
+
+    def candidates(self, tokens: list[str]) -> list[tuple[str, str]]:
+        """(item_key, search_text) of the rows containing every token, in merge order."""
+        result: set[int] | None = None
+        # Prima i token lunghi, piu selettivi; quelli corti si verificano sul testo
+        for token in sorted(set(tokens), key=len, reverse=True):
+            if result is not None and (len(token) < 3 or len(result) < 64):
+                texts = self.texts
+                result = {item_id for item_id in result if token in texts[item_id]}
+            else:
+                ids: set[int] = set()
+                for word in self._words_containing(token):
+                    ids.update(self.postings[word])
+                result = ids if result is None else result & ids
+            if not result:
+                return []
+        return [(self.keys[item_id], self.texts[item_id]) for item_id in sorted(result or ())]
+
+
+def _build_search_index(db: db_core.MediaDB) -> None:
+    index = None
+    try:
+        with db.connection():
+            version, rows = db.get_ddunlimited_search_texts()
+        index = _SearchIndex(rows, version)
+    except Exception as exc:
+        print(f"Error building DDU search index: {exc}")
+    with _SEARCH_LOCK:
+        if index is not None:
+            _SEARCH_STATE["index"] = index
+        _SEARCH_STATE["building"] = False
+
+
+def _get_search_index(db: db_core.MediaDB) -> _SearchIndex | None:
+    """
+    Search index of this worker, None until its first build completes. The cache version
+    is read at most every SEARCH_INDEX_CHECK seconds; when it changed the index is rebuilt
+    in background and searches keep using the previous one meanwhile.
+    """
+    now = time.monotonic()
+    with _SEARCH_LOCK:
+        index = _SEARCH_STATE["index"]
+        if _SEARCH_STATE["building"] or now - _SEARCH_STATE["checked_at"] < SEARCH_INDEX_CHECK:
+            return index
+        _SEARCH_STATE["checked_at"] = now
+    version = db.get_ddunlimited_items_version()
+    if index is not None and (version is None or version == index.version):
+        return index
+    with _SEARCH_LOCK:
+        if _SEARCH_STATE["building"]:
+            return index
+        _SEARCH_STATE["building"] = True
+    Thread(target=_build_search_index, args=(db,), name="ddu-search-index", daemon=True).start()
+    return index
+
+
+def _cache_rows(merged: dict[str, DDUItem]) -> list[dict]:
+    """ddunlimited_items rows of the merged cache, position = merge order."""
+    rows = []
+    for position, (key, item) in enumerate(merged.items()):
+        row = {
+            "item_key": key,
+            "position": position,
+            "title": item.title,
+            "detail_url": item.detail_url,
+            "topic_id": item.topic_id,
+            "info": item.info,
+            "quality": item.quality,
+            "language": item.language,
+            "media_type": item.media_type,
+            "category": item.category,
+            "year": item.year,
+            "source_name": item.source_name,
+            "search_text": _search_text(item)
+        }
+        row["row_hash"] = _row_hash([row.get(column) for column in db_core.DDU_ITEM_COLUMNS])
+        rows.append(row)
+    return rows
+
+
+def _item_from_row(row: dict) -> DDUItem:
+    return DDUItem(
+        title=row["title"],
+        detail_url=row["detail_url"],
+        topic_id=row["topic_id"],
+        info=row["info"],
+        quality=row["quality"],
+        language=row["language"],
+        media_type=row["media_type"],
+        category=row["category"],
+        year=row["year"],
+        source_name=row["source_name"]
+    )
+
+
+def _rebuild_cache(db: db_core.MediaDB, sources: list[DDUListSource]) -> dict[str, int]:
+    """Merge the stored items of `sources` (in order) into ddunlimited_items."""
+    source_ids = [source.id for source in sources]
+    stored = db.get_ddunlimited_source_items(source_ids)
+    item_lists = []
+    for source_id in source_ids:
+        items = []
+        for data in stored.get(source_id, []):
+            try:
+                items.append(DDUItem(**data))
+            except TypeError:
+                continue
+        item_lists.append(items)
+    return db.sync_ddunlimited_items(_cache_rows(_merge_sources(item_lists)), source_ids)
+
+
+def start_refresh(db: db_core.MediaDB | None = None, force: bool = False) -> dict:
+    """
+    Refresh the list cache in a background thread. Pages are requested with the stored
+    ETag/Last-Modified and skipped when unchanged (304, same sha256 or same items); the
+    merged cache is rebuilt only if at least one source changed. `force` re-downloads
+    and re-parses every page.
+    """
     if db is None:
         return {"ok": False, "error": "missing_db"}
     global _REFRESH_THREAD
@@ -325,6 +1108,9 @@ def start_refresh(db: db_core.MediaDB | None = None) -> dict:
             "processed_sources": 0,
             "current_source": None,
             "items_count": 0,
+            "changed_sources": 0,
+            "unchanged_sources": 0,
+            "failed_sources": 0,
             "started_at": datetime.now(timezone.utc),
             "updated_at": None,
             "cancelled": False,
@@ -332,52 +1118,131 @@ def start_refresh(db: db_core.MediaDB | None = None) -> dict:
         })
 
     def _run():
-        session, cfg = _build_session(db)
-        merged: dict[str, DDUItem] = {}
+        try:
+            with db.connection():
+                _run_steps()
+        except Exception as exc:
+            # Senza questo lo stato resterebbe "running" e nessun altro refresh partirebbe
+            print(f"DDU refresh: errore: {exc}")
+            with _REFRESH_LOCK:
+                _REFRESH_STATE["error"] = str(exc)
+                _REFRESH_STATE["running"] = False
+
+    def _cancelled() -> bool:
+        if not _CANCEL_EVENT.is_set():
+            return False
+        with _REFRESH_LOCK:
+            _REFRESH_STATE["cancelled"] = True
+            _REFRESH_STATE["running"] = False
+        return True
+
+    def _fetch(source: DDUListSource, client: DDUClient, conditional: bool) -> dict | None:
+        # Solo rete nei worker: il parsing resta nel thread di refresh (o nel parse pool)
+        if not _HOST_LIMITER.acquire(source.url, _CANCEL_EVENT):
+            return None
+        with _REFRESH_LOCK:
+            _REFRESH_STATE["current_source"] = source.name
+        try:
+            return _fetch_list_page(source, client, conditional)
+        except Exception as exc:
+            print(f"DDU refresh: errore su {source.url}: {exc}")
+            return None
+
+    def _run_steps():
+        client = _get_client(db)
         sources = ddu_get_sources(db)
         with _REFRESH_LOCK:
             _REFRESH_STATE["total_sources"] = len(sources)
-        for source in sources:
-            if _CANCEL_EVENT.is_set():
-                with _REFRESH_LOCK:
-                    _REFRESH_STATE["cancelled"] = True
-                    _REFRESH_STATE["running"] = False
-                return
-            with _REFRESH_LOCK:
-                _REFRESH_STATE["current_source"] = source.name
-            try:
-                html = _fetch_html(source.url, session)
-            except Exception:
-                with _REFRESH_LOCK:
-                    _REFRESH_STATE["processed_sources"] += 1
-                continue
-            items = parse_list_page(html, source, cfg["base_url"])
-            for item in items:
-                key = item.detail_url or (item.topic_id or "")
-                if not key:
-                    continue
-                existing = merged.get(key)
-                if not existing:
-                    merged[key] = item
-                else:
-                    merged[key] = _merge_item(existing, item)
+        # Elementi gia salvati per la sorgente, se letti con la stessa configurazione
+        stored = {source.id for source in sources if source.items_signature == source.signature()}
+        changed = 0
+        items_count = 0
+
+        def _store(source: DDUListSource, result: dict | None, items: list[DDUItem] | None) -> None:
+            nonlocal changed, items_count
+            counter = "unchanged_sources"
+            count = source.last_count or 0
+            if result is None:
+                # Errore di rete: restano gli elementi dell'ultimo refresh riuscito
+                counter = "failed_sources"
+            else:
+                if items is not None:
+                    rows = _source_rows(items)
+                    sync = db.sync_ddunlimited_source_items(source.id, rows, source.signature())
+                    count = len({row["item_key"] for row in rows})
+                    if source.id not in stored or sync["inserted"] or sync["updated"] or sync["deleted"]:
+                        counter = "changed_sources"
+                        changed += 1
+                validators = result if result["modified"] else {
+                    "etag": source.etag,
+                    "last_modified": source.last_modified,
+                    "content_hash": source.content_hash
+                }
+                db.set_ddunlimited_source_fetch(
+                    source.id,
+                    validators["etag"],
+                    validators["last_modified"],
+                    validators["content_hash"],
+                    count
+                )
+            items_count += count
             with _REFRESH_LOCK:
                 _REFRESH_STATE["processed_sources"] += 1
-                _REFRESH_STATE["items_count"] = len(merged)
-        if _CANCEL_EVENT.is_set():
-            with _REFRESH_LOCK:
-                _REFRESH_STATE["cancelled"] = True
-                _REFRESH_STATE["running"] = False
+                _REFRESH_STATE[counter] += 1
+                _REFRESH_STATE["items_count"] = items_count
+
+        executor = ThreadPoolExecutor(max_workers=max(1, REFRESH_WORKERS), thread_name_prefix="ddu-fetch")
+        parsing: dict[Future, tuple[DDUListSource, dict]] = {}
+        try:
+            pending = {
+                executor.submit(_fetch, source, client, not force and source.id in stored): source
+                for source in sources
+            }
+            while pending or parsing:
+                done, _ = wait([*pending, *parsing], timeout=0.5, return_when=FIRST_COMPLETED)
+                if _cancelled():
+                    return
+                for future in done:
+                    if future in parsing:
+                        source, result = parsing.pop(future)
+                        rows = _parse_result(future, _list_page_tuples, result["html"], source, client.base_url)
+                        _store(source, result, _items_from_tuples(rows, source))
+                        continue
+                    source = pending.pop(future)
+                    result = future.result()
+                    if result is None or not result["modified"] or not (
+                        force or source.id not in stored or result["content_hash"] != source.content_hash
+                    ):
+                        _store(source, result, None)
+                        continue
+                    # Con il parse pool attivo le pagine scaricate vengono lette in parallelo,
+                    # senza tenere il GIL del worker che serve le richieste
+                    parse = _submit_parse(_list_page_tuples, result["html"], source, client.base_url)
+                    if parse is not None:
+                        parsing[parse] = (source, result)
+                    else:
+                        _store(source, result, parse_list_page(result["html"], source, client.base_url))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            for future in parsing:
+                future.cancel()
+
+        if _cancelled():
             return
-        with _CACHE_LOCK:
-            _CACHE["items"] = merged
-            _CACHE["sources"] = len(sources)
-            _CACHE["updated_at"] = datetime.now(timezone.utc)
-            _save_cache_to_disk()
+        source_ids = [source.id for source in sources]
+        # Nessuna pagina cambiata e stesse sorgenti: la cache fusa resta valida
+        if changed or force or db.get_ddunlimited_cache_state()["source_ids"] != source_ids:
+            _rebuild_cache(db, sources)
+            with _SEARCH_LOCK:
+                # Indice di ricerca di questo worker ricostruito alla prossima ricerca
+                _SEARCH_STATE["checked_at"] = 0.0
+        else:
+            db.touch_ddunlimited_cache(source_ids)
+        state = db.get_ddunlimited_cache_state()
         with _REFRESH_LOCK:
             _REFRESH_STATE["running"] = False
-            _REFRESH_STATE["updated_at"] = _CACHE["updated_at"]
-            _REFRESH_STATE["items_count"] = len(merged)
+            _REFRESH_STATE["updated_at"] = state["updated_at"]
+            _REFRESH_STATE["items_count"] = state["count"]
 
     _REFRESH_THREAD = Thread(target=_run, daemon=True)
     _REFRESH_THREAD.start()
@@ -402,6 +1267,9 @@ def get_refresh_status() -> dict:
             "processed_sources": _REFRESH_STATE["processed_sources"],
             "current_source": _REFRESH_STATE["current_source"],
             "items_count": _REFRESH_STATE["items_count"],
+            "changed_sources": _REFRESH_STATE["changed_sources"],
+            "unchanged_sources": _REFRESH_STATE["unchanged_sources"],
+            "failed_sources": _REFRESH_STATE["failed_sources"],
             "started_at": started.isoformat() if started else None,
             "updated_at": updated.isoformat() if updated else None,
             "cancelled": _REFRESH_STATE["cancelled"],
@@ -409,94 +1277,187 @@ def get_refresh_status() -> dict:
         }
 
 
-def get_cache_status() -> dict:
-    _load_cache_from_disk()
-    with _CACHE_LOCK:
-        updated = _CACHE["updated_at"]
-        return {
-            "count": len(_CACHE["items"]),
-            "sources": _CACHE["sources"],
-            "updated_at": updated.isoformat() if updated else None
-        }
+def get_cache_status(db: db_core.MediaDB | None = None) -> dict:
+    if db is None:
+        return {"count": 0, "sources": 0, "updated_at": None}
+    try:
+        state = db.get_ddunlimited_cache_state()
+    except Exception as exc:
+        print(f"Error reading DDU cache state: {exc}")
+        return {"count": 0, "sources": 0, "updated_at": None}
+    updated = state["updated_at"]
+    return {
+        "count": state["count"],
+        "sources": len(state["source_ids"]),
+        "updated_at": updated.isoformat() if updated else None
+    }
 
 
-def search_cache(query: str, max_results: int = 200) -> list[DDUItem]:
-    if not query:
+def search_cache(query: str, db: db_core.MediaDB | None = None, max_results: int = 200) -> list[DDUItem]:
+    if not query or db is None:
+        return []
+    normalized_query = _normalize_search(query)
+    words = normalized_query.split()
+    # Solo stopword: filtra comunque sulle parole della ricerca, per non leggere tutta la cache
+    query_tokens = [t for t in words if t not in SEARCH_STOPWORDS] or words
+    if not query_tokens:
+        return []
+    try:
+        # Indice in memoria del worker; finche non e pronto filtra l'indice trigrammi di PostgreSQL
+        index = _get_search_index(db)
+        candidates = index.candidates(query_tokens) if index is not None else db.search_ddunlimited_items(query_tokens)
+    except Exception as exc:
+        print(f"Error searching DDU cache: {exc}")
         return []
-    _load_cache_from_disk()
-    def _normalize(value: str) -> str:
-        if not value:
-            return ""
-        value = unicodedata.normalize("NFKD", value)
-        value = "".join(ch for ch in value.lower() if ch.isalnum() or ch.isspace())
-        return " ".join(value.split())
-
-    normalized_query = _normalize(query)
-    stopwords = {
-        "il", "lo", "la", "i", "gli", "le", "un", "una", "uno",
-        "di", "da", "del", "della", "dello", "dei", "degli", "delle",
-        "the", "a", "an", "and", "of"
-    }
-    query_tokens = [t for t in normalized_query.split() if t and t not in stopwords]
-    with _CACHE_LOCK:
-        items = list(_CACHE["items"].values())
-    candidates = []
-    filtered_items = []
-    for item in items:
-        base = _normalize(item.title or "")
-        if item.info:
-            base = f"{base} {_normalize(item.info[:200])}"
-        if query_tokens and not all(token in base for token in query_tokens):
-            continue
-        candidates.append(base)
-        filtered_items.append(item)
-
     if not candidates:
         return []
 
     matches = process.extract(
         normalized_query,
-        candidates,
+        [text for _, text in candidates],
         scorer=fuzz.token_set_ratio,
-        limit=max_results
+        limit=max_results,
+        score_cutoff=SEARCH_MIN_SCORE
     )
-    results = []
-    for _, score, idx in matches:
-        if score < 78:
+    keys = [candidates[idx][0] for _, _, idx in matches]
+    rows = db.get_ddunlimited_items(keys)
+    return [_item_from_row(rows[key]) for key in keys if key in rows]
+
+
+_ED2K_HREF_RE = re.compile(r"""href=(['"])(ed2k://\|file\|.*?\|/)\1""", re.IGNORECASE)
+_ED2K_FILEARRAY_RE = re.compile(r"""filearray\d+\[\d+\]\s*=\s*(['"])(ed2k://\|file\|.*?\|/)\1""", re.IGNORECASE)
+_ED2K_LOOSE_RE = re.compile(r"""ed2k://\|file\|[^|<>"]+\|\d+\|[0-9A-Fa-f]+\|[^"<>]*?\|/""", re.IGNORECASE)
+_ED2K_BACKSLASH_S_RE = re.compile(r"\\s+")
+# Stessi pattern per il testo in minuscolo (vedi _ed2k_findall)
+_ED2K_LOWER = {pattern: re.compile(pattern.pattern) for pattern in (_ED2K_HREF_RE, _ED2K_FILEARRAY_RE, _ED2K_LOOSE_RE)}
+
+# Token del tokenizer di html.parser rilevanti per l'annidamento: commenti, script/style
+# (solo l'apertura: il contenuto lo salta _tag_tokens) e tag di apertura/chiusura con
+# attributi tra virgolette; i <br> senza attributi non cambiano lo stack e vengono saltati
+_HTML_TOKEN_RE = re.compile(
+    r"""<(?!br\s*/?>)(?:(!--)"""
+    r"""|(script|style)\b""" + _HTML_ATTRS + r"""(?<!/)>"""
+    r"""|(/?)([a-zA-Z][^\s/<>]*)((?:[\s/]""" + _HTML_ATTRS + r""")?)>)""",
+    re.IGNORECASE
+)
+_HTML_COMMENT_END_RE = re.compile("-->")
+_CLASS_ATTR_RE = re.compile(r"""(?:^|\s)class\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))""", re.IGNORECASE)
+# href che BeautifulSoup riscriverebbe diversamente: spazi attorno a "=", valore senza
+# virgolette o tra apici con dentro una virgoletta doppia
+_LOOSE_HREF_RE = re.compile(r"""href(?:\s+=|=(?!['"])|='[^']*")""")
+_ENTITY_LIKE_RE = re.compile(r"&[#a-zA-Z]")
+# Caratteri per cui IGNORECASE e lower() non coincidono sulle lettere dei pattern ed2k
+_CASEFOLD_UNSAFE = ("\u0130", "\u0131")
+
+
+def _post_content_spans(raw_html: str) -> list[tuple[int, int]] | None:
+    """
+    (start, end) of the `.postbody .content` elements in document order, with the
+    nesting html.parser + BeautifulSoup would build: an end tag closes the innermost
+    open element with that name (and everything inside it), stray end tags are ignored.
+    None when the page has markup the scan does not reproduce: stray end tags inside a
+    post content (BeautifulSoup drops them from the text) or an unterminated comment,
+    script or style.
+    """
+    if _LOOSE_ENDTAG_RE.search(raw_html):
+        return None
+    spans: list[list[int]] = []
+    # Stack degli elementi aperti: nome, dentro un .postbody, indice in spans (-1 se nessuno)
+    names: list[str] = []
+    in_postbody: list[bool] = []
+    span_ids: list[int] = []
+    for match, end in _tag_tokens(_HTML_TOKEN_RE, raw_html, _HTML_COMMENT_END_RE):
+        if end is None:
+            return None
+        closing, name, attrs = match.group(3, 4, 5)
+        if name is None:
             continue
-        results.append(filtered_items[idx])
-    return results
-
-
-def extract_ed2k_links(html: str) -> list[str]:
-    links = []
-    raw_html = html_lib.unescape(html)
-    soup = BeautifulSoup(raw_html, "html.parser")
-    content_nodes = soup.select(".postbody .content")
-    content = None
-    for node in content_nodes:
-        node_html = str(node)
-        if "ed2k://|file|" in node_html or "filearray" in node_html:
-            content = node_html
-            break
-    if content is None and content_nodes:
-        content = str(content_nodes[0])
-    if content is None:
-        content = raw_html
-    html = html_lib.unescape(content).replace("\r", "").replace("\n", "")
-
-    href_pattern = r"""href=(['"])(ed2k://\|file\|.*?\|/)\1"""
-    href_matches = re.findall(href_pattern, html, flags=re.IGNORECASE)
+        name = name.lower()
+        if closing:
+            if names and names[-1] == name:
+                depth = len(names) - 1
+            elif name in names:
+                depth = len(names) - 1 - names[::-1].index(name)
+            else:
+                if any(span_index >= 0 for span_index in span_ids):
+                    return None
+                continue
+            for index in range(depth, len(names)):
+                span_index = span_ids[index]
+                if span_index >= 0:
+                    spans[span_index][1] = end if index == depth else match.start()
+            del names[depth:], in_postbody[depth:], span_ids[depth:]
+            continue
+        scope = bool(in_postbody) and in_postbody[-1]
+        span_index = -1
+        # I selettori di classe sono case sensitive: senza queste sottostringhe non c'e match
+        if "postbody" in attrs or (scope and "content" in attrs):
+            class_match = _CLASS_ATTR_RE.search(attrs)
+            if class_match:
+                classes = (class_match.group(1) or class_match.group(2) or class_match.group(3) or "").split()
+                if scope and "content" in classes:
+                    spans.append([match.start(), match.end()])
+                    span_index = len(spans) - 1
+                scope = scope or "postbody" in classes
+        if name in _VOID_TAGS:
+            continue
+        if attrs.endswith("/"):
+            if _UNQUOTED_SLASH_RE.search(attrs):
+                return None
+            continue
+        names.append(name)
+        in_postbody.append(scope)
+        span_ids.append(span_index)
+    for span_index in span_ids:
+        if span_index >= 0:
+            spans[span_index][1] = len(raw_html)
+    return [(start, end) for start, end in spans]
+
+
+def _has_text_entities(region: str) -> bool:
+    """
+    True if text outside tags still contains entity-like sequences: BeautifulSoup
+    decodes those differently from html.unescape (e.g. "&para" without ";").
+    Attribute values, comments and script/style are decoded the same way by both.
+    """
+    if not _ENTITY_LIKE_RE.search(region):
+        return False
+    pos = 0
+    for match, end in _tag_tokens(_HTML_TOKEN_RE, region, _HTML_COMMENT_END_RE):
+        if _ENTITY_LIKE_RE.search(region, pos, match.start()):
+            return True
+        if end is None:
+            # Commento o script senza fine: meglio il percorso completo
+            return True
+        pos = end
+    return _ENTITY_LIKE_RE.search(region, pos) is not None
+
+
+def _ed2k_findall(pattern: re.Pattern, text: str, lowered: str | None) -> list[str]:
+    # Sul testo gia minuscolo i pattern senza IGNORECASE sfruttano il prefisso letterale
+    if lowered is None:
+        return [match.group(match.lastindex or 0) for match in pattern.finditer(text)]
+    group = 2 if pattern.groups else 0
+    return [text[match.start(group):match.end(group)] for match in _ED2K_LOWER[pattern].finditer(lowered)]
+
+
+def _lowered(text: str) -> str | None:
+    if any(char in text for char in _CASEFOLD_UNSAFE):
+        return None
+    return text.lower()
 
-    filearray_pattern = r"""filearray\d+\[\d+\]\s*=\s*(['"])(ed2k://\|file\|.*?\|/)\1"""
-    filearray_matches = re.findall(filearray_pattern, html, flags=re.IGNORECASE)
 
-    loose_pattern = r"""ed2k://\|file\|[^|<>"]+\|\d+\|[0-9A-Fa-f]+\|[^"<>]*?\|/"""
-    loose_matches = re.findall(loose_pattern, html, flags=re.IGNORECASE)
+def _collect_ed2k_links(raw_html: str, html: str) -> list[str]:
+    """Apply the href/filearray/loose patterns and the fallbacks, then clean and dedupe by hash."""
+    html = html.replace("\r", "").replace("\n", "")
+    lowered = _lowered(html)
+    href_matches = _ed2k_findall(_ED2K_HREF_RE, html, lowered)
+    filearray_matches = _ed2k_findall(_ED2K_FILEARRAY_RE, html, lowered)
+    loose_matches = _ed2k_findall(_ED2K_LOOSE_RE, html, lowered)
 
     if raw_html and "filearray" in raw_html and len(filearray_matches) < 5:
         fallback_html = raw_html.replace("\r", "").replace("\n", "")
-        filearray_matches = re.findall(filearray_pattern, fallback_html, flags=re.IGNORECASE)
+        filearray_matches = _ed2k_findall(_ED2K_FILEARRAY_RE, fallback_html, _lowered(fallback_html))
 
     ordered_links = []
     if filearray_matches:
@@ -508,17 +1469,16 @@ def extract_ed2k_links(html: str) -> list[str]:
         ordered_links.extend(loose_matches)
         if raw_html and "ed2k://|file|" in raw_html and not ordered_links:
             fallback_html = raw_html.replace("\r", "").replace("\n", "")
-            ordered_links.extend(re.findall(href_pattern, fallback_html, flags=re.IGNORECASE))
-            ordered_links.extend(re.findall(loose_pattern, fallback_html, flags=re.IGNORECASE))
-    links.extend(ordered_links)
+            fallback_lowered = _lowered(fallback_html)
+            ordered_links.extend(_ed2k_findall(_ED2K_HREF_RE, fallback_html, fallback_lowered))
+            ordered_links.extend(_ed2k_findall(_ED2K_LOOSE_RE, fallback_html, fallback_lowered))
 
     cleaned = []
     seen = set()
-    for link in links:
-        if isinstance(link, tuple):
-            link = link[1]
-        link = link.replace("\n", "").replace("\r", "")
-        link = re.sub(r"\\s+", "", link)
+    for link in ordered_links:
+        # I testi di partenza sono gia senza a capo
+        if "\\" in link:
+            link = _ED2K_BACKSLASH_S_RE.sub("", link)
         if not link.startswith("ed2k://|file|"):
             continue
         if "|/" not in link:
@@ -535,6 +1495,53 @@ def extract_ed2k_links(html: str) -> list[str]:
     return cleaned
 
 
+def extract_ed2k_links(html: str) -> list[str]:
+    """
+    ed2k links of a release page, from the first post content that contains any
+    (filearray entries first, then href links, then bare links), deduplicated by hash.
+    The post contents are located with a single tag scan instead of a parse tree.
+    """
+    raw_html = html_lib.unescape(html)
+    spans = _post_content_spans(raw_html)
+    if spans is None:
+        return _extract_ed2k_links_soup(raw_html)
+    if not spans:
+        return _collect_ed2k_links(raw_html, html_lib.unescape(raw_html))
+    chosen = None
+    for start, end in spans:
+        region = raw_html[start:end]
+        if _has_text_entities(region):
+            return _extract_ed2k_links_soup(raw_html)
+        text = html_lib.unescape(region)
+        if "ed2k://|file|" in text or "filearray" in text:
+            chosen = (region, text)
+            break
+    if chosen is None:
+        region = raw_html[spans[0][0]:spans[0][1]]
+        chosen = (region, html_lib.unescape(region))
+    region, text = chosen
+    if _LOOSE_HREF_RE.search(region.lower()):
+        return _extract_ed2k_links_soup(raw_html)
+    return _collect_ed2k_links(raw_html, text)
+
+
+def _extract_ed2k_links_soup(raw_html: str) -> list[str]:
+    # Percorso completo con BeautifulSoup, per il markup che lo scanner non riproduce fedelmente
+    soup = BeautifulSoup(raw_html, "html.parser")
+    content_nodes = soup.select(".postbody .content")
+    content = None
+    for node in content_nodes:
+        node_html = str(node)
+        if "ed2k://|file|" in node_html or "filearray" in node_html:
+            content = node_html
+            break
+    if content is None and content_nodes:
+        content = str(content_nodes[0])
+    if content is None:
+        content = raw_html
+    return _collect_ed2k_links(raw_html, html_lib.unescape(content))
+
+
 def _parse_ed2k_link(link: str) -> dict:
     # ed2k://|file|NAME|SIZE|HASH|/
     name = link
@@ -591,66 +1598,103 @@ def _extract_detail_lines(info_text: str | None, max_lines: int = 6) -> list[str
     return short_lines[:max_lines]
 
 
-def _save_cache_to_disk() -> None:
-    with _CACHE_LOCK:
-        items = [asdict(item) for item in _CACHE["items"].values()]
-        payload = {
-            "updated_at": _CACHE["updated_at"].isoformat() if _CACHE["updated_at"] else None,
-            "sources": _CACHE["sources"],
-            "items": items
-        }
-    os.makedirs(os.path.dirname(_CACHE_FILE), exist_ok=True)
-    try:
-        with open(_CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=True)
-    except OSError:
-        pass
+def _release_key(detail_url: str, base_url: str) -> str | None:
+    """
+    Cache key of a release page: the topic id, with the page offset for the later pages
+    of a topic ("<t>:<start>"). None (page not cached) for URLs outside the configured
+    DDUnlimited host, without a topic id or pointing to a single post (p=).
+    """
+    parsed = urlparse(detail_url)
+    host = (parsed.hostname or "").lower()
+    if parsed.scheme not in ("http", "https") or not host or host != (urlparse(base_url).hostname or "").lower():
+        return None
+    qs = parse_qs(parsed.query)
+    topic_id = (qs.get("t") or [""])[0]
+    if not topic_id or "p" in qs:
+        return None
+    start = (qs.get("start") or ["0"])[0]
+    return topic_id if start in ("", "0") else f"{topic_id}:{start}"
 
 
-def _load_cache_from_disk() -> None:
-    with _CACHE_LOCK:
-        if _CACHE["items"] or _CACHE["updated_at"]:
-            return
-    if not os.path.exists(_CACHE_FILE):
-        return
-    print(f"DDU cache load start: {_CACHE_FILE}")
-    try:
-        with open(_CACHE_FILE, "r", encoding="utf-8") as f:
-            payload = json.load(f)
-    except (OSError, json.JSONDecodeError):
-        print("DDU cache load failed.")
-        return
-    items = {}
-    for raw in payload.get("items", []):
-        try:
-            item = DDUItem(**raw)
-        except TypeError:
-            continue
-        key = item.detail_url or (item.topic_id or "")
-        if key:
-            items[key] = item
-    updated_at = payload.get("updated_at")
-    try:
-        updated_dt = datetime.fromisoformat(updated_at) if updated_at else None
-    except ValueError:
-        updated_dt = None
-    with _CACHE_LOCK:
-        if not _CACHE["items"] and not _CACHE["updated_at"]:
-            _CACHE["items"] = items
-            _CACHE["sources"] = payload.get("sources", 0)
-            _CACHE["updated_at"] = updated_dt
-    print(f"DDU cache load done: {len(items)} items")
-
-
-def get_release_ed2k(detail_url: str, db: db_core.MediaDB | None = None) -> dict:
-    session, cfg = _build_session(db)
-    html = _fetch_html(detail_url, session)
-    ed2k_links = extract_ed2k_links(html)
+def _load_release(detail_url: str, client: DDUClient) -> dict:
+    html = _fetch_html(detail_url, client)
+    ed2k_links = _parse_result(_submit_parse(extract_ed2k_links, html), extract_ed2k_links, html)
     parsed_links = [_parse_ed2k_link(link) for link in ed2k_links]
-    stats = _get_ed2k_stats(parsed_links)
     return {
         "ed2k_links": ed2k_links,
         "ed2k_items": parsed_links,
-        "ed2k_stats": stats,
-        "base_url": cfg["base_url"]
+        "ed2k_stats": _get_ed2k_stats(parsed_links)
     }
+
+
+def _remember_release(key: str, payload: dict) -> None:
+    ttl = RELEASE_MEMORY_TTL if payload["ed2k_links"] else min(RELEASE_MEMORY_TTL, db_core.DDU_RELEASE_CACHE_NEGATIVE_TTL)
+    _RELEASE_CACHE.set(key, payload, ttl)
+
+
+def _cached_release(key: str, db: db_core.MediaDB | None) -> dict | None:
+    payload = _RELEASE_CACHE.get(key)
+    if payload is None and db is not None:
+        payload = db.get_ddunlimited_release(key)
+        if payload is not None:
+            _remember_release(key, payload)
+    return payload
+
+
+def _store_release(key: str, detail_url: str, payload: dict, db: db_core.MediaDB | None) -> None:
+    _remember_release(key, payload)
+    if db is not None:
+        db.set_ddunlimited_release(key, detail_url, payload, len(payload["ed2k_links"]))
+
+
+def get_release_ed2k(detail_url: str, db: db_core.MediaDB | None = None, refresh: bool = False) -> dict:
+    """
+    ed2k links of a release page. Parsed results are cached by topic id in memory
+    (LRU) and in PostgreSQL, so reopening a release does not download the page again;
+    `refresh` bypasses both. Pages outside the configured host are never cached.
+    """
+    client = _get_client(db)
+    key = _release_key(detail_url, client.base_url)
+    if key is None:
+        return {**_load_release(detail_url, client), "base_url": client.base_url}
+    payload = None if refresh else _cached_release(key, db)
+    if payload is None:
+        payload = _load_release(detail_url, client)
+        _store_release(key, detail_url, payload, db)
+    return {**payload, "base_url": client.base_url}
+
+
+def _prefetch_release(detail_url: str, key: str, db: db_core.MediaDB) -> None:
+    try:
+        with db.connection():
+            if _cached_release(key, db) is not None:
+                return
+            _HOST_LIMITER.acquire(detail_url)
+            _store_release(key, detail_url, _load_release(detail_url, _get_client(db)), db)
+    except Exception as exc:
+        print(f"DDU prefetch: errore su {detail_url}: {exc}")
+    finally:
+        with _PREFETCH_LOCK:
+            _PREFETCH_PENDING.discard(key)
+
+
+def prefetch_releases(items: list[DDUItem], db: db_core.MediaDB | None = None) -> int:
+    """Load in background the ed2k links of the first PREFETCH_RESULTS search results."""
+    global _PREFETCH_EXECUTOR
+    if PREFETCH_RESULTS <= 0 or db is None:
+        return 0
+    queued = 0
+    base_url = _get_client(db).base_url
+    with _PREFETCH_LOCK:
+        if _PREFETCH_EXECUTOR is None:
+            _PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="ddu-prefetch")
+        for item in items[:PREFETCH_RESULTS]:
+            if not item.detail_url:
+                continue
+            key = _release_key(item.detail_url, base_url)
+            if key is None or key in _PREFETCH_PENDING or _RELEASE_CACHE.get(key) is not None:
+                continue
+            _PREFETCH_PENDING.add(key)
+            _PREFETCH_EXECUTOR.submit(_prefetch_release, item.detail_url, key, db)
+            queued += 1
+    return queued
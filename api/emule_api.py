@@ -1,5 +1,5 @@
-import requests
 from core import db_core
+from core import http_core
 
 # ===== CONFIG =====
 EMULE_URL = ""
@@ -7,6 +7,8 @@ EMULE_PASSWORD = ""
 REQUEST_TIMEOUT = 8
 # ==================
 
+_HTTP = http_core.get_client("emule")
+
 
 def _get_config(db: db_core.MediaDB | None = None) -> dict:
     cfg = db.get_service_config("Emule") if db else {}
@@ -35,7 +37,7 @@ def emule_test_connection(
         return False, "Emule WebUI URL mancante."
     try:
         auth = ("", password) if password else None
-        r = requests.get(url, auth=auth, timeout=REQUEST_TIMEOUT)
+        r = _HTTP.get(url, auth=auth, timeout=REQUEST_TIMEOUT)
         if r.status_code in (401, 403):
             return False, "Emule WebUI: credenziali non valide."
         return (r.status_code < 400, f"Emule WebUI status: {r.status_code}")
@@ -59,7 +61,7 @@ def emule_add_ed2k(
         return False, "Emule WebUI URL mancante."
     try:
         auth = ("", password) if password else None
-        r = requests.get(
+        r = _HTTP.get(
             url,
             params={"ed2k": ed2k_link},
             auth=auth,
@@ -1,12 +1,14 @@
-import requests
 from urllib.parse import quote
 import re
 from dataclasses import dataclass
 from core import db_core
+from core import http_core
 
 PLEX_WEB_URL = ""
 PLEX_WEB_TOKEN = ""
 
+_HTTP = http_core.get_client("plex_web")
+
 
 def _get_config(db: db_core.MediaDB | None = None) -> dict:
     cfg = db.get_service_config("Plex Web") if db else {}
@@ -24,7 +26,7 @@ def _plex_request(path: str, db: db_core.MediaDB | None = None, params: dict | N
     req_params = params.copy() if params else {}
     req_params["X-Plex-Token"] = cfg["token"]
     headers = {"Accept": "application/json"}
-    r = requests.get(url, headers=headers, params=req_params)
+    r = _HTTP.get(url, headers=headers, params=req_params)
     if r.status_code != 200:
         print(f"Error calling Plex API {path}: {r.status_code}")
         return None
@@ -1,7 +1,10 @@
 import requests
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from typing import List
 from core import db_core
+from core import http_core
+from core.cache_core import SnapshotCache
 
 # ===== CONFIG =====
 RADARR_URL = "REMOVED"
@@ -9,8 +12,11 @@ RADARR_API_KEY = "REMOVED"
 PROFILE_ID = 7
 ENABLE_SEARCH = False  # True per far partire la ricerca automatica su Radarr
 ROOT_FOLDER = "/data/File Sharing/radarr"  # cartella principale di Radarr
+LIBRARY_CACHE_TTL = 300  # secondi di validita dello snapshot della libreria Radarr
 # ==================
 
+_HTTP = http_core.get_client("radarr")
+
 def _get_config(db: db_core.MediaDB | None = None) -> dict:
     cfg = db.get_service_config("Radarr") if db else {}
     url = cfg.get("radarr_url") or RADARR_URL
@@ -35,40 +41,132 @@ class RadarrMedia:
     has_file: bool = False
     path: str | None = None
 
+def _movie_from_raw(m: dict) -> RadarrMedia:
+    return RadarrMedia(
+        title=m.get("title"),
+        year=m.get("year"),
+        tmdb_id=m.get("tmdbId"),
+        imdb_id=m.get("imdbId"),
+        root_folder=m.get("rootFolderPath"),
+        monitored=m.get("monitored", True),
+        has_file=m.get("hasFile", False),
+        path=m.get("path")
+    )
+
+
+def _title_year_key(title: str | None, year: int | None) -> tuple[str, int | None]:
+    return ((title or "").strip().lower(), year)
+
+
+# --- Library snapshot ---
+@dataclass
+class RadarrLibrary:
+    raw: list[dict]
+    movies: list[RadarrMedia]
+    by_tmdb: dict[str, RadarrMedia] = field(default_factory=dict)
+    by_imdb: dict[str, RadarrMedia] = field(default_factory=dict)
+    by_title_year: dict[tuple[str, int | None], RadarrMedia] = field(default_factory=dict)
+    fetched_at: float = 0.0
+
+
+def _build_library(raw_movies: list[dict], fetched_at: float | None = None) -> RadarrLibrary:
+    library = RadarrLibrary(raw=raw_movies, movies=[], fetched_at=fetched_at or time.time())
+    for m in raw_movies:
+        media = _movie_from_raw(m)
+        library.movies.append(media)
+        if media.tmdb_id:
+            library.by_tmdb[str(media.tmdb_id)] = media
+        if media.imdb_id:
+            library.by_imdb[str(media.imdb_id)] = media
+        if media.title:
+            library.by_title_year.setdefault(_title_year_key(media.title, media.year), media)
+    return library
+
+
+def _fetch_library(cfg: dict) -> RadarrLibrary | None:
+    r = _HTTP.get(f"{cfg['url']}/api/v3/movie", headers=cfg["headers"])
+    if r.status_code != 200:
+        print(f"Error fetching movies from Radarr: {r.status_code}")
+        return None
+    data = r.json()
+    return _build_library(data if isinstance(data, list) else [])
+
+
+_LIBRARY_CACHE: SnapshotCache[RadarrLibrary] = SnapshotCache(_fetch_library, LIBRARY_CACHE_TTL)
+
+
+def _library_key(cfg: dict) -> tuple[str, str]:
+    return (cfg["url"], cfg["headers"]["X-Api-Key"])
+
+
+_LIBRARY_LISTENERS: list = []
+
+
+def radarr_add_library_listener(listener) -> None:
+    """Register listener(upsert, remove_id), called for every add/update/delete done through this module."""
+    _LIBRARY_LISTENERS.append(listener)
+
+
+def _patch_library(cfg: dict, upsert: dict | None = None, remove_id: int | None = None) -> None:
+    """Apply a single add/update/delete to the cached snapshot instead of refetching it."""
+    for listener in _LIBRARY_LISTENERS:
+        try:
+            listener(upsert, remove_id)
+        except Exception as exc:
+            print(f"Error notifying Radarr library change: {exc}")
+    key = _library_key(cfg)
+    if upsert is not None and not upsert.get("id"):
+        _LIBRARY_CACHE.invalidate(key)
+        return
+    drop_ids = {remove_id, (upsert or {}).get("id")} - {None}
+
+    def _apply(library: RadarrLibrary) -> RadarrLibrary:
+        raw = [m for m in library.raw if m.get("id") not in drop_ids]
+        if upsert is not None:
+            raw.append(upsert)
+        return _build_library(raw, library.fetched_at)
+
+    _LIBRARY_CACHE.update(key, _apply)
+
+
+def _response_json(r: requests.Response) -> dict | None:
+    try:
+        data = r.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
 # --- API Functions ---
 def radarr_get_client(db: db_core.MediaDB) -> dict:
     return _get_config(db)
 
-def radarr_get_all_movies(db: db_core.MediaDB | None = None) -> List[RadarrMedia]:
+def radarr_get_library(db: db_core.MediaDB | None = None, force_refresh: bool = False) -> RadarrLibrary | None:
     """
-    Retrieve all movies currently in Radarr.
-    Returns a list of RadarrMedia objects.
+    Return the cached snapshot of the Radarr library, refreshing it when older than LIBRARY_CACHE_TTL.
+    Concurrent callers share one download. Returns None if Radarr is unreachable and nothing is cached.
     """
     cfg = _get_config(db)
-    r = requests.get(f"{cfg['url']}/api/v3/movie", headers=cfg["headers"])
-    if r.status_code != 200:
-        print(f"Error fetching movies from Radarr: {r.status_code}")
-        return []
+    return _LIBRARY_CACHE.get(_library_key(cfg), cfg, force=force_refresh)
+
+def radarr_apply_library_change(db: db_core.MediaDB | None = None, upsert: dict | None = None, remove_id: int | None = None) -> None:
+    """Apply a change learned elsewhere (e.g. a webhook) to the snapshot and the library listeners."""
+    _patch_library(_get_config(db), upsert=upsert, remove_id=remove_id)
 
-    movies = r.json()
-    result = []
-    for m in movies:
-        media = RadarrMedia(
-            title=m.get("title"),
-            year=m.get("year"),
-            tmdb_id=m.get("tmdbId"),
-            imdb_id=m.get("imdbId"),
-            root_folder=m.get("rootFolderPath"),
-            monitored=m.get("monitored", True),
-            has_file=m.get("hasFile", False),
-            path=m.get("path")
-        )
-        result.append(media)
-    return result
+def radarr_invalidate_library(db: db_core.MediaDB | None = None) -> None:
+    _LIBRARY_CACHE.invalidate(_library_key(_get_config(db)))
+
+def radarr_get_all_movies(db: db_core.MediaDB | None = None, force_refresh: bool = False) -> List[RadarrMedia]:
+    """
+    Retrieve all movies currently in Radarr.
+    Returns a list of RadarrMedia objects.
+    """
+    library = radarr_get_library(db, force_refresh)
+    return list(library.movies) if library else []
 
 def radarr_get_root_folders(db: db_core.MediaDB | None = None) -> list[dict]:
     cfg = _get_config(db)
-    r = requests.get(f"{cfg['url']}/api/v3/rootfolder", headers=cfg["headers"])
+    r = _HTTP.get(f"{cfg['url']}/api/v3/rootfolder", headers=cfg["headers"])
     if r.status_code != 200:
         print(f"Error fetching Radarr root folders: {r.status_code}")
         return []
@@ -80,7 +178,7 @@ def radarr_get_root_folders(db: db_core.MediaDB | None = None) -> list[dict]:
 
 def radarr_get_quality_profiles(db: db_core.MediaDB | None = None) -> list[dict]:
     cfg = _get_config(db)
-    r = requests.get(f"{cfg['url']}/api/v3/qualityprofile", headers=cfg["headers"])
+    r = _HTTP.get(f"{cfg['url']}/api/v3/qualityprofile", headers=cfg["headers"])
     if r.status_code != 200:
         print(f"Error fetching Radarr quality profiles: {r.status_code}")
         return []
@@ -95,41 +193,43 @@ def radarr_get_by_title_year(title: str, year: int, db: db_core.MediaDB | None =
     Check if a movie exists in Radarr by title/year.
     Returns a RadarrMedia object or None if not found.
     """
-    all_movies = radarr_get_all_movies(db)
-    for m in all_movies:
-        if m.title == title and m.year == year:
-            return m
-    return None
+    library = radarr_get_library(db)
+    if not library:
+        return None
+    return library.by_title_year.get(_title_year_key(title, year))
 
 def radarr_get_by_tmdb(tmdb_id: int, db: db_core.MediaDB | None = None) -> RadarrMedia | None:
     """Retrieve a single movie by TMDb ID."""
     if not tmdb_id:
         return None
     cfg = _get_config(db)
-    r = requests.get(f"{cfg['url']}/api/v3/movie", headers=cfg["headers"], params={"tmdbId": tmdb_id})
+    library = _LIBRARY_CACHE.peek(_library_key(cfg))
+    if library:
+        return library.by_tmdb.get(str(tmdb_id))
+    r = _HTTP.get(f"{cfg['url']}/api/v3/movie", headers=cfg["headers"], params={"tmdbId": tmdb_id})
     if r.status_code != 200:
         print(f"Error fetching movie by TMDb ID {tmdb_id}: {r.status_code}")
         return None
     data = r.json()
     if not data:
         return None
-    m = data[0]
-    return RadarrMedia(
-        title=m.get("title"),
-        year=m.get("year"),
-        tmdb_id=m.get("tmdbId"),
-        imdb_id=m.get("imdbId"),
-        root_folder=m.get("rootFolderPath"),
-        monitored=m.get("monitored", True),
-        has_file=m.get("hasFile", False),
-        path=m.get("path")
-    )
+    return _movie_from_raw(data[0])
+
+def radarr_get_by_id(movie_id: int, db: db_core.MediaDB | None = None) -> dict | None:
+    if not movie_id:
+        return None
+    cfg = _get_config(db)
+    r = _HTTP.get(f"{cfg['url']}/api/v3/movie/{movie_id}", headers=cfg["headers"])
+    if r.status_code != 200:
+        print(f"Error fetching movie by ID {movie_id}: {r.status_code}")
+        return None
+    return _response_json(r)
 
 def radarr_get_by_tmdb_raw(tmdb_id: int, db: db_core.MediaDB | None = None) -> dict | None:
     if not tmdb_id:
         return None
     cfg = _get_config(db)
-    r = requests.get(f"{cfg['url']}/api/v3/movie", headers=cfg["headers"], params={"tmdbId": tmdb_id})
+    r = _HTTP.get(f"{cfg['url']}/api/v3/movie", headers=cfg["headers"], params={"tmdbId": tmdb_id})
     if r.status_code != 200:
         print(f"Error fetching movie by TMDb ID {tmdb_id}: {r.status_code}")
         return None
@@ -143,7 +243,7 @@ def radarr_lookup_by_tmdb(tmdb_id: int, db: db_core.MediaDB | None = None) -> Ra
     if not tmdb_id:
         return None
     cfg = _get_config(db)
-    r = requests.get(f"{cfg['url']}/api/v3/movie/lookup/tmdb", headers=cfg["headers"], params={"tmdbId": tmdb_id})
+    r = _HTTP.get(f"{cfg['url']}/api/v3/movie/lookup/tmdb", headers=cfg["headers"], params={"tmdbId": tmdb_id})
     if r.status_code != 200:
         print(f"Error looking up movie by TMDb ID {tmdb_id}: {r.status_code}")
         return None
@@ -166,7 +266,7 @@ def radarr_lookup_by_imdb(imdb_id: str, db: db_core.MediaDB | None = None) -> Ra
     if not imdb_id:
         return None
     cfg = _get_config(db)
-    r = requests.get(f"{cfg['url']}/api/v3/movie/lookup/imdb", headers=cfg["headers"], params={"imdbId": imdb_id})
+    r = _HTTP.get(f"{cfg['url']}/api/v3/movie/lookup/imdb", headers=cfg["headers"], params={"imdbId": imdb_id})
     if r.status_code != 200:
         print(f"Error looking up movie by IMDB ID {imdb_id}: {r.status_code}")
         return None
@@ -215,9 +315,10 @@ def radarr_add_movie(
     if year_val is None:
         payload.pop("year", None)
 
-    r = requests.post(f"{cfg['url']}/api/v3/movie", headers=cfg["headers"], json=payload)
+    r = _HTTP.post(f"{cfg['url']}/api/v3/movie", headers=cfg["headers"], json=payload)
     if r.status_code == 201:
         print(f"Added to Radarr: {item.title} ({year_val if year_val is not None else 'N/A'})")
+        _patch_library(cfg, upsert=_response_json(r) or {})
         return True
     else:
         print(f"Error adding {item.title}: {r.status_code} {r.text}")
@@ -229,7 +330,7 @@ def radarr_update_movie(movie: dict, db: db_core.MediaDB | None = None, move_fil
         return False
     cfg = _get_config(db)
     params = {"moveFiles": "true"} if move_files else None
-    r = requests.put(
+    r = _HTTP.put(
         f"{cfg['url']}/api/v3/movie/{movie_id}",
         headers=cfg["headers"],
         params=params,
@@ -238,6 +339,7 @@ def radarr_update_movie(movie: dict, db: db_core.MediaDB | None = None, move_fil
     if r.status_code not in (200, 202):
         print(f"Error updating movie {movie_id}: {r.status_code} {r.text}")
         return False
+    _patch_library(cfg, upsert=_response_json(r) or movie)
     return True
 
 def radarr_trigger_movie_search(movie_ids: list[int] | int, db: db_core.MediaDB | None = None) -> bool:
@@ -247,7 +349,7 @@ def radarr_trigger_movie_search(movie_ids: list[int] | int, db: db_core.MediaDB
     if isinstance(movie_ids, int):
         movie_ids = [movie_ids]
     payload = {"name": "MoviesSearch", "movieIds": [int(mid) for mid in movie_ids]}
-    r = requests.post(
+    r = _HTTP.post(
         f"{cfg['url']}/api/v3/command",
         headers=cfg["headers"],
         json=payload
@@ -262,7 +364,7 @@ def radarr_delete_movie(movie_id: int, db: db_core.MediaDB | None = None, delete
         return False
     cfg = _get_config(db)
     params = {"deleteFiles": "true"} if delete_files else {"deleteFiles": "false"}
-    r = requests.delete(
+    r = _HTTP.delete(
         f"{cfg['url']}/api/v3/movie/{movie_id}",
         headers=cfg["headers"],
         params=params
@@ -270,23 +372,44 @@ def radarr_delete_movie(movie_id: int, db: db_core.MediaDB | None = None, delete
     if r.status_code not in (200, 202, 204):
         print(f"Error deleting movie {movie_id}: {r.status_code} {r.text}")
         return False
+    _patch_library(cfg, remove_id=movie_id)
     return True
 
-def radarr_lookup(title: str, year: int | None = None, db: db_core.MediaDB | None = None) -> list[RadarrMedia]:
+def _lookup_entry(m: dict) -> dict:
+    # Solo i campi usati da RadarrMedia: il payload completo di /movie/lookup e molto pesante
+    return {
+        "title": m.get("title"),
+        "year": m.get("year"),
+        "tmdbId": m.get("tmdbId"),
+        "imdbId": m.get("imdbId"),
+        "hasFile": m.get("hasFile", False)
+    }
+
+def radarr_lookup(
+    title: str,
+    year: int | None = None,
+    db: db_core.MediaDB | None = None,
+    use_cache: bool = True
+) -> list[RadarrMedia]:
     """
     Search Radarr for a movie by title (and optionally year) using the lookup endpoint.
+    Results per term are kept in the persistent lookup cache; the year filter is applied locally.
     Returns a list of RadarrMedia objects.
     """
     if not title or not str(title).strip():
         return []
     cfg = _get_config(db)
-    params = {"term": title, "apikey": cfg["headers"]["X-Api-Key"]}
-    r = requests.get(f"{cfg['url']}/api/v3/movie/lookup", params=params)
-    if r.status_code != 200:
-        print(f"Error looking up '{title}' on Radarr: {r.status_code}")
-        return []
+    results = db.get_lookup_cache("radarr", title) if db and use_cache else None
+    if results is None:
+        params = {"term": title, "apikey": cfg["headers"]["X-Api-Key"]}
+        r = _HTTP.get(f"{cfg['url']}/api/v3/movie/lookup", params=params)
+        if r.status_code != 200:
+            print(f"Error looking up '{title}' on Radarr: {r.status_code}")
+            return []
+        results = [_lookup_entry(m) for m in r.json()]
+        if db:
+            db.set_lookup_cache("radarr", title, None, results)
 
-    results = r.json()
     if year:
         results = [m for m in results if m.get("year") == year]
 
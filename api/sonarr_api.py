@@ -1,8 +1,10 @@
 import requests
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Optional
 from core import db_core
+from core import http_core
+from core.cache_core import SnapshotCache
 
 # ===== CONFIG =====
 SONARR_URL = "REMOVED"
@@ -11,8 +13,11 @@ PROFILE_ID = 1           # Quality profile
 ENABLE_SEARCH = False     # True per far partire la ricerca automatica su Sonarr
 ROOT_FOLDER = "/data/File Sharing/sonarr"
 REQUEST_TIMEOUT = 8
+LIBRARY_CACHE_TTL = 300  # secondi di validita dello snapshot della libreria Sonarr
 # ==================
 
+_HTTP = http_core.get_client("sonarr")
+
 def _get_config(db: db_core.MediaDB | None = None) -> dict:
     cfg = db.get_service_config("Sonarr") if db else {}
     url = cfg.get("sonarr_url") or SONARR_URL
@@ -41,47 +46,144 @@ class SonarrMedia:
     seasons: list[dict] | None = None
     path: str | None = None
 
+def _series_from_raw(s: dict, root_folder: str | None = None) -> SonarrMedia:
+    return SonarrMedia(
+        title=s.get("title"),
+        year=s.get("year"),
+        tvdb_id=s.get("tvdbId"),
+        imdb_id=s.get("imdbId"),
+        root_folder=s.get("rootFolderPath", root_folder),
+        monitored=s.get("monitored", True),
+        slug=s.get("titleSlug", None),
+        seasons=s.get("seasons"),
+        path=s.get("path")
+    )
+
+
+def _title_year_key(title: str | None, year: int | None) -> tuple[str, int | None]:
+    return ((title or "").strip().lower(), year)
+
+
+# --- Library snapshot ---
+@dataclass
+class SonarrLibrary:
+    raw: list[dict]
+    series: list[SonarrMedia]
+    by_tvdb: dict[str, SonarrMedia] = field(default_factory=dict)
+    by_imdb: dict[str, SonarrMedia] = field(default_factory=dict)
+    by_title_year: dict[tuple[str, int | None], SonarrMedia] = field(default_factory=dict)
+    by_title: dict[str, SonarrMedia] = field(default_factory=dict)
+    raw_by_tvdb: dict[str, dict] = field(default_factory=dict)
+    root_folder: str | None = None
+    fetched_at: float = 0.0
+
+
+def _build_library(raw_series: list[dict], root_folder: str | None, fetched_at: float | None = None) -> SonarrLibrary:
+    library = SonarrLibrary(raw=raw_series, series=[], root_folder=root_folder, fetched_at=fetched_at or time.time())
+    for s in raw_series:
+        media = _series_from_raw(s, root_folder)
+        library.series.append(media)
+        if media.tvdb_id:
+            library.by_tvdb[str(media.tvdb_id)] = media
+            library.raw_by_tvdb[str(media.tvdb_id)] = s
+        if media.imdb_id:
+            library.by_imdb[str(media.imdb_id)] = media
+        if media.title:
+            library.by_title_year.setdefault(_title_year_key(media.title, media.year), media)
+            library.by_title.setdefault(media.title, media)
+    return library
+
+
+def _fetch_library(cfg: dict) -> SonarrLibrary | None:
+    r = _HTTP.get(f"{cfg['url']}/api/v3/series", headers=cfg["headers"], timeout=REQUEST_TIMEOUT)
+    if r.status_code != 200:
+        print(f"Error fetching series from Sonarr: {r.status_code}")
+        return None
+    data = r.json()
+    return _build_library(data if isinstance(data, list) else [], cfg["root_folder"])
+
+
+_LIBRARY_CACHE: SnapshotCache[SonarrLibrary] = SnapshotCache(_fetch_library, LIBRARY_CACHE_TTL)
+
+
+def _library_key(cfg: dict) -> tuple[str, str]:
+    return (cfg["url"], cfg["headers"]["X-Api-Key"])
+
+
+_LIBRARY_LISTENERS: list = []
+
+
+def sonarr_add_library_listener(listener) -> None:
+    """Register listener(upsert, remove_id), called for every add/update/delete done through this module."""
+    _LIBRARY_LISTENERS.append(listener)
+
+
+def _patch_library(cfg: dict, upsert: dict | None = None, remove_id: int | None = None) -> None:
+    """Apply a single add/update/delete to the cached snapshot instead of refetching it."""
+    for listener in _LIBRARY_LISTENERS:
+        try:
+            listener(upsert, remove_id)
+        except Exception as exc:
+            print(f"Error notifying Sonarr library change: {exc}")
+    key = _library_key(cfg)
+    if upsert is not None and not upsert.get("id"):
+        _LIBRARY_CACHE.invalidate(key)
+        return
+    drop_ids = {remove_id, (upsert or {}).get("id")} - {None}
+
+    def _apply(library: SonarrLibrary) -> SonarrLibrary:
+        raw = [s for s in library.raw if s.get("id") not in drop_ids]
+        if upsert is not None:
+            entry = upsert
+            previous = next((s for s in library.raw if s.get("id") == upsert.get("id")), None)
+            if previous and "statistics" not in entry and previous.get("statistics"):
+                entry = {**entry, "statistics": previous["statistics"]}
+            raw.append(entry)
+        return _build_library(raw, library.root_folder, library.fetched_at)
+
+    _LIBRARY_CACHE.update(key, _apply)
+
+
+def _response_json(r: requests.Response) -> dict | None:
+    try:
+        data = r.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
 # --- API Functions ---
-def sonarr_get_all_series(db: db_core.MediaDB | None = None) -> List[SonarrMedia]:
+def sonarr_get_library(db: db_core.MediaDB | None = None, force_refresh: bool = False) -> SonarrLibrary | None:
     """
-    Retrieve all series currently in Sonarr.
-    Returns a list of SonarrMedia objects.
+    Return the cached snapshot of the Sonarr library (series with statistics),
+    refreshing it when older than LIBRARY_CACHE_TTL. Concurrent callers share one download.
+    Returns None if Sonarr is unreachable and nothing is cached.
     """
     cfg = _get_config(db)
-    r = requests.get(f"{cfg['url']}/api/v3/series", headers=cfg["headers"], timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        print(f"Error fetching series from Sonarr: {r.status_code}")
-        return []
+    return _LIBRARY_CACHE.get(_library_key(cfg), cfg, force=force_refresh)
 
-    series_list = r.json()
-    result = []
-    for s in series_list:
-        media = SonarrMedia(
-            title=s.get("title"),
-            year=s.get("year"),
-            tvdb_id=s.get("tvdbId"),
-            imdb_id=s.get("imdbId"),
-            root_folder=s.get("rootFolderPath", cfg["root_folder"]),
-            monitored=s.get("monitored", True),
-            slug=s.get("titleSlug", None),
-            seasons=s.get("seasons"),
-            path=s.get("path")
-        )
-        result.append(media)
-    return result
+def sonarr_apply_library_change(db: db_core.MediaDB | None = None, upsert: dict | None = None, remove_id: int | None = None) -> None:
+    """Apply a change learned elsewhere (e.g. a webhook) to the snapshot and the library listeners."""
+    _patch_library(_get_config(db), upsert=upsert, remove_id=remove_id)
+
+def sonarr_invalidate_library(db: db_core.MediaDB | None = None) -> None:
+    _LIBRARY_CACHE.invalidate(_library_key(_get_config(db)))
+
+def sonarr_get_all_series(db: db_core.MediaDB | None = None, force_refresh: bool = False) -> List[SonarrMedia]:
+    """
+    Retrieve all series currently in Sonarr.
+    Returns a list of SonarrMedia objects.
+    """
+    library = sonarr_get_library(db, force_refresh)
+    return list(library.series) if library else []
 
 def sonarr_get_series_stats(db: db_core.MediaDB | None = None) -> list[dict]:
-    cfg = _get_config(db)
-    r = requests.get(f"{cfg['url']}/api/v3/series", headers=cfg["headers"], timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        print(f"Error fetching series stats from Sonarr: {r.status_code}")
-        return []
-    data = r.json()
-    return data if isinstance(data, list) else []
+    library = sonarr_get_library(db)
+    return list(library.raw) if library else []
 
 def sonarr_get_root_folders(db: db_core.MediaDB | None = None) -> list[dict]:
     cfg = _get_config(db)
-    r = requests.get(f"{cfg['url']}/api/v3/rootfolder", headers=cfg["headers"], timeout=REQUEST_TIMEOUT)
+    r = _HTTP.get(f"{cfg['url']}/api/v3/rootfolder", headers=cfg["headers"], timeout=REQUEST_TIMEOUT)
     if r.status_code != 200:
         print(f"Error fetching Sonarr root folders: {r.status_code}")
         return []
@@ -93,7 +195,7 @@ def sonarr_get_root_folders(db: db_core.MediaDB | None = None) -> list[dict]:
 
 def sonarr_get_quality_profiles(db: db_core.MediaDB | None = None) -> list[dict]:
     cfg = _get_config(db)
-    r = requests.get(f"{cfg['url']}/api/v3/qualityprofile", headers=cfg["headers"], timeout=REQUEST_TIMEOUT)
+    r = _HTTP.get(f"{cfg['url']}/api/v3/qualityprofile", headers=cfg["headers"], timeout=REQUEST_TIMEOUT)
     if r.status_code != 200:
         print(f"Error fetching Sonarr quality profiles: {r.status_code}")
         return []
@@ -108,17 +210,19 @@ def sonarr_get_by_title(title: str, db: db_core.MediaDB | None = None) -> Option
     Check if a series exists in Sonarr by title.
     Returns a SonarrMedia object or None if not found.
     """
-    all_series = sonarr_get_all_series(db)
-    for s in all_series:
-        if s.title == title:
-            return s
-    return None
+    library = sonarr_get_library(db)
+    if not library:
+        return None
+    return library.by_title.get(title)
 
 def sonarr_get_by_tvdb(tvdb_id: int, db: db_core.MediaDB | None = None) -> SonarrMedia | None:
     if not tvdb_id:
         return None
     cfg = _get_config(db)
-    r = requests.get(
+    library = _LIBRARY_CACHE.peek(_library_key(cfg))
+    if library:
+        return library.by_tvdb.get(str(tvdb_id))
+    r = _HTTP.get(
         f"{cfg['url']}/api/v3/series",
         headers=cfg["headers"],
         params={"tvdbId": tvdb_id},
@@ -147,7 +251,7 @@ def sonarr_get_by_imdb(imdb_id: str, db: db_core.MediaDB | None = None) -> Sonar
     if not imdb_id:
         return None
     cfg = _get_config(db)
-    r = requests.get(
+    r = _HTTP.get(
         f"{cfg['url']}/api/v3/series",
         headers=cfg["headers"],
         params={"imdbId": imdb_id},
@@ -177,7 +281,7 @@ def sonarr_lookup_by_tvdb(tvdb_id: int, db: db_core.MediaDB | None = None) -> So
         return None
     cfg = _get_config(db)
     params = {"term": f"tvdb:{tvdb_id}", "apikey": cfg["headers"]["X-Api-Key"]}
-    r = requests.get(f"{cfg['url']}/api/v3/series/lookup", params=params, timeout=REQUEST_TIMEOUT)
+    r = _HTTP.get(f"{cfg['url']}/api/v3/series/lookup", params=params, timeout=REQUEST_TIMEOUT)
     if r.status_code != 200:
         print(f"Error looking up TVDB ID {tvdb_id} on Sonarr: {r.status_code}")
         return None
@@ -200,7 +304,7 @@ def sonarr_get_by_id(series_id: int, db: db_core.MediaDB | None = None) -> dict
     if not series_id:
         return None
     cfg = _get_config(db)
-    r = requests.get(f"{cfg['url']}/api/v3/series/{series_id}", headers=cfg["headers"], timeout=REQUEST_TIMEOUT)
+    r = _HTTP.get(f"{cfg['url']}/api/v3/series/{series_id}", headers=cfg["headers"], timeout=REQUEST_TIMEOUT)
     if r.status_code != 200:
         print(f"Error fetching series by ID {series_id}: {r.status_code}")
         return None
@@ -210,7 +314,7 @@ def sonarr_get_by_tvdb_raw(tvdb_id: int, db: db_core.MediaDB | None = None) -> d
     if not tvdb_id:
         return None
     cfg = _get_config(db)
-    r = requests.get(
+    r = _HTTP.get(
         f"{cfg['url']}/api/v3/series",
         headers=cfg["headers"],
         params={"tvdbId": tvdb_id},
@@ -230,7 +334,7 @@ def sonarr_update_series(series: dict, db: db_core.MediaDB | None = None, move_f
         return False
     cfg = _get_config(db)
     params = {"moveFiles": "true"} if move_files else None
-    r = requests.put(
+    r = _HTTP.put(
         f"{cfg['url']}/api/v3/series/{series_id}",
         headers=cfg["headers"],
         params=params,
@@ -240,6 +344,7 @@ def sonarr_update_series(series: dict, db: db_core.MediaDB | None = None, move_f
     if r.status_code not in (200, 202):
         print(f"Error updating series {series_id}: {r.status_code} {r.text}")
         return False
+    _patch_library(cfg, upsert=_response_json(r) or series)
     return True
 
 def sonarr_trigger_series_search(series_id: int, db: db_core.MediaDB | None = None) -> bool:
@@ -247,7 +352,7 @@ def sonarr_trigger_series_search(series_id: int, db: db_core.MediaDB | None = No
         return False
     cfg = _get_config(db)
     payload = {"name": "SeriesSearch", "seriesId": int(series_id)}
-    r = requests.post(
+    r = _HTTP.post(
         f"{cfg['url']}/api/v3/command",
         headers=cfg["headers"],
         json=payload,
@@ -269,7 +374,7 @@ def sonarr_set_monitor_all_seasons(series_id: int, db: db_core.MediaDB | None =
         season["monitored"] = True
     series["seasons"] = seasons
     cfg = _get_config(db)
-    r = requests.put(
+    r = _HTTP.put(
         f"{cfg['url']}/api/v3/series/{series_id}",
         headers=cfg["headers"],
         json=series,
@@ -278,13 +383,14 @@ def sonarr_set_monitor_all_seasons(series_id: int, db: db_core.MediaDB | None =
     if r.status_code != 202:
         print(f"Error monitoring seasons for series {series_id}: {r.status_code} {r.text}")
         return False
+    _patch_library(cfg, upsert=_response_json(r) or series)
     return True
 
 def sonarr_get_episodes(series_id: int, db: db_core.MediaDB | None = None) -> list[dict]:
     if not series_id:
         return []
     cfg = _get_config(db)
-    r = requests.get(
+    r = _HTTP.get(
         f"{cfg['url']}/api/v3/episode",
         headers=cfg["headers"],
         params={"seriesId": series_id},
@@ -299,7 +405,7 @@ def sonarr_set_episode_monitor(episode_ids: list[int], monitored: bool, db: db_c
     if not episode_ids:
         return True
     cfg = _get_config(db)
-    r = requests.put(
+    r = _HTTP.put(
         f"{cfg['url']}/api/v3/episode/monitor",
         headers=cfg["headers"],
         json={"episodeIds": episode_ids, "monitored": monitored},
@@ -308,6 +414,7 @@ def sonarr_set_episode_monitor(episode_ids: list[int], monitored: bool, db: db_c
     if r.status_code != 202:
         print(f"Error monitoring episodes {episode_ids[:5]}...: {r.status_code} {r.text}")
         return False
+    _LIBRARY_CACHE.invalidate(_library_key(cfg))
     return True
 
 def sonarr_monitor_specials_episodes(series_id: int, db: db_core.MediaDB | None = None) -> bool:
@@ -356,7 +463,7 @@ def sonarr_add_series(
         payload["imdbId"] = item.imdb_id
 
     print(f"Sonarr add payload (monitor_specials={monitor_specials}): {payload}")
-    r = requests.post(
+    r = _HTTP.post(
         f"{cfg['url']}/api/v3/series",
         headers=cfg["headers"],
         json=payload,
@@ -364,6 +471,7 @@ def sonarr_add_series(
     )
     if r.status_code == 201:
         print(f"Added to Sonarr: {item.title}")
+        _patch_library(cfg, upsert=_response_json(r) or {})
         if monitor_specials:
             try:
                 series_id = r.json().get("id")
@@ -392,19 +500,35 @@ def sonarr_add_series(
         print(f"Error adding {item.title}: {r.status_code} {r.text}")
         return False
 
-def sonarr_lookup(title: str, db: db_core.MediaDB | None = None) -> list[SonarrMedia]:
+def _lookup_entry(s: dict) -> dict:
+    # Solo i campi usati da SonarrMedia: il payload completo di /series/lookup e molto pesante
+    return {
+        "title": s.get("title"),
+        "tvdbId": s.get("tvdbId"),
+        "imdbId": s.get("imdbId"),
+        "year": s.get("year"),
+        "titleSlug": s.get("titleSlug"),
+        "seasons": s.get("seasons")
+    }
+
+def sonarr_lookup(title: str, db: db_core.MediaDB | None = None, use_cache: bool = True) -> list[SonarrMedia]:
     """
     Search Sonarr for a series by title using the lookup endpoint.
+    Results per term are kept in the persistent lookup cache.
     Returns a list of SonarrMedia objects.
     """
     cfg = _get_config(db)
-    params = {"term": title, "apikey": cfg["headers"]["X-Api-Key"]}
-    r = requests.get(f"{cfg['url']}/api/v3/series/lookup", params=params, timeout=REQUEST_TIMEOUT)
-    if r.status_code != 200:
-        print(f"Error looking up '{title}' on Sonarr: {r.status_code}")
-        return []
+    results = db.get_lookup_cache("sonarr", title) if db and use_cache and title else None
+    if results is None:
+        params = {"term": title, "apikey": cfg["headers"]["X-Api-Key"]}
+        r = _HTTP.get(f"{cfg['url']}/api/v3/series/lookup", params=params, timeout=REQUEST_TIMEOUT)
+        if r.status_code != 200:
+            print(f"Error looking up '{title}' on Sonarr: {r.status_code}")
+            return []
+        results = [_lookup_entry(s) for s in r.json()]
+        if db and title:
+            db.set_lookup_cache("sonarr", title, None, results)
 
-    results = r.json()
     media_list = []
     for s in results:
         media_list.append(SonarrMedia(
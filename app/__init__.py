@@ -1,8 +1,8 @@
 import os
 from flask import Flask
 
-from app.extensions import db
-from app.routes import animeworld, dashboard, ddunlimited, imports, plex, radarr, settings, sonarr, wanted
+from app.extensions import arr_sync, db
+from app.routes import animeworld, dashboard, ddunlimited, imports, plex, radarr, settings, sonarr, wanted, webhooks
 
 
 def create_app() -> Flask:
@@ -21,5 +21,15 @@ def create_app() -> Flask:
     app.register_blueprint(animeworld.bp)
     app.register_blueprint(ddunlimited.bp)
     app.register_blueprint(plex.bp)
+    app.register_blueprint(webhooks.bp)
+
+    @app.before_request
+    def _bind_db_connection():
+        db.begin_request()
+        arr_sync.ensure_started()
+
+    @app.teardown_request
+    def _release_db_connection(exc):
+        db.end_request()
 
     return app
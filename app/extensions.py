@@ -1,3 +1,11 @@
+from core.arr_sync_core import ArrSync
+from core.dashboard_core import DashboardStats
 from core.db_core import MediaDB
+from core.wanted_core import WantedIndex
 
 db = MediaDB()
+wanted_index = WantedIndex(db)
+dashboard_stats = DashboardStats(db)
+arr_sync = ArrSync(db)
+# Contatori della dashboard ricalcolati appena la copia locale di Radarr/Sonarr cambia
+arr_sync.add_listener(lambda service: dashboard_stats.request_arr_refresh())
@@ -7,3 +7,4 @@ from app.routes import radarr
 from app.routes import settings
 from app.routes import sonarr
 from app.routes import wanted
+from app.routes import webhooks
@@ -1,7 +1,7 @@
 from flask import Blueprint, abort, redirect, render_template, request, url_for, flash
 
 from api import animeworld_api as aw_api
-from app.extensions import db
+from app.extensions import db, wanted_index
 from app.utils import build_animeworld_media
 
 bp = Blueprint("animeworld", __name__)
@@ -15,32 +15,6 @@ def animeworld_view():
         query = request.form.get("search_query")
 
     if query:
-        wanted_items = db.get_wanted_items(limit=None)
-        wanted_by_aw = {item.external_ids.get("animeworld") for item in wanted_items if item.external_ids.get("animeworld")}
-        wanted_by_anilist = {item.external_ids.get("anilist") for item in wanted_items if item.external_ids.get("anilist")}
-        wanted_by_mal = {item.external_ids.get("mal") for item in wanted_items if item.external_ids.get("mal")}
-
-        def _normalize_title(value: str) -> str:
-            if not value:
-                return ""
-            cleaned = "".join(ch for ch in value.lower() if ch.isalnum() or ch.isspace()).strip()
-            return " ".join(cleaned.split())
-
-        wanted_title_year = set()
-        wanted_title_only = set()
-        for item in wanted_items:
-            title = _normalize_title(item.title or "")
-            if title:
-                wanted_title_only.add(title)
-                if item.year:
-                    wanted_title_year.add((title, int(item.year)))
-            if item.original_title:
-                orig = _normalize_title(item.original_title)
-                if orig:
-                    wanted_title_only.add(orig)
-                    if item.year:
-                        wanted_title_year.add((orig, int(item.year)))
-
         results = aw_api.find(query)
         search_results = [
             aw_api.AWMedia(r)
@@ -50,25 +24,15 @@ def animeworld_view():
             flash(f"Nessun risultato trovato per '{query}'")
 
         for a in search_results:
-            exists = str(a.source_id) in wanted_by_aw
+            exists = wanted_index.has_external("animeworld", a.source_id)
             if not exists and a.anilist_id:
-                exists = str(a.anilist_id) in wanted_by_anilist
+                exists = wanted_index.has_external("anilist", a.anilist_id)
             if not exists and a.mal_id:
-                exists = str(a.mal_id) in wanted_by_mal
+                exists = wanted_index.has_external("mal", a.mal_id)
             if not exists:
-                title_key = _normalize_title(a.title or "")
-                if title_key:
-                    if a.year:
-                        exists = (title_key, int(a.year)) in wanted_title_year
-                    else:
-                        exists = title_key in wanted_title_only
+                exists = wanted_index.has_loose_title(a.title, a.year)
             if not exists and a.original_title:
-                orig_key = _normalize_title(a.original_title)
-                if orig_key:
-                    if a.year:
-                        exists = (orig_key, int(a.year)) in wanted_title_year
-                    else:
-                        exists = orig_key in wanted_title_only
+                exists = wanted_index.has_loose_title(a.original_title, a.year)
             a.status = "wanted" if exists else "new"
 
     return render_template("animeworld.html", results=search_results, query=query)
@@ -86,11 +50,12 @@ def add_wanted_anime_route():
 
     media = build_animeworld_media(request.form)
 
-    media_item_id, inserted = db.add_media(media)
-    db.add_external_id(media_item_id, "animeworld", str(anime_id))
-    if anilist_id:
-        db.add_external_id(media_item_id, "anilist", str(anilist_id))
-        db.add_external_id(media_item_id, "anilist_link", f"https://anilist.co/anime/{anilist_id}")
+    with db.transaction():
+        media_item_id, inserted = db.add_media(media)
+        db.add_external_id(media_item_id, "animeworld", str(anime_id))
+        if anilist_id:
+            db.add_external_id(media_item_id, "anilist", str(anilist_id))
+            db.add_external_id(media_item_id, "anilist_link", f"https://anilist.co/anime/{anilist_id}")
     flash(
         f"Anime {'aggiunto ai' if inserted else 'gia nei'} wanted: {media.title}",
         "success" if inserted else "info"
@@ -1,7 +1,7 @@
 from flask import Blueprint, abort, jsonify, redirect, render_template, request, url_for, flash
 
 from api import ddunlimited_api as ddu_api
-from app.extensions import db
+from app.extensions import db, wanted_index
 from app.utils import build_ddunlimited_media
 
 bp = Blueprint("ddunlimited", __name__)
@@ -11,28 +11,22 @@ bp = Blueprint("ddunlimited", __name__)
 def ddunlimited_view():
     search_results = []
     query = request.args.get("q")
-    cache_status = ddu_api.get_cache_status()
+    cache_status = ddu_api.get_cache_status(db)
 
     if request.method == "POST":
         query = request.form.get("search_query")
 
     if query:
-        wanted_items = db.get_wanted_items(limit=None)
-        wanted_by_ddun = {
-            item.external_ids.get("ddunlimited")
-            for item in wanted_items
-            if item.external_ids.get("ddunlimited")
-        }
-
         results = ddu_api.search_lists(query, db)
         for item in results:
-            if item.topic_id and str(item.topic_id) in wanted_by_ddun:
+            if wanted_index.has_external("ddunlimited", item.topic_id):
                 item.source_name = item.source_name or "DDUnlimited"
                 item.info = item.info or ""
                 item.status = "wanted"
             else:
                 item.status = "new"
         search_results = results
+        ddu_api.prefetch_releases(results, db)
 
         if not search_results:
             flash(f"Nessun risultato trovato per '{query}'", "warning")
@@ -55,10 +49,11 @@ def add_wanted_ddunlimited():
         return redirect(url_for("ddunlimited.ddunlimited_view", q=search_query) if search_query else url_for("ddunlimited.ddunlimited_view"))
 
     media = build_ddunlimited_media(request.form)
-    media_item_id, inserted = db.add_media(media)
-    if topic_id:
-        db.add_external_id(media_item_id, "ddunlimited", str(topic_id))
-    db.add_external_id(media_item_id, "ddunlimited_link", detail_url)
+    with db.transaction():
+        media_item_id, inserted = db.add_media(media)
+        if topic_id:
+            db.add_external_id(media_item_id, "ddunlimited", str(topic_id))
+        db.add_external_id(media_item_id, "ddunlimited_link", detail_url)
 
     flash(
         f"Elemento {'aggiunto ai' if inserted else 'gia nei'} wanted: {media.title}",
@@ -125,9 +120,9 @@ def ddunlimited_sources_test(source_id: int):
     source = db.get_ddunlimited_source(source_id)
     if not source:
         return jsonify({"ok": False, "error": "not_found"}), 404
-    session, cfg = ddu_api._build_session(db)
+    client = ddu_api._get_client(db)
     try:
-        html = ddu_api._fetch_html(source["url"], session)
+        html = ddu_api._fetch_html(source["url"], client)
         source_obj = ddu_api.DDUListSource(
             name=source["name"],
             url=source["url"],
@@ -136,7 +131,7 @@ def ddunlimited_sources_test(source_id: int):
             quality=source.get("quality"),
             language=source.get("language")
         )
-        items = ddu_api.parse_list_page(html, source_obj, cfg["base_url"])
+        items = ddu_api.parse_list_page_pooled(html, source_obj, client.base_url)
         count = len(items)
         db.set_ddunlimited_source_stats(source_id, count)
         return jsonify({"ok": True, "count": count})
@@ -149,18 +144,20 @@ def ddunlimited_ed2k_api():
     detail_url = (request.args.get("url") or "").strip()
     if not detail_url or "ddunlimited.net" not in detail_url:
         abort(400)
-    detail = ddu_api.get_release_ed2k(detail_url, db)
+    refresh = request.args.get("refresh") in ("1", "true", "yes")
+    detail = ddu_api.get_release_ed2k(detail_url, db, refresh=refresh)
     return jsonify(detail)
 
 
 @bp.route("/api/ddunlimited/cache/status", methods=["GET"])
 def ddunlimited_cache_status():
-    return jsonify(ddu_api.get_cache_status())
+    return jsonify(ddu_api.get_cache_status(db))
 
 
 @bp.route("/api/ddunlimited/cache/refresh", methods=["POST"])
 def ddunlimited_cache_refresh():
-    result = ddu_api.start_refresh(db)
+    force = request.args.get("force") in ("1", "true", "yes")
+    result = ddu_api.start_refresh(db, force=force)
     status = 200 if result.get("ok") else 500
     return jsonify(result), status
 
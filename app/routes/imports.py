@@ -8,7 +8,7 @@ from flask import Blueprint, render_template
 from api import radarr_api
 from api import plex_db_api
 from api import sonarr_api
-from app.extensions import db
+from app.extensions import db, wanted_index
 from app.utils import allowed_file, get_uploaded_file, save_uploaded_file
 from core.db_core import Media
 
@@ -92,29 +92,6 @@ def _sonarr_find_best(title: str, year: int | None) -> dict | None:
     }
 
 
-def _wanted_key(title: str, year: int | None) -> tuple[str, int | None]:
-    return ((title or "").strip().lower(), year)
-
-
-def _get_wanted_keys() -> set[tuple[str, int | None]]:
-    wanted = db.get_wanted_items(limit=1000000)
-    return {_wanted_key(item.title, item.year) for item in wanted if item.title}
-
-def _get_wanted_index() -> dict[tuple[str, int | None], list[dict]]:
-    wanted = db.get_wanted_items(limit=1000000)
-    index: dict[tuple[str, int | None], list[dict]] = {}
-    for item in wanted:
-        if not item.title:
-            continue
-        key = _wanted_key(item.title, item.year)
-        index.setdefault(key, []).append({
-            "id": item.id,
-            "title": item.title,
-            "year": item.year,
-            "media_type": item.media_type,
-            "category": item.category
-        })
-    return index
 def _parse_bool(value: str | None, default: bool = False) -> bool:
     if value is None:
         return default
@@ -130,8 +107,6 @@ def _build_preview(
     skip_radarr: bool,
     skip_sonarr: bool
 ) -> dict:
-    wanted_index = _get_wanted_index()
-    wanted_keys = set(wanted_index.keys())
     radarr_cache: dict[tuple[str, int | None], dict | None] = {}
     sonarr_cache: dict[tuple[str, int | None], dict | None] = {}
     radarr_tmdb = set()
@@ -146,14 +121,14 @@ def _build_preview(
             radarr_tmdb = {str(m.tmdb_id) for m in radarr_movies if m.tmdb_id}
             radarr_title_year = {_title_year_key(m.title, m.year) for m in radarr_movies if m.title}
         for pm in plex_db_api.plex_get_media_by_mediatype(filepath, plex_db_api.MOVIE_MEDIATYPE):
-            if _wanted_key(pm.title, pm.year) in wanted_keys:
-                key = _wanted_key(pm.title, pm.year)
+            wanted_matches = wanted_index.items_for_title(pm.title, pm.year)
+            if wanted_matches:
                 excluded.append({
                     "title": pm.title,
                     "year": pm.year,
                     "media_type": "movie",
                     "reason": "Gia in wanted",
-                    "matches": wanted_index.get(key, [])
+                    "matches": wanted_matches
                 })
                 continue
             if skip_radarr and (_title_year_key(pm.title, pm.year) in radarr_title_year):
@@ -198,14 +173,14 @@ def _build_preview(
             sonarr_tvdb = {str(s.tvdb_id) for s in sonarr_series if s.tvdb_id}
             sonarr_title_year = {_title_year_key(s.title, s.year) for s in sonarr_series if s.title}
         for pm in plex_db_api.plex_get_series(filepath):
-            if _wanted_key(pm.title, pm.year) in wanted_keys:
-                key = _wanted_key(pm.title, pm.year)
+            wanted_matches = wanted_index.items_for_title(pm.title, pm.year)
+            if wanted_matches:
                 excluded.append({
                     "title": pm.title,
                     "year": pm.year,
                     "media_type": "series",
                     "reason": "Gia in wanted",
-                    "matches": wanted_index.get(key, [])
+                    "matches": wanted_matches
                 })
                 continue
             if skip_sonarr and (_title_year_key(pm.title, pm.year) in sonarr_title_year):
@@ -273,13 +248,15 @@ def _start_preview_job(filepath: str, import_movies: bool, import_series: bool,
         }
 
     def _run_job():
+        with db.connection():
+            _run_job_steps()
+
+    def _run_job_steps():
         try:
             with _plex_jobs_lock:
                 _plex_jobs[job_id]["stage"] = "Lettura film Plex"
                 _plex_jobs[job_id]["updated_at"] = time.time()
             movies_raw = plex_db_api.plex_get_media_by_mediatype(filepath, plex_db_api.MOVIE_MEDIATYPE)
-            wanted_index = _get_wanted_index()
-            wanted_keys = set(wanted_index.keys())
             radarr_cache: dict[tuple[str, int | None], dict | None] = {}
             sonarr_cache: dict[tuple[str, int | None], dict | None] = {}
             radarr_tmdb = set()
@@ -303,14 +280,14 @@ def _start_preview_job(filepath: str, import_movies: bool, import_series: bool,
             excluded = []
             if import_movies:
                 for pm in movies_raw:
-                    if _wanted_key(pm.title, pm.year) in wanted_keys:
-                        key = _wanted_key(pm.title, pm.year)
+                    wanted_matches = wanted_index.items_for_title(pm.title, pm.year)
+                    if wanted_matches:
                         excluded.append({
                             "title": pm.title,
                             "year": pm.year,
                             "media_type": "movie",
                             "reason": "Gia in wanted",
-                            "matches": wanted_index.get(key, [])
+                            "matches": wanted_matches
                         })
                         with _plex_jobs_lock:
                             _plex_jobs[job_id]["processed"] += 1
@@ -371,14 +348,14 @@ def _start_preview_job(filepath: str, import_movies: bool, import_series: bool,
                 _plex_jobs[job_id]["updated_at"] = time.time()
             if import_series:
                 for pm in series_raw:
-                    if _wanted_key(pm.title, pm.year) in wanted_keys:
-                        key = _wanted_key(pm.title, pm.year)
+                    wanted_matches = wanted_index.items_for_title(pm.title, pm.year)
+                    if wanted_matches:
                         excluded.append({
                             "title": pm.title,
                             "year": pm.year,
                             "media_type": "series",
                             "reason": "Gia in wanted",
-                            "matches": wanted_index.get(key, [])
+                            "matches": wanted_matches
                         })
                         with _plex_jobs_lock:
                             _plex_jobs[job_id]["processed"] += 1
@@ -527,36 +504,45 @@ def import_plex():
                     for pm in plex_db_api.plex_get_series(filepath):
                         all_items[pm.guid] = ("series", pm)
 
+                batch = []
                 for guid in selected:
                     media_type, pm = all_items.get(guid, (None, None))
                     if not pm:
                         report["skipped"].append(guid)
                         continue
-                    try:
-                        item = Media(
-                            id=None,
-                            title=pm.title,
-                            year=pm.year,
-                            media_type=media_type,
-                            category=None,
-                            source="plex db",
-                            source_ref=pm.file_path
-                        )
-                        media_id, inserted = db.add_media(item)
-                        if inserted:
-                            if media_type == "movie":
-                                tmdb_id = tmdb_map.get(guid)
-                                if tmdb_id:
-                                    db.add_external_id(media_id, "tmdb", str(tmdb_id))
-                            if media_type == "series":
-                                tvdb_id = tvdb_map.get(guid)
-                                if tvdb_id:
-                                    db.add_external_id(media_id, "tvdb", str(tvdb_id))
-                            report["imported"].append(pm)
-                        else:
-                            report["skipped"].append(pm)
-                    except Exception as e:
-                        report["errors"].append(f"{pm.title}: {str(e)}")
+                    batch.append((guid, media_type, pm))
+
+                try:
+                    with db.transaction():
+                        results = db.add_media_bulk([
+                            Media(
+                                id=None,
+                                title=pm.title,
+                                year=pm.year,
+                                media_type=media_type,
+                                category=None,
+                                source="plex db",
+                                source_ref=pm.file_path
+                            )
+                            for _, media_type, pm in batch
+                        ])
+                        imported = []
+                        skipped = []
+                        external_rows = []
+                        for (media_id, inserted), (guid, media_type, pm) in zip(results, batch):
+                            if not inserted:
+                                skipped.append(pm)
+                                continue
+                            if media_type == "movie" and tmdb_map.get(guid):
+                                external_rows.append((media_id, "tmdb", str(tmdb_map[guid])))
+                            if media_type == "series" and tvdb_map.get(guid):
+                                external_rows.append((media_id, "tvdb", str(tvdb_map[guid])))
+                            imported.append(pm)
+                        db.add_external_ids_bulk(external_rows)
+                    report["imported"].extend(imported)
+                    report["skipped"].extend(skipped)
+                except Exception as e:
+                    report["errors"].extend(f"{pm.title}: {str(e)}" for _, _, pm in batch)
 
     return render_template("import_plex.html", report=report, preview=preview, selected=selected)
 
@@ -597,6 +583,7 @@ def import_text():
             with open(filepath, "r", encoding="utf-8") as f:
                 lines = [line.strip() for line in f if line.strip()]
 
+            medias = []
             for line in lines:
                 try:
                     if "(" in line and ")" in line:
@@ -606,23 +593,27 @@ def import_text():
                         title = line
                         year = None
 
-                    item = Media(
+                    medias.append(Media(
+                        id=None,
                         title=title,
                         year=year,
                         media_type="movie",
                         category=None,
                         source="text",
                         source_ref=filepath
-                    )
-                    media_id, inserted = db.add_media(item)
-                    if inserted:
-                        report["imported"].append(title)
-                    else:
-                        report["skipped"].append(title)
-
+                    ))
                 except Exception as e:
                     report["errors"].append(f"{line}: {str(e)}")
 
+            try:
+                for (media_id, inserted), item in zip(db.add_media_bulk(medias), medias):
+                    if inserted:
+                        report["imported"].append(item.title)
+                    else:
+                        report["skipped"].append(item.title)
+            except Exception as e:
+                report["errors"].extend(f"{item.title}: {str(e)}" for item in medias)
+
             return render_template("import_text.html", report=report)
 
     return render_template("import_text.html", report=report)
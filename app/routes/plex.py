@@ -1,7 +1,8 @@
 from flask import Blueprint, jsonify, render_template, request
 
-from api import plex_web_api, radarr_api, sonarr_api
-from app.extensions import db
+from api import plex_web_api
+from app.extensions import arr_sync, db, wanted_index
+from core.db_core import Media
 
 bp = Blueprint("plex", __name__)
 
@@ -24,31 +25,12 @@ def plex_media_details(rating_key):
 def plex_media_list():
     items = plex_web_api.plex_get_media_items(db)
     machine_id = plex_web_api.plex_get_machine_identifier(db)
-    radarr_movies = radarr_api.radarr_get_all_movies(db)
-    radarr_tmdb = {str(m.tmdb_id) for m in radarr_movies if m.tmdb_id}
-    radarr_titles = {((m.title or "").strip().lower(), m.year) for m in radarr_movies if m.title}
-
-    sonarr_series = sonarr_api.sonarr_get_all_series(db)
-    sonarr_tvdb = {str(s.tvdb_id) for s in sonarr_series if s.tvdb_id}
-    sonarr_titles = {((s.title or "").strip().lower(), s.year) for s in sonarr_series if s.title}
-
-    wanted_items = db.get_wanted_items(limit=1000000)
-    wanted_tmdb = set()
-    wanted_tvdb = set()
-    wanted_movie_titles = set()
-    wanted_series_titles = set()
-    for item in wanted_items:
-        tmdb_id = item.external_ids.get("tmdb") or item.external_ids.get("radarr")
-        if tmdb_id:
-            wanted_tmdb.add(str(tmdb_id))
-        tvdb_id = item.external_ids.get("tvdb") or item.external_ids.get("sonarr")
-        if tvdb_id:
-            wanted_tvdb.add(str(tvdb_id))
-        title_key = ((item.title or "").strip().lower(), item.year)
-        if item.media_type == "movie":
-            wanted_movie_titles.add(title_key)
-        else:
-            wanted_series_titles.add(title_key)
+    arr_state = arr_sync.get_arr_state()
+    radarr_tmdb = arr_state["radarr_tmdb"]
+    radarr_titles = arr_state["radarr_title_year"]
+    sonarr_tvdb = arr_state["sonarr_tvdb"]
+    sonarr_titles = arr_state["sonarr_title_year"]
+
 
     payload = []
     movies = 0
@@ -66,18 +48,13 @@ def plex_media_list():
         elif ((m.title or "").strip().lower(), m.year) in sonarr_titles:
             in_sonarr = True
 
-        in_wanted = False
         plex_type = "movie" if m.media_type == "movie" else "series"
         if plex_type == "movie":
-            if m.tmdb_id and m.tmdb_id in wanted_tmdb:
-                in_wanted = True
-            elif ((m.title or "").strip().lower(), m.year) in wanted_movie_titles:
-                in_wanted = True
+            in_wanted = wanted_index.has_external(("tmdb", "radarr"), m.tmdb_id)
         else:
-            if m.tvdb_id and m.tvdb_id in wanted_tvdb:
-                in_wanted = True
-            elif ((m.title or "").strip().lower(), m.year) in wanted_series_titles:
-                in_wanted = True
+            in_wanted = wanted_index.has_external(("tvdb", "sonarr"), m.tvdb_id)
+        if not in_wanted:
+            in_wanted = wanted_index.has_title(m.title, m.year, plex_type)
 
         if m.media_type == "movie":
             movies += 1
@@ -119,6 +96,8 @@ def plex_add_wanted():
 
     added = 0
     skipped = 0
+    medias = []
+    valid_items = []
     for item in items:
         title = (item.get("title") or "").strip()
         if not title:
@@ -135,7 +114,7 @@ def plex_add_wanted():
         library = item.get("library") or ""
         source_ref = f"plex:{library}:{rating_key}" if rating_key else None
 
-        media = db_core.Media(
+        medias.append(Media(
             id=None,
             title=title,
             year=year,
@@ -145,20 +124,27 @@ def plex_add_wanted():
             source_ref=source_ref,
             original_title=None,
             language=None
-        )
-        media_id, inserted = db.add_media(media)
-        if inserted:
-            added += 1
-        else:
-            skipped += 1
-
-        tmdb_id = item.get("tmdb_id")
-        tvdb_id = item.get("tvdb_id")
-        if tmdb_id and not db.has_external_id("tmdb", str(tmdb_id)):
-            db.add_external_id(media_id, "tmdb", str(tmdb_id))
-        if tvdb_id and not db.has_external_id("tvdb", str(tvdb_id)):
-            db.add_external_id(media_id, "tvdb", str(tvdb_id))
-        if rating_key and not db.has_external_id("plex", str(rating_key)):
-            db.add_external_id(media_id, "plex", str(rating_key))
+        ))
+        valid_items.append(item)
+
+    with db.transaction():
+        results = db.add_media_bulk(medias)
+        external_rows = []
+        for (media_id, inserted), item in zip(results, valid_items):
+            if inserted:
+                added += 1
+            else:
+                skipped += 1
+
+            rating_key = item.get("rating_key")
+            tmdb_id = item.get("tmdb_id")
+            tvdb_id = item.get("tvdb_id")
+            if tmdb_id:
+                external_rows.append((media_id, "tmdb", str(tmdb_id)))
+            if tvdb_id:
+                external_rows.append((media_id, "tvdb", str(tvdb_id)))
+            if rating_key:
+                external_rows.append((media_id, "plex", str(rating_key)))
+        db.add_external_ids_bulk(external_rows)
 
     return jsonify({"ok": True, "added": added, "skipped": skipped})
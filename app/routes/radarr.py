@@ -1,7 +1,7 @@
 from flask import Blueprint, jsonify, render_template, request
 
 from api import radarr_api
-from app.extensions import db
+from app.extensions import db, wanted_index
 from core.db_core import Media
 
 bp = Blueprint("radarr", __name__)
@@ -22,7 +22,8 @@ def radarr_options():
 
 @bp.route("/api/radarr/list")
 def radarr_list():
-    movies = radarr_api.radarr_get_all_movies(db)
+    force_refresh = request.args.get("refresh") in ("1", "true", "yes")
+    movies = radarr_api.radarr_get_all_movies(db, force_refresh=force_refresh)
     items = []
     monitored = 0
     downloaded = 0
@@ -54,27 +55,16 @@ def radarr_list():
 @bp.route("/api/radarr/sync/preview")
 def radarr_sync_preview():
     movies = radarr_api.radarr_get_all_movies(db)
-    wanted_items = db.get_wanted_items(limit=1000000)
-    wanted_by_tmdb = set()
-    wanted_by_title_year = set()
-    for item in wanted_items:
-        tmdb_id = item.external_ids.get("tmdb") or item.external_ids.get("radarr")
-        if tmdb_id:
-            wanted_by_tmdb.add(str(tmdb_id))
-        title_key = (item.title or "").strip().lower()
-        wanted_by_title_year.add((title_key, item.year))
 
     missing = []
     present = []
     for movie in movies:
-        tmdb_id = str(movie.tmdb_id) if movie.tmdb_id else None
-        title_key = (movie.title or "").strip().lower()
         in_wanted = False
         match_type = None
-        if tmdb_id and tmdb_id in wanted_by_tmdb:
+        if wanted_index.has_external(("tmdb", "radarr"), movie.tmdb_id):
             in_wanted = True
             match_type = "tmdb"
-        elif (title_key, movie.year) in wanted_by_title_year:
+        elif wanted_index.has_title(movie.title, movie.year):
             in_wanted = True
             match_type = "title_year"
 
@@ -112,6 +102,8 @@ def radarr_sync_import():
     imported = 0
     skipped = 0
     errors = 0
+    medias = []
+    ids = []
     for item in items:
         title = (item.get("title") or "").strip()
         year = item.get("year")
@@ -120,28 +112,36 @@ def radarr_sync_import():
         if not title:
             skipped += 1
             continue
-        try:
-            media = Media(
-                id=None,
-                title=title,
-                year=year,
-                media_type="movie",
-                category=None,
-                source="radarr",
-                source_ref=str(tmdb_id) if tmdb_id else None
-            )
-            media_id, inserted = db.add_media(media)
-            if inserted:
+        medias.append(Media(
+            id=None,
+            title=title,
+            year=year,
+            media_type="movie",
+            category=None,
+            source="radarr",
+            source_ref=str(tmdb_id) if tmdb_id else None
+        ))
+        ids.append((tmdb_id, imdb_id))
+
+    try:
+        with db.transaction():
+            results = db.add_media_bulk(medias)
+            external_rows = []
+            for (media_id, inserted), (tmdb_id, imdb_id) in zip(results, ids):
+                if not inserted:
+                    continue
                 if tmdb_id:
-                    db.add_external_id(media_id, "tmdb", str(tmdb_id))
-                    db.add_external_id(media_id, "radarr", str(tmdb_id))
+                    external_rows.append((media_id, "tmdb", str(tmdb_id)))
+                    external_rows.append((media_id, "radarr", str(tmdb_id)))
                 if imdb_id:
-                    db.add_external_id(media_id, "imdb", str(imdb_id))
+                    external_rows.append((media_id, "imdb", str(imdb_id)))
                 imported += 1
-            else:
-                skipped += 1
-        except Exception:
-            errors += 1
+            db.add_external_ids_bulk(external_rows)
+        skipped += len(medias) - imported
+    except Exception as exc:
+        print(f"Error importing Radarr items: {exc}")
+        imported = 0
+        errors += len(medias)
 
     return jsonify({
         "ok": True,
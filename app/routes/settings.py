@@ -1,12 +1,12 @@
 import os
-import requests
 from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
 
 from api import ddunlimited_api
 from api import emule_api
 from api import radarr_api
 from api import sonarr_api
-from app.extensions import db
+from app.extensions import arr_sync, db, wanted_index
+from core import http_core
 
 bp = Blueprint("settings", __name__)
 
@@ -19,7 +19,7 @@ def _test_radarr(cfg: dict[str, str]) -> tuple[bool, str]:
     api_key = cfg.get("radarr_api_key") or ""
     if not url or not api_key:
         return False, "Radarr URL o API key mancanti."
-    r = requests.get(f"{url}/api/v3/system/status", headers={"X-Api-Key": api_key}, timeout=8)
+    r = http_core.get_client("radarr").get(f"{url}/api/v3/system/status", headers={"X-Api-Key": api_key}, timeout=8)
     return (r.status_code == 200, f"Radarr status: {r.status_code}")
 
 
@@ -28,7 +28,7 @@ def _test_sonarr(cfg: dict[str, str]) -> tuple[bool, str]:
     api_key = cfg.get("sonarr_api_key") or ""
     if not url or not api_key:
         return False, "Sonarr URL o API key mancanti."
-    r = requests.get(f"{url}/api/v3/system/status", headers={"X-Api-Key": api_key}, timeout=8)
+    r = http_core.get_client("sonarr").get(f"{url}/api/v3/system/status", headers={"X-Api-Key": api_key}, timeout=8)
     return (r.status_code == 200, f"Sonarr status: {r.status_code}")
 
 
@@ -37,7 +37,7 @@ def _test_plex(cfg: dict[str, str]) -> tuple[bool, str]:
     token = cfg.get("plex_web_token") or ""
     if not url or not token:
         return False, "Plex URL o token mancanti."
-    r = requests.get(f"{url}/library/sections", params={"X-Plex-Token": token}, timeout=8)
+    r = http_core.get_client("plex_web").get(f"{url}/library/sections", params={"X-Plex-Token": token}, timeout=8)
     return (r.status_code == 200, f"Plex status: {r.status_code}")
 
 
@@ -45,7 +45,7 @@ def _test_animeworld(cfg: dict[str, str]) -> tuple[bool, str]:
     url = (cfg.get("animeworld_url") or "").rstrip("/")
     if not url:
         return False, "AnimeWorld URL mancante."
-    r = requests.get(url, timeout=8)
+    r = http_core.get_client("animeworld").get(url, timeout=8)
     return (r.status_code < 400, f"AnimeWorld status: {r.status_code}")
 
 
@@ -73,6 +73,39 @@ def _test_emule(cfg: dict[str, str]) -> tuple[bool, str]:
     return False, "Cartella incoming non trovata."
 
 
+@bp.route("/api/settings/db/pool")
+def settings_db_pool():
+    return jsonify({"ok": True, "pool": db.pool_stats()})
+
+
+@bp.route("/api/settings/lookup_cache/clear", methods=["POST"])
+def settings_lookup_cache_clear():
+    service = request.args.get("service") or None
+    return jsonify({"ok": True, "removed": db.clear_lookup_cache(service)})
+
+
+@bp.route("/api/settings/arr_sync")
+def settings_arr_sync():
+    return jsonify({"ok": True, "sync": arr_sync.status()})
+
+
+@bp.route("/api/settings/arr_sync/run", methods=["POST"])
+def settings_arr_sync_run():
+    arr_sync.request_sync()
+    return jsonify({"ok": True, "sync": arr_sync.status()})
+
+
+@bp.route("/api/settings/wanted_index")
+def settings_wanted_index():
+    return jsonify({"ok": True, "index": wanted_index.stats()})
+
+
+@bp.route("/api/settings/wanted_index/rebuild", methods=["POST"])
+def settings_wanted_index_rebuild():
+    wanted_index.rebuild()
+    return jsonify({"ok": True, "index": wanted_index.stats()})
+
+
 @bp.route("/settings", methods=["GET", "POST"])
 def settings_view():
     services = db.get_services()
@@ -1,7 +1,7 @@
 from flask import Blueprint, jsonify, render_template, request
 
 from api import sonarr_api
-from app.extensions import db
+from app.extensions import db, wanted_index
 from core.db_core import Media
 
 bp = Blueprint("sonarr", __name__)
@@ -18,7 +18,8 @@ def sonarr_view():
 
 @bp.route("/api/sonarr/list")
 def sonarr_list():
-    series = sonarr_api.sonarr_get_all_series(db)
+    force_refresh = request.args.get("refresh") in ("1", "true", "yes")
+    series = sonarr_api.sonarr_get_all_series(db, force_refresh=force_refresh)
     monitored = 0
     unmonitored = 0
     items = []
@@ -56,20 +57,13 @@ def sonarr_options():
 @bp.route("/api/sonarr/sync/preview")
 def sonarr_sync_preview():
     series = sonarr_api.sonarr_get_all_series(db)
-    wanted_items = db.get_wanted_items(limit=1000000)
-    wanted_by_tvdb = set()
-    for item in wanted_items:
-        tvdb_id = item.external_ids.get("tvdb") or item.external_ids.get("sonarr")
-        if tvdb_id:
-            wanted_by_tvdb.add(str(tvdb_id))
 
     missing = []
     present = []
     for s in series:
-        tvdb_id = str(s.tvdb_id) if s.tvdb_id else None
         in_wanted = False
         match_type = None
-        if tvdb_id and tvdb_id in wanted_by_tvdb:
+        if wanted_index.has_external(("tvdb", "sonarr"), s.tvdb_id):
             in_wanted = True
             match_type = "tvdb"
 
@@ -107,6 +101,8 @@ def sonarr_sync_import():
     imported = 0
     skipped = 0
     errors = 0
+    medias = []
+    ids = []
     for item in items:
         title = (item.get("title") or "").strip()
         year = item.get("year")
@@ -115,28 +111,36 @@ def sonarr_sync_import():
         if not title:
             skipped += 1
             continue
-        try:
-            media = Media(
-                id=None,
-                title=title,
-                year=year,
-                media_type="series",
-                category=None,
-                source="sonarr",
-                source_ref=str(tvdb_id) if tvdb_id else None
-            )
-            media_id, inserted = db.add_media(media)
-            if inserted:
+        medias.append(Media(
+            id=None,
+            title=title,
+            year=year,
+            media_type="series",
+            category=None,
+            source="sonarr",
+            source_ref=str(tvdb_id) if tvdb_id else None
+        ))
+        ids.append((tvdb_id, imdb_id))
+
+    try:
+        with db.transaction():
+            results = db.add_media_bulk(medias)
+            external_rows = []
+            for (media_id, inserted), (tvdb_id, imdb_id) in zip(results, ids):
+                if not inserted:
+                    continue
                 if tvdb_id:
-                    db.add_external_id(media_id, "tvdb", str(tvdb_id))
-                    db.add_external_id(media_id, "sonarr", str(tvdb_id))
+                    external_rows.append((media_id, "tvdb", str(tvdb_id)))
+                    external_rows.append((media_id, "sonarr", str(tvdb_id)))
                 if imdb_id:
-                    db.add_external_id(media_id, "imdb", str(imdb_id))
+                    external_rows.append((media_id, "imdb", str(imdb_id)))
                 imported += 1
-            else:
-                skipped += 1
-        except Exception:
-            errors += 1
+            db.add_external_ids_bulk(external_rows)
+        skipped += len(medias) - imported
+    except Exception as exc:
+        print(f"Error importing Sonarr items: {exc}")
+        imported = 0
+        errors += len(medias)
 
     return jsonify({
         "ok": True,
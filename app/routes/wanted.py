@@ -1,17 +1,25 @@
+import json
 import os
 import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
-from flask import Blueprint, jsonify, redirect, render_template, request, url_for, flash
+from flask import Blueprint, Response, jsonify, make_response, redirect, render_template, request, stream_with_context, url_for, flash
 
 from api import animeworld_api as aw_api
 from api import radarr_api
 from api import sonarr_api
-from app.extensions import db
+from app.extensions import arr_sync, db
 from app.utils import get_lookup_title, json_items
 from core.db_core import Media
 
 bp = Blueprint("wanted", __name__)
 
+# ===== CONFIG =====
+BULK_LOOKUP_WORKERS = int(os.environ.get("MMC_BULK_LOOKUP_WORKERS", "6"))  # lookup paralleli per richiesta bulk
+WANTED_PAGE_SIZE = int(os.environ.get("MMC_WANTED_PAGE_SIZE", "200"))      # righe della pagina wanted caricate per richiesta
+# ==================
+
 
 @bp.route("/wanted")
 def wanted_view():
@@ -28,38 +36,83 @@ def wanted_view():
     )
 
 
-@bp.route("/api/wanted/content")
-def wanted_content():
-    wanted_list = db.get_wanted_items(limit=None)
-    radarr_url = radarr_api.radarr_get_client(db)["url"]
-    radarr_movies = radarr_api.radarr_get_all_movies(db)
-    radarr_tmdb = {str(m.tmdb_id) for m in radarr_movies if m.tmdb_id}
-    radarr_downloaded = {str(m.tmdb_id) for m in radarr_movies if m.tmdb_id and m.has_file}
-    radarr_root_map = {str(m.tmdb_id): (m.root_folder or "") for m in radarr_movies if m.tmdb_id}
-    sonarr_url = sonarr_api.sonarr_get_client(db)["url"]
-    sonarr_series = sonarr_api.sonarr_get_all_series(db)
-    sonarr_tvdb = {str(s.tvdb_id) for s in sonarr_series if s.tvdb_id}
-    sonarr_slug_map = {str(s.tvdb_id): s.slug for s in sonarr_series if s.tvdb_id and s.slug}
-    sonarr_root_map = {str(s.tvdb_id): (s.root_folder or "") for s in sonarr_series if s.tvdb_id}
-    sonarr_series_stats = sonarr_api.sonarr_get_series_stats(db)
-    sonarr_downloaded = set()
-    sonarr_progress = {}
-    for s in sonarr_series_stats:
-        tvdb_id = s.get("tvdbId")
-        stats = s.get("statistics") or {}
-        episode_count = stats.get("episodeCount")
-        if episode_count is None:
-            episode_count = stats.get("totalEpisodeCount")
-        episode_file_count = stats.get("episodeFileCount") or 0
-        if tvdb_id:
-            sonarr_progress[str(tvdb_id)] = {
-                "downloaded": int(episode_file_count),
-                "total": episode_count if episode_count is not None else None,
-            }
-        if tvdb_id and episode_count and episode_file_count >= episode_count:
-            sonarr_downloaded.add(str(tvdb_id))
+def _parse_flag(value: str | None) -> bool | None:
+    if value is None or str(value).strip() == "":
+        return None
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_wanted_query(args) -> dict:
+    filters = {
+        "media_type": args.get("media_type") or None,
+        "category": args.get("category") or None,
+        "source": args.get("source") or None,
+        "q": args.get("q") or None,
+        "import_path": args.get("import_path") or None
+    }
+    for flag in ("has_tmdb", "has_tvdb", "in_radarr", "in_sonarr", "downloaded"):
+        filters[flag] = _parse_flag(args.get(flag))
+    try:
+        limit = int(args.get("limit") or WANTED_PAGE_SIZE)
+    except ValueError:
+        limit = WANTED_PAGE_SIZE
+    return {
+        "filters": filters,
+        "sort": args.get("sort") or "created_at",
+        "descending": (args.get("order") or "desc").lower() != "asc",
+        "limit": limit,
+        "cursor": args.get("cursor") or None
+    }
+
+
+def _get_arr_state() -> dict:
+    return arr_sync.get_arr_state()
+
+
+def _load_wanted_page(args, arr_state: dict | None = None) -> dict:
+    query = _parse_wanted_query(args)
+    if query["filters"]["downloaded"] is not None:
+        if arr_state is None:
+            arr_state = _get_arr_state()
+        query["filters"]["downloaded_ids"] = {
+            "tmdb": list(arr_state["radarr_downloaded"]),
+            "tvdb": list(arr_state["sonarr_downloaded"])
+        }
+    return db.get_wanted_page(**query)
+
+
+def _serialize_wanted(item: Media) -> dict:
+    return {
+        "id": item.id,
+        "title": item.title,
+        "original_title": item.original_title,
+        "year": item.year,
+        "media_type": item.media_type,
+        "category": item.category,
+        "source": item.source,
+        "language": item.language,
+        "created_at": item.created_at.isoformat() if item.created_at else None,
+        "external_ids": item.external_ids,
+        "in_radarr": "radarr" in item.external_ids,
+        "in_sonarr": "sonarr" in item.external_ids
+    }
+
+
+@bp.route("/api/wanted/items")
+def wanted_items_page():
+    page = _load_wanted_page(request.args)
+    return jsonify({
+        "ok": True,
+        "items": [_serialize_wanted(item) for item in page["items"]],
+        "next_cursor": page["next_cursor"],
+        "has_more": page["next_cursor"] is not None
+    })
+
+
+def _wanted_rows_context(items: list[Media], arr_state: dict) -> dict:
+    """Template variables of partials/wanted_rows.html for one page of items."""
     import_paths = {}
-    for item in wanted_list:
+    for item in items:
         if item.source != "plex db" or not item.source_ref:
             continue
         ref = item.source_ref.replace("/", "\\")
@@ -69,31 +122,79 @@ def wanted_content():
 
     radarr_cfg = db.get_service_config("Radarr")
     sonarr_cfg = db.get_service_config("Sonarr")
-    return render_template(
-        "partials/wanted_content.html",
-        items=wanted_list,
-        radarr_tmdb=radarr_tmdb,
-        radarr_downloaded=radarr_downloaded,
-        radarr_root_map=radarr_root_map,
-        sonarr_url=sonarr_url,
-        sonarr_tvdb=sonarr_tvdb,
-        sonarr_slug_map=sonarr_slug_map,
-        sonarr_downloaded=sonarr_downloaded,
-        sonarr_progress=sonarr_progress,
-        sonarr_root_map=sonarr_root_map,
-        import_paths=import_paths,
-        radarr_url=radarr_url,
-        radarr_defaults={
+    return {
+        "items": items,
+        "radarr_tmdb": arr_state["radarr_tmdb"],
+        "radarr_downloaded": arr_state["radarr_downloaded"],
+        "radarr_root_map": arr_state["radarr_root_map"],
+        "sonarr_url": sonarr_api.sonarr_get_client(db)["url"],
+        "sonarr_tvdb": arr_state["sonarr_tvdb"],
+        "sonarr_slug_map": arr_state["sonarr_slug_map"],
+        "sonarr_downloaded": arr_state["sonarr_downloaded"],
+        "sonarr_progress": arr_state["sonarr_progress"],
+        "sonarr_root_map": arr_state["sonarr_root_map"],
+        "import_paths": import_paths,
+        "radarr_url": radarr_api.radarr_get_client(db)["url"],
+        "radarr_defaults": {
             "root_folder": radarr_cfg.get("radarr_root_folder"),
             "profile_id": radarr_cfg.get("radarr_profile_id"),
             "enable_search": radarr_cfg.get("radarr_enable_search")
         },
-        sonarr_defaults={
+        "sonarr_defaults": {
             "root_folder": sonarr_cfg.get("sonarr_root_folder"),
             "profile_id": sonarr_cfg.get("sonarr_profile_id"),
             "enable_search": sonarr_cfg.get("sonarr_enable_search")
         }
-    )
+    }
+
+
+@bp.route("/api/wanted/content")
+def wanted_content():
+    """
+    Wanted table with the first page of items (same filters and cursor as /api/wanted/items),
+    the header counters and the import folders; wanted.js loads the next pages from
+    /api/wanted/rows while scrolling.
+    """
+    arr_state = _get_arr_state()
+    page = _load_wanted_page(request.args, arr_state)
+    response = make_response(render_template(
+        "partials/wanted_content.html",
+        stats=db.get_wanted_stats(),
+        import_path_options=db.get_wanted_import_paths(),
+        next_cursor=page["next_cursor"],
+        **_wanted_rows_context(page["items"], arr_state)
+    ))
+    response.headers["X-Next-Cursor"] = page["next_cursor"] or ""
+    return response
+
+
+@bp.route("/api/wanted/rows")
+def wanted_rows():
+    """Table rows of the next page (cursor from X-Next-Cursor), for the infinite scroll."""
+    arr_state = _get_arr_state()
+    page = _load_wanted_page(request.args, arr_state)
+    response = make_response(render_template(
+        "partials/wanted_rows.html",
+        **_wanted_rows_context(page["items"], arr_state)
+    ))
+    response.headers["X-Next-Cursor"] = page["next_cursor"] or ""
+    return response
+
+
+@bp.route("/api/wanted/stats")
+def wanted_stats():
+    return jsonify({"ok": True, "stats": db.get_wanted_stats()})
+
+
+def _load_media_items(raw_ids: list) -> dict[int, Media]:
+    """Batch-load the media items referenced by a bulk request (invalid ids are ignored)."""
+    ids = []
+    for raw_id in raw_ids:
+        try:
+            ids.append(int(raw_id))
+        except (TypeError, ValueError):
+            continue
+    return db.get_media_items(ids)
 
 
 @bp.route("/wanted/bulk_delete", methods=["POST"])
@@ -106,12 +207,13 @@ def wanted_bulk_delete():
         return redirect(url_for("wanted.wanted_view"))
 
     deleted = 0
-    for media_id in media_ids:
-        try:
-            if db.delete_media_item(int(media_id)):
-                deleted += 1
-        except ValueError:
-            continue
+    with db.transaction():
+        for media_id in media_ids:
+            try:
+                if db.delete_media_item(int(media_id)):
+                    deleted += 1
+            except ValueError:
+                continue
 
     if request.headers.get("X-Requested-With") == "XMLHttpRequest":
         return jsonify({"ok": True, "deleted": deleted})
@@ -289,11 +391,12 @@ def wanted_set_external(media_item_id):
     if not item:
         return jsonify({"ok": False, "error": "not_found"}), 404
 
-    db.add_external_id(media_item_id, source, str(external_id))
-    if source == "anilist":
-        db.add_external_id(media_item_id, "anilist_link", f"https://anilist.co/anime/{external_id}")
-    if source == "tvdb" and link:
-        db.add_external_id(media_item_id, "tvdb_link", link)
+    with db.transaction():
+        db.add_external_id(media_item_id, source, str(external_id))
+        if source == "anilist":
+            db.add_external_id(media_item_id, "anilist_link", f"https://anilist.co/anime/{external_id}")
+        if source == "tvdb" and link:
+            db.add_external_id(media_item_id, "tvdb_link", link)
 
     in_radarr = False
     in_sonarr = False
@@ -504,6 +607,7 @@ def wanted_bulk_add_radarr():
     radarr_movies = radarr_api.radarr_get_all_movies(db)
     existing_tmdb = {str(m.tmdb_id) for m in radarr_movies if m.tmdb_id}
 
+    media_items = _load_media_items(media_ids)
     added = 0
     skipped = 0
     errors = 0
@@ -517,7 +621,7 @@ def wanted_bulk_add_radarr():
             skipped += 1
             continue
 
-        item = db.get_media_item(media_id)
+        item = media_items.get(media_id)
         if not item or item.media_type != "movie":
             skipped += 1
             continue
@@ -578,6 +682,7 @@ def wanted_bulk_update_radarr():
     if not media_ids or not root_folder or not profile_id:
         return jsonify({"ok": False, "error": "missing_parameters"}), 400
 
+    media_items = _load_media_items(media_ids)
     updated = 0
     skipped = 0
     errors = 0
@@ -591,7 +696,7 @@ def wanted_bulk_update_radarr():
             skipped += 1
             continue
 
-        item = db.get_media_item(media_id)
+        item = media_items.get(media_id)
         if not item or item.media_type != "movie":
             skipped += 1
             skipped_ids.append(media_id)
@@ -651,6 +756,7 @@ def wanted_bulk_add_sonarr():
     sonarr_series = sonarr_api.sonarr_get_all_series(db)
     existing_tvdb = {str(s.tvdb_id) for s in sonarr_series if s.tvdb_id}
 
+    media_items = _load_media_items(media_ids)
     added = 0
     skipped = 0
     errors = 0
@@ -664,7 +770,7 @@ def wanted_bulk_add_sonarr():
             skipped += 1
             continue
 
-        item = db.get_media_item(media_id)
+        item = media_items.get(media_id)
         if not item or item.media_type != "series":
             skipped += 1
             continue
@@ -730,6 +836,7 @@ def wanted_bulk_update_sonarr():
     if not media_ids or not root_folder or not profile_id:
         return jsonify({"ok": False, "error": "missing_parameters"}), 400
 
+    media_items = _load_media_items(media_ids)
     updated = 0
     skipped = 0
     errors = 0
@@ -743,7 +850,7 @@ def wanted_bulk_update_sonarr():
             skipped += 1
             continue
 
-        item = db.get_media_item(media_id)
+        item = media_items.get(media_id)
         if not item or item.media_type != "series":
             skipped += 1
             skipped_ids.append(media_id)
@@ -807,6 +914,7 @@ def wanted_merge_preview():
     if not media_ids:
         return jsonify({"ok": False, "error": "missing_media_ids"}), 400
 
+    media_items = _load_media_items(media_ids)
     items = []
     excluded = []
     for raw_id in media_ids:
@@ -815,7 +923,7 @@ def wanted_merge_preview():
         except (TypeError, ValueError):
             excluded.append({"id": raw_id, "reason": "invalid_id"})
             continue
-        item = db.get_media_item(media_id)
+        item = media_items.get(media_id)
         if not item:
             excluded.append({"id": media_id, "reason": "not_found"})
             continue
@@ -923,70 +1031,136 @@ def _dedupe_candidates(results: list[dict], key_name: str) -> list[dict]:
     return deduped
 
 
-@bp.route("/api/wanted/bulk_lookup/tvdb", methods=["POST"])
-def wanted_bulk_lookup_tvdb():
-    data = request.get_json(silent=True) or {}
-    media_ids = data.get("media_ids") or []
-    if not media_ids:
-        return jsonify({"ok": False, "error": "missing_media_ids"}), 400
-
-    items = []
-    skipped = []
-    for raw_id in media_ids:
-        try:
-            media_id = int(raw_id)
-        except (TypeError, ValueError):
-            skipped.append({"id": raw_id, "reason": "invalid_id"})
-            continue
-        media = db.get_media_item(media_id)
-        if not media:
-            skipped.append({"id": media_id, "reason": "not_found"})
-            continue
-        if media.media_type != "series":
-            skipped.append({"id": media_id, "reason": "not_series"})
-            continue
-        if media.external_ids.get("tvdb"):
-            skipped.append({"id": media_id, "reason": "has_tvdb"})
-            continue
-
-        queries = _build_lookup_queries(media)
-        candidates: list[dict] = []
-        used_query = None
-        for query in queries:
-            lookup = sonarr_api.sonarr_lookup(query, db)
-            if lookup and used_query is None:
-                used_query = query
-            for result in lookup:
-                if not result.tvdb_id:
-                    continue
-                link = f"https://thetvdb.com/series/{result.slug}" if result.slug else None
-                candidates.append({
-                    "external_id": str(result.tvdb_id),
-                    "title": result.title,
-                    "year": result.year,
-                    "link": link
-                })
-        candidates = _dedupe_candidates(candidates, "external_id")[:5]
-        items.append({
+class _LookupMemo:
+    """
+    Single-flight memo of upstream lookups for one bulk request:
+    identical terms (case/whitespace-insensitive) hit Radarr/Sonarr only once.
+    """
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._results: dict[str, Future] = {}
+        self.calls = 0
+
+    def get(self, term: str) -> list:
+        key = " ".join(term.split()).casefold()
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._results[key] = future
+                self.calls += 1
+        if owner:
+            try:
+                future.set_result(self._fetch(term))
+            except Exception as exc:
+                future.set_exception(exc)
+        return future.result()
+
+
+def _lookup_tvdb_item(media: Media, memo: _LookupMemo) -> dict:
+    queries = _build_lookup_queries(media)
+    candidates: list[dict] = []
+    used_query = None
+    for query in queries:
+        lookup = memo.get(query)
+        if lookup and used_query is None:
+            used_query = query
+        for result in lookup:
+            if not result.tvdb_id:
+                continue
+            link = f"https://thetvdb.com/series/{result.slug}" if result.slug else None
+            candidates.append({
+                "external_id": str(result.tvdb_id),
+                "title": result.title,
+                "year": result.year,
+                "link": link
+            })
+    return {
+        "media_id": media.id,
+        "title": media.title,
+        "year": media.year,
+        "media_type": media.media_type,
+        "query": used_query or (queries[0] if queries else ""),
+        "candidates": _dedupe_candidates(candidates, "external_id")[:5]
+    }
+
+
+def _lookup_tmdb_item(media: Media, memo: _LookupMemo) -> dict:
+    queries = _build_lookup_queries(media)
+    candidates: list[dict] = []
+    used_query = None
+    for query in queries:
+        # Una sola chiamata per termine: il filtro per anno (con fallback senza anno) e locale
+        results = memo.get(query)
+        lookup = [r for r in results if r.year == media.year] if media.year else results
+        if not lookup and media.year:
+            lookup = results
+        if lookup and used_query is None:
+            used_query = query
+        for result in lookup:
+            if not result.tmdb_id:
+                continue
+            link = f"https://www.themoviedb.org/movie/{result.tmdb_id}"
+            candidates.append({
+                "external_id": str(result.tmdb_id),
+                "title": result.title,
+                "year": result.year,
+                "link": link
+            })
+    return {
+        "media_id": media.id,
+        "title": media.title,
+        "year": media.year,
+        "media_type": media.media_type,
+        "query": used_query or (queries[0] if queries else ""),
+        "candidates": _dedupe_candidates(candidates, "external_id")[:5]
+    }
+
+
+_BULK_LOOKUPS = {
+    "tvdb": {
+        "media_type": "series",
+        "wrong_type": "not_series",
+        "fetch": lambda term: sonarr_api.sonarr_lookup(term, db),
+        "build": _lookup_tvdb_item
+    },
+    "tmdb": {
+        "media_type": "movie",
+        "wrong_type": "not_movie",
+        "fetch": lambda term: radarr_api.radarr_lookup(term, None, db),
+        "build": _lookup_tmdb_item
+    }
+}
+
+
+def _safe_lookup_item(build, media: Media, memo: _LookupMemo) -> dict:
+    try:
+        return build(media, memo)
+    except Exception as exc:
+        print(f"Bulk lookup failed for media {media.id}: {exc}")
+        return {
             "media_id": media.id,
             "title": media.title,
             "year": media.year,
             "media_type": media.media_type,
-            "query": used_query or (queries[0] if queries else ""),
-            "candidates": candidates
-        })
-
-    return jsonify({"ok": True, "source": "tvdb", "items": items, "skipped": skipped})
+            "query": "",
+            "candidates": [],
+            "error": str(exc)
+        }
 
 
-@bp.route("/api/wanted/bulk_lookup/tmdb", methods=["POST"])
-def wanted_bulk_lookup_tmdb():
+def _bulk_lookup(source: str):
     data = request.get_json(silent=True) or {}
     media_ids = data.get("media_ids") or []
     if not media_ids:
         return jsonify({"ok": False, "error": "missing_media_ids"}), 400
+    spec = _BULK_LOOKUPS[source]
 
-    items = []
+    media_items = _load_media_items(media_ids)
+    medias: list[Media] = []
     skipped = []
     for raw_id in media_ids:
         try:
@@ -994,47 +1168,58 @@ def wanted_bulk_lookup_tmdb():
         except (TypeError, ValueError):
             skipped.append({"id": raw_id, "reason": "invalid_id"})
             continue
-        media = db.get_media_item(media_id)
+        media = media_items.get(media_id)
         if not media:
             skipped.append({"id": media_id, "reason": "not_found"})
             continue
-        if media.media_type != "movie":
-            skipped.append({"id": media_id, "reason": "not_movie"})
+        if media.media_type != spec["media_type"]:
+            skipped.append({"id": media_id, "reason": spec["wrong_type"]})
             continue
-        if media.external_ids.get("tmdb"):
-            skipped.append({"id": media_id, "reason": "has_tmdb"})
+        if media.external_ids.get(source):
+            skipped.append({"id": media_id, "reason": f"has_{source}"})
             continue
+        medias.append(media)
 
-        queries = _build_lookup_queries(media)
-        candidates: list[dict] = []
-        used_query = None
-        for query in queries:
-            lookup = radarr_api.radarr_lookup(query, media.year, db)
-            if not lookup and media.year:
-                lookup = radarr_api.radarr_lookup(query, None, db)
-            if lookup and used_query is None:
-                used_query = query
-            for result in lookup:
-                if not result.tmdb_id:
-                    continue
-                link = f"https://www.themoviedb.org/movie/{result.tmdb_id}"
-                candidates.append({
-                    "external_id": str(result.tmdb_id),
-                    "title": result.title,
-                    "year": result.year,
-                    "link": link
-                })
-        candidates = _dedupe_candidates(candidates, "external_id")[:5]
-        items.append({
-            "media_id": media.id,
-            "title": media.title,
-            "year": media.year,
-            "media_type": media.media_type,
-            "query": used_query or (queries[0] if queries else ""),
-            "candidates": candidates
-        })
+    memo = _LookupMemo(spec["fetch"])
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(BULK_LOOKUP_WORKERS, len(medias))),
+        thread_name_prefix=f"bulk-lookup-{source}"
+    )
+    futures = [executor.submit(_safe_lookup_item, spec["build"], media, memo) for media in medias]
+
+    stream = data.get("stream") or "application/x-ndjson" in (request.headers.get("Accept") or "")
+    if not stream:
+        try:
+            items = [future.result() for future in futures]
+        finally:
+            executor.shutdown(wait=False)
+        return jsonify({"ok": True, "source": source, "items": items, "skipped": skipped})
 
-    return jsonify({"ok": True, "source": "tmdb", "items": items, "skipped": skipped})
+    def _generate():
+        try:
+            yield json.dumps({"type": "start", "source": source, "total": len(medias), "skipped": skipped}) + "\n"
+            for future in as_completed(futures):
+                yield json.dumps({"type": "item", "item": future.result()}) + "\n"
+            yield json.dumps({"type": "done", "source": source, "lookups": memo.calls}) + "\n"
+        finally:
+            # Client disconnesso: i lookup non ancora partiti vengono annullati
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return Response(
+        stream_with_context(_generate()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@bp.route("/api/wanted/bulk_lookup/tvdb", methods=["POST"])
+def wanted_bulk_lookup_tvdb():
+    return _bulk_lookup("tvdb")
+
+
+@bp.route("/api/wanted/bulk_lookup/tmdb", methods=["POST"])
+def wanted_bulk_lookup_tmdb():
+    return _bulk_lookup("tmdb")
 
 
 @bp.route("/api/wanted/bulk_external", methods=["POST"])
@@ -1048,6 +1233,7 @@ def wanted_bulk_external():
     skipped = 0
     errors = 0
     updated_items = []
+    media_items = _load_media_items([payload.get("media_id") for payload in items])
     for payload in items:
         media_id = payload.get("media_id")
         source = payload.get("source")
@@ -1062,7 +1248,7 @@ def wanted_bulk_external():
             skipped += 1
             continue
 
-        item = db.get_media_item(media_id)
+        item = media_items.get(media_id)
         if not item:
             skipped += 1
             continue
@@ -1084,6 +1270,7 @@ def wanted_bulk_external():
         except Exception:
             errors += 1
             continue
+        item.external_ids[source] = str(external_id)
 
         in_radarr = False
         in_sonarr = False
@@ -0,0 +1,45 @@
+import hmac
+import os
+
+from flask import Blueprint, jsonify, request
+
+from app.extensions import arr_sync
+
+bp = Blueprint("webhooks", __name__)
+
+# ===== CONFIG =====
+WEBHOOK_TOKEN = os.environ.get("MMC_WEBHOOK_TOKEN") or ""  # richiesto come ?token= o password HTTP Basic; vuoto = webhook disattivati
+# ==================
+
+
+def _authorized() -> bool:
+    auth = request.authorization
+    supplied = request.args.get("token") or (auth.password if auth else None) or ""
+    return hmac.compare_digest(supplied.encode("utf-8"), WEBHOOK_TOKEN.encode("utf-8"))
+
+
+def _handle(service: str):
+    if not WEBHOOK_TOKEN:
+        # Gli endpoint modificano i wanted: senza token configurato restano chiusi
+        return jsonify({"ok": False, "error": "webhook_token_not_configured"}), 403
+    if not _authorized():
+        return jsonify({"ok": False, "error": "unauthorized"}), 401
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"ok": False, "error": "invalid_payload"}), 400
+    try:
+        result = arr_sync.handle_webhook(service, payload)
+    except Exception as exc:
+        print(f"Error handling {service} webhook: {exc}")
+        return jsonify({"ok": False, "error": "handler_error"}), 500
+    return jsonify({"ok": True, **result})
+
+
+@bp.route("/api/webhooks/radarr", methods=["POST"])
+def radarr_webhook():
+    return _handle("radarr")
+
+
+@bp.route("/api/webhooks/sonarr", methods=["POST"])
+def sonarr_webhook():
+    return _handle("sonarr")
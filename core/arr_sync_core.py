@@ -0,0 +1,310 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from api import radarr_api, sonarr_api
+from core import db_core
+
+# ===== CONFIG =====
+ARR_SYNC_INTERVAL = float(os.environ.get("MMC_ARR_SYNC_INTERVAL", "300"))  # secondi tra due sync completi di Radarr/Sonarr
+ARR_SYNC_ENABLED = os.environ.get("MMC_ARR_SYNC_ENABLED", "1").lower() not in ("0", "false", "no")
+# ==================
+
+ARR_SERVICES = ("radarr", "sonarr")
+
+# Eventi Connect (webhook) gestiti: quelli "upsert" rileggono l'elemento, "delete" lo rimuovono
+WEBHOOK_EVENTS = {
+    "radarr": {
+        "entity": "movie",
+        "external_key": "tmdbId",
+        "external_sources": ("tmdb", "radarr"),
+        "upsert": frozenset({"Grab", "Download", "MovieAdded", "MovieFileDelete", "Rename"}),
+        "delete": frozenset({"MovieDelete"})
+    },
+    "sonarr": {
+        "entity": "series",
+        "external_key": "tvdbId",
+        "external_sources": ("tvdb", "sonarr"),
+        "upsert": frozenset({"Grab", "Download", "SeriesAdd", "EpisodeFileDelete", "Rename"}),
+        "delete": frozenset({"SeriesDelete"})
+    }
+}
+
+
+def _row_hash(row: dict, columns: tuple[str, ...]) -> str:
+    payload = json.dumps([row.get(column) for column in columns], separators=(",", ":"), default=str)
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+
+def _with_hash(service: str, row: dict) -> dict:
+    spec = db_core.ARR_MIRROR[service]
+    row["row_hash"] = _row_hash(row, (spec["key"],) + spec["columns"])
+    return row
+
+
+def radarr_row(m: dict) -> dict | None:
+    """Mirror row for one Radarr movie payload (None without a TMDB id)."""
+    if not m.get("tmdbId"):
+        return None
+    return _with_hash("radarr", {
+        "tmdb_id": int(m["tmdbId"]),
+        "arr_id": m.get("id"),
+        "title": m.get("title"),
+        "year": m.get("year") or None,
+        "imdb_id": m.get("imdbId") or None,
+        "monitored": bool(m.get("monitored", True)),
+        "has_file": bool(m.get("hasFile", False)),
+        "path": m.get("path"),
+        "root_folder": m.get("rootFolderPath"),
+        "size_on_disk": m.get("sizeOnDisk")
+    })
+
+
+def sonarr_row(s: dict, root_folder: str | None = None) -> dict | None:
+    """Mirror row for one Sonarr series payload (None without a TVDB id)."""
+    if not s.get("tvdbId"):
+        return None
+    stats = s.get("statistics") or {}
+    episode_count = stats.get("episodeCount")
+    if episode_count is None:
+        episode_count = stats.get("totalEpisodeCount")
+    return _with_hash("sonarr", {
+        "tvdb_id": int(s["tvdbId"]),
+        "arr_id": s.get("id"),
+        "title": s.get("title"),
+        "year": s.get("year") or None,
+        "imdb_id": s.get("imdbId") or None,
+        "slug": s.get("titleSlug"),
+        "monitored": bool(s.get("monitored", True)),
+        "path": s.get("path"),
+        "root_folder": s.get("rootFolderPath", root_folder),
+        "episode_count": episode_count,
+        "episode_file_count": int(stats.get("episodeFileCount") or 0),
+        "size_on_disk": stats.get("sizeOnDisk")
+    })
+
+
+def _fetch_rows(db: db_core.MediaDB, service: str) -> list[dict] | None:
+    if service == "radarr":
+        library = radarr_api.radarr_get_library(db, force_refresh=True)
+        if library is None:
+            return None
+        rows = [radarr_row(m) for m in library.raw]
+    else:
+        library = sonarr_api.sonarr_get_library(db, force_refresh=True)
+        if library is None:
+            return None
+        rows = [sonarr_row(s, library.root_folder) for s in library.raw]
+    return [row for row in rows if row]
+
+
+class ArrSync:
+    """
+    Background mirror of the Radarr/Sonarr libraries into arr_movies/arr_series.
+
+    One daemon thread per worker process downloads both libraries every
+    ARR_SYNC_INTERVAL seconds and writes only the rows whose hash changed. A PostgreSQL
+    advisory lock lets one worker at a time sync a service, and the periodic sync is
+    skipped when another worker attempted it less than ARR_SYNC_INTERVAL seconds ago.
+    Pages read the local copy, so they keep rendering when an *arr instance is slow or down.
+    """
+
+    def __init__(self, db: db_core.MediaDB):
+        self.db = db
+        self._lock = threading.Lock()
+        self._sync_locks = {service: threading.Lock() for service in ARR_SERVICES}
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._wakeup = threading.Event()
+        self._last_result: dict[str, dict] = {}
+        self._listeners: list = []
+        radarr_api.radarr_add_library_listener(lambda upsert, remove_id: self._on_library_change("radarr", upsert, remove_id))
+        sonarr_api.sonarr_add_library_listener(lambda upsert, remove_id: self._on_library_change("sonarr", upsert, remove_id))
+
+    def add_listener(self, listener) -> None:
+        """Register listener(service), called after each successful sync of the local copy."""
+        self._listeners.append(listener)
+
+    def _notify(self, service: str) -> None:
+        for listener in self._listeners:
+            try:
+                listener(service)
+            except Exception as exc:
+                print(f"Error notifying {service} sync: {exc}")
+
+    def _on_library_change(self, service: str, upsert: dict | None, remove_id: int | None) -> None:
+        # Aggiunte/modifiche fatte dall'app: la copia locale le vede subito, senza aspettare il sync
+        if remove_id:
+            self.db.delete_arr_mirror(service, [remove_id])
+        if not upsert:
+            return
+        row = radarr_row(upsert) if service == "radarr" else sonarr_row(upsert)
+        if row is None:
+            return
+        keep = ()
+        if service == "sonarr" and "statistics" not in upsert:
+            # Le risposte PUT/POST di Sonarr non includono le statistiche degli episodi
+            keep = ("episode_count", "episode_file_count", "size_on_disk")
+        self.db.upsert_arr_mirror(service, [row], keep)
+
+    def sync(self, service: str, force: bool = True) -> dict | None:
+        """
+        Run one sync of `service` now; returns the row counts, or None on failure or when
+        skipped (another worker is syncing it or, without force, synced it recently).
+        """
+        with self._sync_locks[service]:
+            started = time.monotonic()
+            try:
+                with self.db.try_advisory_lock(f"mmc_arr_sync_{service}") as acquired:
+                    if not acquired:
+                        return None
+                    if not force:
+                        age = self.db.get_arr_sync_age(service)
+                        if age is not None and age < ARR_SYNC_INTERVAL:
+                            return None
+                    rows = _fetch_rows(self.db, service)
+                    if rows is None:
+                        self.db.set_arr_sync_error(service, f"{service} non raggiungibile")
+                        return None
+                    result = self.db.sync_arr_mirror(service, rows)
+            except Exception as exc:
+                print(f"Error syncing {service} library: {exc}")
+                try:
+                    self.db.set_arr_sync_error(service, str(exc))
+                except Exception:
+                    pass
+                return None
+            result["seconds"] = round(time.monotonic() - started, 3)
+            with self._lock:
+                self._last_result[service] = result
+        self._notify(service)
+        return result
+
+    def sync_all(self, force: bool = True) -> dict[str, dict | None]:
+        return {service: self.sync(service, force) for service in ARR_SERVICES}
+
+    def _loop(self) -> None:
+        while True:
+            # Solo i sync richiesti (request_sync) ignorano quelli recenti degli altri worker
+            force = self._wakeup.is_set()
+            self._wakeup.clear()
+            self.sync_all(force=force)
+            self._wakeup.wait(ARR_SYNC_INTERVAL)
+
+    def ensure_started(self) -> None:
+        """Start the sync thread of this process if needed (cheap, called on every request)."""
+        if not ARR_SYNC_ENABLED:
+            return
+        pid = os.getpid()
+        with self._lock:
+            # Avviato al primo uso (dopo il fork dei worker), uno per processo
+            if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._loop, name="arr-sync", daemon=True)
+            self._thread.start()
+
+    def request_sync(self) -> None:
+        """Wake the background thread for an immediate sync."""
+        self.ensure_started()
+        self._wakeup.set()
+
+    def handle_webhook(self, service: str, payload: dict) -> dict:
+        """
+        Apply one Radarr/Sonarr Connect event: the affected movie/series is re-read from
+        the *arr (a single GET) into the snapshot and the local copy, and the radarr/sonarr
+        external IDs of the matching wanted items are added or removed.
+        """
+        spec = WEBHOOK_EVENTS[service]
+        event = payload.get("eventType") or ""
+        entity = payload.get(spec["entity"]) or {}
+        arr_id = entity.get("id")
+        external_id = entity.get(spec["external_key"])
+        result = {"service": service, "event": event, "action": "ignored"}
+        apply_change = radarr_api.radarr_apply_library_change if service == "radarr" else sonarr_api.sonarr_apply_library_change
+
+        if event in spec["delete"]:
+            if arr_id:
+                apply_change(self.db, remove_id=arr_id)
+            result["action"] = "deleted"
+            result["unlinked"] = self.db.delete_external_ids(service, external_id) if external_id else 0
+            return result
+
+        if event not in spec["upsert"]:
+            return result
+
+        get_by_id = radarr_api.radarr_get_by_id if service == "radarr" else sonarr_api.sonarr_get_by_id
+        fresh = get_by_id(arr_id, self.db) if arr_id else None
+        if fresh:
+            apply_change(self.db, upsert=fresh)
+        else:
+            # Elemento non rileggibile: ci pensa il prossimo sync completo, anticipato
+            self.request_sync()
+        result["action"] = "updated"
+        result["linked"] = 0
+        if external_id:
+            media_ids = self.db.get_media_ids_by_external(list(spec["external_sources"]), external_id)
+            added = self.db.add_external_ids_bulk([(media_id, service, str(external_id)) for media_id in media_ids])
+            result["linked"] = sum(1 for inserted in added if inserted)
+        return result
+
+    def get_arr_state(self) -> dict:
+        """
+        Sets and maps used by the wanted and Plex views, read from the local copy.
+        Before the first sync the copy is empty: the sync is requested in background and
+        the page renders without the *arr data instead of waiting for it.
+        """
+        state = self.db.get_arr_sync_state()
+        if any(service not in state and not self._sync_locks[service].locked() for service in ARR_SERVICES):
+            self.request_sync()
+        movies = self.db.get_arr_mirror("radarr", ("title", "year", "has_file", "root_folder"))
+        series = self.db.get_arr_mirror(
+            "sonarr", ("title", "year", "slug", "root_folder", "episode_count", "episode_file_count")
+        )
+        sonarr_downloaded = set()
+        sonarr_progress = {}
+        for s in series:
+            tvdb_id = str(s["tvdb_id"])
+            episode_count = s["episode_count"]
+            episode_file_count = s["episode_file_count"] or 0
+            sonarr_progress[tvdb_id] = {
+                "downloaded": int(episode_file_count),
+                "total": episode_count
+            }
+            if episode_count and episode_file_count >= episode_count:
+                sonarr_downloaded.add(tvdb_id)
+        return {
+            "radarr_tmdb": {str(m["tmdb_id"]) for m in movies},
+            "radarr_downloaded": {str(m["tmdb_id"]) for m in movies if m["has_file"]},
+            "radarr_root_map": {str(m["tmdb_id"]): (m["root_folder"] or "") for m in movies},
+            "radarr_title_year": {((m["title"] or "").strip().lower(), m["year"]) for m in movies if m["title"]},
+            "sonarr_tvdb": {str(s["tvdb_id"]) for s in series},
+            "sonarr_slug_map": {str(s["tvdb_id"]): s["slug"] for s in series if s["slug"]},
+            "sonarr_root_map": {str(s["tvdb_id"]): (s["root_folder"] or "") for s in series},
+            "sonarr_title_year": {((s["title"] or "").strip().lower(), s["year"]) for s in series if s["title"]},
+            "sonarr_downloaded": sonarr_downloaded,
+            "sonarr_progress": sonarr_progress
+        }
+
+    def status(self) -> dict:
+        try:
+            state = self.db.get_arr_sync_state()
+        except Exception as exc:
+            print(f"Error reading arr sync state: {exc}")
+            state = {}
+        with self._lock:
+            running = self._thread is not None and self._thread.is_alive()
+            last_result = dict(self._last_result)
+        services = {}
+        for service in ARR_SERVICES:
+            row = state.get(service) or {}
+            services[service] = {
+                "last_success_at": row["last_success_at"].isoformat() if row.get("last_success_at") else None,
+                "last_attempt_at": row["last_attempt_at"].isoformat() if row.get("last_attempt_at") else None,
+                "last_error": row.get("last_error"),
+                "item_count": row.get("item_count", 0),
+                "last_result": last_result.get(service)
+            }
+        return {"enabled": ARR_SYNC_ENABLED, "running": running, "interval": ARR_SYNC_INTERVAL, "services": services}
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+
+
+class SnapshotCache(Generic[T]):
+    """
+    In-process cache of whole-library snapshots, one per key (e.g. service URL + API key).
+
+    Snapshots expire after `ttl` seconds. Concurrent misses on the same key share a
+    single loader call (single-flight); if a refresh fails the previous snapshot keeps
+    being served. The loader returns None on failure.
+    """
+
+    def __init__(self, loader: Callable[..., T | None], ttl: float):
+        self._loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[object, tuple[T, float]] = {}
+        self._flights: dict[object, _Flight] = {}
+        self._generations: dict[object, int] = {}
+
+    def get(self, key, *args, force: bool = False) -> T | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not force and time.monotonic() - entry[1] < self.ttl:
+                return entry[0]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                generation = self._generations.get(key, 0)
+
+        if not leader:
+            flight.event.wait()
+            if flight.value is not None:
+                return flight.value
+            with self._lock:
+                entry = self._entries.get(key)
+            return entry[0] if entry else None
+
+        value = None
+        try:
+            value = self._loader(*args)
+        finally:
+            # Valore e snapshot vanno pubblicati prima di svegliare chi aspetta, anche se il loader fallisce
+            with self._lock:
+                self._flights.pop(key, None)
+                if value is not None:
+                    flight.value = value
+                    # Un invalidate/update durante il caricamento rende il risultato gia vecchio
+                    if self._generations.get(key, 0) == generation:
+                        self._entries[key] = (value, time.monotonic())
+                entry = self._entries.get(key)
+            flight.event.set()
+        if value is not None:
+            return value
+        return entry[0] if entry else None
+
+    def peek(self, key) -> T | None:
+        """Return the cached snapshot if still fresh, without loading."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[1] < self.ttl:
+                return entry[0]
+        return None
+
+    def update(self, key, fn: Callable[[T], T]) -> None:
+        """Patch the cached snapshot in place of a full refresh (no-op if nothing is cached)."""
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            entry = self._entries.get(key)
+            if entry:
+                self._entries[key] = (fn(entry[0]), entry[1])
+
+    def invalidate(self, key=None) -> None:
+        with self._lock:
+            keys = set(self._entries) | set(self._flights) if key is None else {key}
+            for k in keys:
+                self._generations[k] = self._generations.get(k, 0) + 1
+                self._entries.pop(k, None)
+
+
+class LRUCache(Generic[T]):
+    """
+    Bounded in-process cache: entries expire after their ttl and the least recently
+    used ones are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[object, tuple[T, float]] = OrderedDict()
+
+    def get(self, key) -> T | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry[1]:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value: T, ttl: float | None = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
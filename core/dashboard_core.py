@@ -1,13 +1,112 @@
-from core import db_core
-
-def get_dashboard_data(db: db_core.MediaDB):
-    return {
-        "counts": {
-            "total": db.count_media(),
-            "present": db.count_present(),
-            "missing": db.count_missing()
-        },
-        "wanted_movies": db.get_wanted_items(media_type="movie",limit=None)[:5],
-        "wanted_series": db.get_wanted_items(media_type="series", limit=None)[:5],
-        "last_imports": db.get_last_imports(limit=None)[:5]
-    }
+import os
+import threading
+from datetime import datetime, timezone
+
+from core import db_core
+from core.cache_core import SnapshotCache
+
+# ===== CONFIG =====
+DASHBOARD_CACHE_TTL = float(os.environ.get("MMC_DASHBOARD_CACHE_TTL", "10"))        # secondi di validita delle statistiche del DB
+DASHBOARD_ARR_REFRESH = float(os.environ.get("MMC_DASHBOARD_ARR_REFRESH", "60"))    # secondi tra i ricalcoli dei contatori Radarr/Sonarr
+DASHBOARD_LIST_LIMIT = 5
+DASHBOARD_SOURCES = ("animeworld", "ddunlimited", "plex db", "text")
+# ==================
+
+
+class DashboardStats:
+    """
+    Statistics service behind /api/dashboard/data.
+
+    Database figures come from one aggregate query cached for DASHBOARD_CACHE_TTL seconds
+    and dropped as soon as the wanted list changes. Radarr/Sonarr counters are recounted
+    from the local library copy kept by core.arr_sync_core by a background thread every
+    DASHBOARD_ARR_REFRESH seconds, so a request never waits for the *arr libraries.
+    """
+
+    def __init__(self, db: db_core.MediaDB):
+        self.db = db
+        self._db_cache: SnapshotCache[dict] = SnapshotCache(self._load_db_stats, DASHBOARD_CACHE_TTL)
+        self._arr_lock = threading.Lock()
+        self._arr: dict[str, dict[str, int] | None] = {"radarr": None, "sonarr": None}
+        self._arr_updated_at: datetime | None = None
+        self._arr_thread: threading.Thread | None = None
+        self._arr_pid: int | None = None
+        self._arr_wakeup = threading.Event()
+        db.add_wanted_listener(self._on_wanted_change)
+
+    def _on_wanted_change(self, version: int | None, events: list) -> None:
+        self._db_cache.invalidate()
+
+    def _load_db_stats(self) -> dict | None:
+        try:
+            return self.db.get_dashboard_stats(list(DASHBOARD_SOURCES), limit=DASHBOARD_LIST_LIMIT)
+        except Exception as exc:
+            print(f"Error loading dashboard stats: {exc}")
+            return None
+
+    def refresh_arr_counters(self) -> None:
+        """Recount the local Radarr/Sonarr copy (keeps the last counters on failure)."""
+        try:
+            counters = self.db.get_arr_counters()
+        except Exception as exc:
+            print(f"Error refreshing dashboard *arr counters: {exc}")
+            counters = {}
+        with self._arr_lock:
+            # Servizio mai sincronizzato: restano i contatori precedenti (o quelli vuoti)
+            for name, value in counters.items():
+                if value is not None:
+                    self._arr[name] = value
+            self._arr_updated_at = datetime.now(timezone.utc)
+
+    def _arr_loop(self) -> None:
+        while True:
+            self.refresh_arr_counters()
+            self._arr_wakeup.wait(DASHBOARD_ARR_REFRESH)
+            self._arr_wakeup.clear()
+
+    def _ensure_arr_thread(self) -> None:
+        pid = os.getpid()
+        with self._arr_lock:
+            # Avviato al primo uso (dopo il fork dei worker), uno per processo
+            if self._arr_thread is not None and self._arr_thread.is_alive() and self._arr_pid == pid:
+                return
+            self._arr_pid = pid
+            self._arr_thread = threading.Thread(target=self._arr_loop, name="dashboard-arr", daemon=True)
+            self._arr_thread.start()
+
+    def request_arr_refresh(self) -> None:
+        """Wake the background thread for an immediate recount."""
+        self._ensure_arr_thread()
+        self._arr_wakeup.set()
+
+    def get_data(self) -> dict:
+        self._ensure_arr_thread()
+        stats = self._db_cache.get("db") or {
+            "counts": {"total": 0, "present": 0, "missing": 0},
+            "by_source": {},
+            "wanted_movies": [],
+            "wanted_series": [],
+            "last_imports": []
+        }
+        empty = {"total": 0, "monitored": 0, "downloaded": 0}
+        with self._arr_lock:
+            radarr = self._arr["radarr"]
+            sonarr = self._arr["sonarr"]
+            updated_at = self._arr_updated_at
+        by_source = stats["by_source"]
+        return {
+            "counts": stats["counts"],
+            "radarr_info": radarr or empty,
+            "sonarr_info": sonarr or empty,
+            "arr_pending": updated_at is None,
+            "arr_updated_at": updated_at.isoformat() if updated_at else None,
+            "wanted_sources": {
+                "animeworld": by_source.get("animeworld", 0),
+                "ddunlimited": by_source.get("ddunlimited", 0),
+                "plex_db": by_source.get("plex db", 0),
+                "text": by_source.get("text", 0)
+            },
+            "last_imports": stats["last_imports"],
+            "wanted_movies": [{"title": item["title"], "year": item["year"]} for item in stats["wanted_movies"]],
+            "wanted_series": [{"title": item["title"], "year": item["year"]} for item in stats["wanted_series"]]
+        }
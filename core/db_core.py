@@ -1,9 +1,17 @@
+import base64
+import json
 import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from dataclasses import dataclass, field
-from typing import Optional
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from psycopg2.extras import Json, RealDictCursor, execute_values
+from psycopg2.pool import PoolError
+from dataclasses import dataclass, field, replace
+from typing import Iterator, Optional
 
 @dataclass
 class Media:
@@ -76,8 +84,269 @@ DB_PORT = int(os.environ.get("MMC_DB_PORT", "5432"))
 DB_NAME = os.environ.get("MMC_DB_NAME")
 DB_USER = os.environ.get("MMC_DB_USER")
 DB_PASSWORD = os.environ.get("MMC_DB_PASSWORD")
+DB_POOL_MIN = int(os.environ.get("MMC_DB_POOL_MIN", "1"))          # connessioni aperte all'avvio (per worker)
+DB_POOL_MAX = int(os.environ.get("MMC_DB_POOL_MAX", "10"))         # connessioni massime (per worker)
+DB_POOL_TIMEOUT = float(os.environ.get("MMC_DB_POOL_TIMEOUT", "30"))  # secondi di attesa per una connessione libera
+DB_POOL_CHECK_IDLE = float(os.environ.get("MMC_DB_POOL_CHECK_IDLE", "30"))  # ping delle connessioni inattive da piu di N secondi
+BULK_PAGE_SIZE = 1000  # righe per statement negli insert bulk (execute_values)
+ITER_SIZE = int(os.environ.get("MMC_DB_ITER_SIZE", "2000"))  # righe per fetch dei cursori server-side
+CONFIG_CACHE_CHECK = float(os.environ.get("MMC_CONFIG_CACHE_CHECK", "5"))  # secondi tra i controlli di config_version
+LOOKUP_CACHE_TTL = int(os.environ.get("MMC_LOOKUP_CACHE_TTL", str(7 * 86400)))          # validita dei risultati di lookup
+LOOKUP_CACHE_NEGATIVE_TTL = int(os.environ.get("MMC_LOOKUP_CACHE_NEGATIVE_TTL", "21600"))  # validita dei lookup senza risultati
+LOOKUP_CACHE_MAX_ENTRIES = int(os.environ.get("MMC_LOOKUP_CACHE_MAX_ENTRIES", "20000"))    # oltre, si eliminano i meno usati
+LOOKUP_CACHE_PRUNE_EVERY = 200  # scritture tra una potatura LRU e l'altra
+DDU_RELEASE_CACHE_TTL = int(os.environ.get("MMC_DDU_RELEASE_CACHE_TTL", str(7 * 86400)))        # validita dei link ed2k di una release
+DDU_RELEASE_CACHE_NEGATIVE_TTL = int(os.environ.get("MMC_DDU_RELEASE_CACHE_NEGATIVE_TTL", "3600"))  # validita delle pagine senza link
+DDU_RELEASE_CACHE_MAX_ENTRIES = int(os.environ.get("MMC_DDU_RELEASE_CACHE_MAX_ENTRIES", "5000"))  # oltre, si eliminano le meno usate
 # ==================
 
+
+class PoolTimeout(PoolError):
+    """Raised when no pooled connection becomes free within the timeout."""
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of autocommit psycopg2 connections.
+    Connections are health-checked on checkout and the pool tracks saturation stats.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float, check_idle: float, **connect_kwargs):
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._connect_kwargs = connect_kwargs
+        self._cond = threading.Condition()
+        self._idle: list[tuple[object, float]] = []
+        self._orphans: list[object] = []
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._pid = os.getpid()
+        self._stats = {
+            "created": 0,
+            "discarded": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "wait_seconds": 0.0,
+            "peak_in_use": 0
+        }
+        for _ in range(self.minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        conn.autocommit = True
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        with self._cond:
+            self._stats["discarded"] += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _check_fork(self) -> None:
+        # Dopo un fork (gunicorn --preload) i socket appartengono al processo padre:
+        # non vanno chiusi (invierebbero il Terminate al server), solo abbandonati.
+        if os.getpid() == self._pid:
+            return
+        with self._cond:
+            if os.getpid() == self._pid:
+                return
+            self._orphans.extend(conn for conn, _ in self._idle)
+            self._idle = []
+            self._in_use = 0
+            self._pid = os.getpid()
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        status = conn.info.transaction_status
+        if status == TRANSACTION_STATUS_UNKNOWN:
+            return False
+        try:
+            if status != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if time.monotonic() - last_used >= self.check_idle:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+        except psycopg2.Error:
+            return False
+        return True
+
+    def getconn(self):
+        self._check_fork()
+        started = time.monotonic()
+        with self._cond:
+            if self._closed:
+                raise psycopg2.InterfaceError("connection pool is closed")
+            waited = False
+            while not self._idle and self._in_use >= self.maxconn:
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"No DB connection available after {self.timeout}s (max {self.maxconn})")
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds"] += time.monotonic() - started
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._in_use)
+            conn, last_used = self._idle.pop() if self._idle else (None, 0.0)
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn) -> None:
+        stale = os.getpid() != self._pid
+        with self._cond:
+            if not stale:
+                self._in_use -= 1
+            keep = not self._closed and not stale and not conn.closed
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if not keep and not stale:
+            self._discard(conn)
+
+    def closeall(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle = []
+            self._cond.notify_all()
+        for conn in idle:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+    def stats(self) -> dict:
+        with self._cond:
+            in_use = self._in_use
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": in_use + len(self._idle),
+                "in_use": in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "saturation": round(in_use / self.maxconn, 3),
+                **self._stats,
+                "wait_seconds": round(self._stats["wait_seconds"], 3)
+            }
+
+
+# Ordinamenti ammessi per la lista wanted paginata: espressione SQL (indicizzata con id)
+WANTED_SORTS = {
+    "created_at": "COALESCE(mi.created_at, to_timestamp(0))",
+    "title": "lower(mi.title)",
+    "year": "COALESCE(mi.year, 0)"
+}
+
+
+# Cartella di import di un elemento "plex db": primo "\\media\\<cartella>" di source_ref (con / come \\)
+WANTED_IMPORT_PATH_RE = r"(?i)\\media\\([^\\]+)"
+WANTED_IMPORT_PATH_SQL = "substring(replace(mi.source_ref, '/', '\\') from %s)"
+
+
+def _like_pattern(value: str) -> str:
+    """Substring pattern for LIKE/ILIKE with %, _ and the escape character taken literally."""
+    return "%" + value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _encode_page_cursor(sort: str, value, media_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, media_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_page_cursor(cursor: str, sort: str) -> tuple[object, int] | None:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, media_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        return None
+    if cursor_sort != sort:
+        return None
+    try:
+        if sort == "created_at":
+            value = datetime.fromisoformat(value)
+        return value, int(media_id)
+    except (TypeError, ValueError):
+        return None
+
+
+# Colonne di media_items selezionabili da iter_media_items (id e sempre incluso)
+MEDIA_COLUMNS = (
+    "title", "year", "media_type", "category", "source", "source_ref",
+    "original_title", "language", "created_at"
+)
+
+
+# Copia locale delle librerie *arr: tabella, chiave e colonne scritte dal sync
+ARR_MIRROR = {
+    "radarr": {
+        "table": "arr_movies",
+        "key": "tmdb_id",
+        "columns": ("arr_id", "title", "year", "imdb_id", "monitored", "has_file", "path", "root_folder", "size_on_disk")
+    },
+    "sonarr": {
+        "table": "arr_series",
+        "key": "tvdb_id",
+        "columns": (
+            "arr_id", "title", "year", "imdb_id", "slug", "monitored", "path", "root_folder",
+            "episode_count", "episode_file_count", "size_on_disk"
+        )
+    }
+}
+
+# Colonne della cache fusa delle release DDUnlimited (ddunlimited_items)
+DDU_ITEM_COLUMNS = (
+    "item_key", "position", "title", "detail_url", "topic_id", "info", "quality", "language",
+    "media_type", "category", "year", "source_name", "search_text"
+)
+
+
+def _media_from_row(r: dict) -> Media:
+    # Con una proiezione parziale i campi non selezionati restano None
+    return Media(
+        id=r["id"],
+        title=r.get("title"),
+        year=r.get("year"),
+        media_type=r.get("media_type"),
+        category=r.get("category"),
+        source=r.get("source"),
+        source_ref=r.get("source_ref"),
+        original_title=r.get("original_title"),
+        language=r.get("language"),
+        created_at=r.get("created_at"),
+        status=None
+    )
+
+
 class MediaDB:
     """Core class to interact with PostgreSQL database for media management."""
 
@@ -94,25 +363,185 @@ class MediaDB:
         if missing:
             missing_list = ", ".join(missing)
             raise RuntimeError(f"Missing DB settings: {missing_list}")
-        self.conn = psycopg2.connect(
+        self.pool = ConnectionPool(
+            DB_POOL_MIN,
+            DB_POOL_MAX,
+            DB_POOL_TIMEOUT,
+            DB_POOL_CHECK_IDLE,
             host=DB_HOST,
             port=DB_PORT,
             dbname=DB_NAME,
             user=DB_USER,
             password=DB_PASSWORD
         )
-        self.conn.autocommit = True
+        self._local = threading.local()
+        self._config_lock = threading.Lock()
+        self._config_cache: dict[str, dict[str, object]] = {}
+        self._config_generation = 0
+        self._config_version: int | None = None
+        self._config_checked_at = 0.0
+        self._lookup_writes = 0
+        self._release_cache_writes = 0
+        self._wanted_listeners: list = []
 
     def close(self):
-        """Close the database connection."""
-        self.conn.close()
+        """Close every pooled database connection."""
+        self.pool.closeall()
+
+    @contextmanager
+    def connection(self):
+        """
+        Lease one pooled connection for the current thread until the block exits.
+        Nested blocks and every MediaDB method called inside reuse the same connection.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self.pool.getconn()
+        self._local.conn = conn
+        if getattr(self._local, "request_bound", False):
+            # Resta in uso fino a end_request()
+            yield conn
+            return
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self.pool.putconn(conn)
+
+    def begin_request(self) -> None:
+        """Bind the current thread: the first query leases a connection kept until end_request()."""
+        self._local.request_bound = True
+
+    def end_request(self) -> None:
+        """Release the connection leased by the current request, if any."""
+        self._local.request_bound = False
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            self.pool.putconn(conn)
+
+    def pool_stats(self) -> dict:
+        return self.pool.stats()
+
+    @contextmanager
+    def _cursor(self, cursor_factory=None):
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=cursor_factory) as cur:
+                yield cur
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run the block in a single transaction on the thread's pooled connection.
+        Nested blocks join the outer transaction; any exception rolls everything back.
+        """
+        with self.connection() as conn:
+            if not conn.autocommit:
+                yield conn
+                return
+            conn.autocommit = False
+            self._local.wanted_events = []
+            version = None
+            try:
+                yield conn
+                if self._local.wanted_events:
+                    # Un solo incremento di wanted_version per transazione, non uno per scrittura
+                    version = self._bump_wanted_version(conn)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                conn.autocommit = True
+                events = self._local.wanted_events
+                self._local.wanted_events = None
+            # Gli ascoltatori vedono solo modifiche confermate
+            self._notify_wanted(version, events)
+
+    @contextmanager
+    def try_advisory_lock(self, name: str):
+        """
+        Hold a PostgreSQL session advisory lock named `name` for the block, without waiting:
+        yields False when another session (e.g. another worker process) holds it.
+        The thread's pooled connection stays leased until the block exits.
+        """
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (name,))
+                acquired = cur.fetchone()[0]
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    try:
+                        with conn.cursor() as cur:
+                            cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (name,))
+                    except psycopg2.Error as exc:
+                        # Connessione persa: il lock e gia stato rilasciato con la sessione
+                        print(f"Error releasing advisory lock {name}: {exc}")
+
+    def add_wanted_listener(self, listener) -> None:
+        """
+        Register listener(version, events), called after each committed transaction that
+        wrote the wanted list: events is the list of (event, payload) in write order and
+        version the new wanted_version, None if it could not be bumped (see core.wanted_core).
+        """
+        self._wanted_listeners.append(listener)
+
+    def get_wanted_version(self) -> int | None:
+        try:
+            with self._cursor() as cur:
+                cur.execute("SELECT version FROM wanted_version WHERE id")
+                row = cur.fetchone()
+        except psycopg2.Error as exc:
+            print(f"wanted_version non disponibile: {exc}")
+            return None
+        return row[0] if row else None
+
+    def _wanted_changed(self, event: str, **payload) -> None:
+        """Queue a wanted-list event; transaction() bumps wanted_version once before committing."""
+        self._local.wanted_events.append((event, payload))
+
+    def _bump_wanted_version(self, conn) -> int | None:
+        """
+        Increment wanted_version in the open transaction. Without the table (database not
+        migrated) the write still commits and the version is None, as in get_wanted_version.
+        """
+        with conn.cursor() as cur:
+            # Il savepoint evita che l'errore annulli le scritture della transazione
+            cur.execute("SAVEPOINT wanted_version_bump")
+            try:
+                cur.execute("""
+                    UPDATE wanted_version
+                    SET version = version + 1, updated_at = now()
+                    WHERE id
+                    RETURNING version
+                """)
+                row = cur.fetchone()
+            except psycopg2.Error as exc:
+                cur.execute("ROLLBACK TO SAVEPOINT wanted_version_bump")
+                print(f"wanted_version non disponibile: {exc}")
+                return None
+            cur.execute("RELEASE SAVEPOINT wanted_version_bump")
+        return row[0] if row else None
+
+    def _notify_wanted(self, version: int | None, events: list) -> None:
+        if not events:
+            return
+        for listener in self._wanted_listeners:
+            try:
+                listener(version, events)
+            except Exception as exc:
+                print(f"Error notifying wanted changes: {exc}")
 
     def add_media(self, media: Media) -> tuple[int, bool]:
         """
         Inserisce un media se non esiste.
         Ritorna (media_id, inserted)
         """
-        with self.conn.cursor() as cur:
+        with self.transaction(), self._cursor() as cur:
             cur.execute("""
                 INSERT INTO media_items (title, year, media_type, category, source, source_ref, original_title, language)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
@@ -133,6 +562,7 @@ class MediaDB:
             if row:
                 media_id = row[0]
                 inserted = True
+                self._wanted_changed("media_added", items=[replace(media, id=media_id, external_ids={})])
             else:
                 cur.execute("""
                     SELECT id FROM media_items
@@ -143,18 +573,128 @@ class MediaDB:
 
         return media_id, inserted
 
+    def add_media_bulk(self, medias: list[Media]) -> list[tuple[int, bool]]:
+        """
+        Inserisce molti media in una sola transazione (execute_values + ON CONFLICT).
+        Ritorna, nello stesso ordine dell'input, (media_id, inserted) per ogni riga:
+        i duplicati gia presenti o ripetuti nel lotto risultano inserted=False.
+        """
+        if not medias:
+            return []
+        keys = [(m.title, m.year) for m in medias]
+        first_index: dict[tuple[str, int | None], int] = {}
+        for index, key in enumerate(keys):
+            first_index.setdefault(key, index)
+        unique = [medias[index] for index in first_index.values()]
+
+        ids: dict[tuple[str, int | None], int] = {}
+        inserted_keys: set[tuple[str, int | None]] = set()
+        with self.transaction():
+            with self._cursor() as cur:
+                rows = execute_values(cur, """
+                    INSERT INTO media_items (title, year, media_type, category, source, source_ref, original_title, language)
+                    VALUES %s
+                    ON CONFLICT (title, year) DO NOTHING
+                    RETURNING id, title, year
+                """, [
+                    (m.title, m.year, m.media_type, m.category, m.source, m.source_ref, m.original_title, m.language)
+                    for m in unique
+                ], page_size=BULK_PAGE_SIZE, fetch=True)
+                for media_id, title, year in rows:
+                    ids[(title, year)] = media_id
+                    inserted_keys.add((title, year))
+
+                missing = [key for key in first_index if key not in ids]
+                if missing:
+                    cur.execute("""
+                        SELECT DISTINCT ON (k.title, k.year) mi.id, k.title, k.year
+                        FROM unnest(%s::text[], %s::int[]) AS k(title, year)
+                        JOIN media_items mi
+                          ON mi.title = k.title AND mi.year IS NOT DISTINCT FROM k.year
+                        ORDER BY k.title, k.year, mi.id
+                    """, ([key[0] for key in missing], [key[1] for key in missing]))
+                    for media_id, title, year in cur.fetchall():
+                        ids[(title, year)] = media_id
+
+            if inserted_keys:
+                self._wanted_changed("media_added", items=[
+                    replace(m, id=ids[(m.title, m.year)], external_ids={})
+                    for m in unique
+                    if (m.title, m.year) in inserted_keys
+                ])
+
+        results = []
+        for index, key in enumerate(keys):
+            results.append((ids.get(key), key in inserted_keys and first_index[key] == index))
+        return results
+
+    def add_external_ids_bulk(self, rows: list[tuple[int, str, str]]) -> list[bool]:
+        """
+        Insert many (media_item_id, source, external_id) rows in one transaction.
+        Returns, aligned with the input, whether each row was inserted (False = already present or repeated).
+        """
+        rows = [(int(mid), source, str(ext)) for mid, source, ext in rows]
+        if not rows:
+            return []
+        unique = list(dict.fromkeys(rows))
+        with self.transaction():
+            with self._cursor() as cur:
+                returned = execute_values(cur, """
+                    INSERT INTO external_ids (media_item_id, source, external_id)
+                    VALUES %s
+                    ON CONFLICT (media_item_id, source, external_id) DO NOTHING
+                    RETURNING media_item_id, source, external_id
+                """, unique, page_size=BULK_PAGE_SIZE, fetch=True)
+            if returned:
+                self._wanted_changed("external_added", rows=[tuple(r) for r in returned])
+        inserted = {tuple(r) for r in returned}
+        results = []
+        seen = set()
+        for row in rows:
+            results.append(row in inserted and row not in seen)
+            seen.add(row)
+        return results
+
     def add_external_id(self, media_item_id: int, source: str, external_id: str) -> bool:
-        with self.conn.cursor() as cur:
+        """Attach an external ID; returns False if the item already had exactly this one."""
+        with self.transaction(), self._cursor() as cur:
             cur.execute("""
                 INSERT INTO external_ids (media_item_id, source, external_id)
                 VALUES (%s, %s, %s)
+                ON CONFLICT (media_item_id, source, external_id) DO NOTHING
             """, (media_item_id, source, external_id))
-            return cur.rowcount > 0
+            if cur.rowcount <= 0:
+                return False
+            self._wanted_changed("external_added", rows=[(media_item_id, source, external_id)])
+            return True
+
+    def delete_external_ids(self, source: str, external_id: str) -> int:
+        """Detach source/external_id from every media item; returns the rows removed."""
+        with self.transaction(), self._cursor() as cur:
+            cur.execute("""
+                DELETE FROM external_ids
+                WHERE source = %s AND external_id = %s
+                RETURNING media_item_id, source, external_id
+            """, (source, str(external_id)))
+            removed = [tuple(r) for r in cur.fetchall()]
+            if removed:
+                self._wanted_changed("external_removed", rows=removed)
+            return len(removed)
+
+    def get_media_ids_by_external(self, sources: list[str], external_id: str) -> list[int]:
+        with self._cursor() as cur:
+            cur.execute("""
+                SELECT DISTINCT media_item_id
+                FROM external_ids
+                WHERE source = ANY(%s) AND external_id = %s
+                ORDER BY media_item_id
+            """, (list(sources), str(external_id)))
+            return [r[0] for r in cur.fetchall()]
 
     def has_external_id(self, source: str, external_id: str) -> bool:
         if not source or not external_id:
             return False
-        with self.conn.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute("""
                 SELECT 1
                 FROM external_ids
@@ -164,21 +704,31 @@ class MediaDB:
             return cur.fetchone() is not None
 
     def delete_media_item(self, media_item_id: int) -> bool:
-        with self.conn.cursor() as cur:
+        with self.transaction(), self._cursor() as cur:
             cur.execute("""
                 DELETE FROM media_items
                 WHERE id = %s
             """, (media_item_id,))
-            return cur.rowcount > 0
+            if cur.rowcount <= 0:
+                return False
+            self._wanted_changed("media_deleted", ids=[media_item_id])
+            return True
     
     def get_wanted_items(self, media_type:str | None = None, limit:int = 5) -> list[Media]:
+        """
+        Media items (newest first) with their external IDs aggregated per item in SQL,
+        so the LIMIT counts items and each item is a single row.
+        """
         query = """
             SELECT
                 mi.*,
-                ei.source AS ext_source,
-                ei.external_id
+                COALESCE(ei.ids, '{}'::jsonb) AS external_ids
             FROM media_items mi
-            LEFT JOIN external_ids ei ON ei.media_item_id = mi.id
+            LEFT JOIN LATERAL (
+                SELECT jsonb_object_agg(e.source, e.external_id ORDER BY e.id) AS ids
+                FROM external_ids e
+                WHERE e.media_item_id = mi.id
+            ) ei ON TRUE
         """
         params = []
         if media_type:
@@ -191,34 +741,215 @@ class MediaDB:
             query += " LIMIT %s"
             params.append(limit)
 
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self._cursor(RealDictCursor) as cur:
             cur.execute(query, params)
             rows = cur.fetchall()
 
-        items: dict[int, Media] = {}
-
+        items = []
         for r in rows:
-            mid = r["id"]
-            if mid not in items:
-                items[mid] = Media(
-                    id=mid,
-                    title=r["title"],
-                    year=r["year"],
-                    media_type=r["media_type"],
-                    category=r["category"],
-                    source=r["source"],
-                    source_ref=r["source_ref"],
-                    original_title=r.get("original_title"),
-                    language=r.get("language"),
-                    created_at=r.get("created_at"),
-                    status=None
-                )
-
-            if r["ext_source"]:
-                items[mid].external_ids[r["ext_source"]] = r["external_id"]
-
-        return list(items.values())
+            item = _media_from_row(r)
+            item.external_ids = r["external_ids"]
+            items.append(item)
+        return items
+
+    def iter_media_items(
+        self,
+        media_type: str | None = None,
+        columns: tuple[str, ...] | None = None,
+        external_sources: tuple[str, ...] | None = None,
+        itersize: int = ITER_SIZE
+    ) -> Iterator[Media]:
+        """
+        Stream every media item (in no particular order) through a named server-side cursor,
+        `itersize` rows at a time, so whole-collection scans keep bounded memory.
+        The scan runs inside transaction(): the connection stays leased until the generator ends.
+
+        columns: media_items columns to load (default: all); the others are None on the Media.
+        external_sources: only aggregate these external ID sources (default: all, () = none).
+        """
+        selected = MEDIA_COLUMNS if columns is None else tuple(c for c in columns if c in MEDIA_COLUMNS)
+        fields = ["mi.id"] + [f"mi.{c}" for c in selected]
+        params: list = []
+        lateral = ""
+        if external_sources is None or external_sources:
+            source_filter = ""
+            if external_sources:
+                source_filter = "AND e.source = ANY(%s)"
+                params.append(list(external_sources))
+            fields.append("COALESCE(ei.ids, '{}'::jsonb) AS external_ids")
+            lateral = f"""
+                LEFT JOIN LATERAL (
+                    SELECT jsonb_object_agg(e.source, e.external_id ORDER BY e.id) AS ids
+                    FROM external_ids e
+                    WHERE e.media_item_id = mi.id {source_filter}
+                ) ei ON TRUE
+            """
+        query = f"SELECT {', '.join(fields)} FROM media_items mi {lateral}"
+        if media_type:
+            query += " WHERE mi.media_type = %s"
+            params.append(media_type)
+
+        # Il cursore con nome vive nella transazione (quella del chiamante, se gia aperta)
+        with self.transaction() as conn:
+            with conn.cursor(name=f"mmc_iter_{uuid.uuid4().hex}", cursor_factory=RealDictCursor) as cur:
+                cur.itersize = itersize
+                cur.execute(query, params)
+                for r in cur:
+                    item = _media_from_row(r)
+                    if "external_ids" in r:
+                        item.external_ids = r["external_ids"]
+                    yield item
+
+    def get_wanted_page(
+        self,
+        filters: dict | None = None,
+        sort: str = "created_at",
+        descending: bool = True,
+        limit: int = 100,
+        cursor: str | None = None
+    ) -> dict:
+        """
+        Keyset-paginated wanted listing with server-side filters.
+
+        Filters: media_type, category, source, q (title search), import_path and the tri-state flags
+        has_tmdb, has_tvdb, in_radarr, in_sonarr, downloaded (True/False/None).
+        The downloaded flag needs filters["downloaded_ids"] = {"tmdb": [...], "tvdb": [...]}.
+        Returns {"items": list[Media], "next_cursor": str | None}.
+        """
+        filters = filters or {}
+        if sort not in WANTED_SORTS:
+            sort = "created_at"
+        sort_expr = WANTED_SORTS[sort]
+        limit = max(1, min(int(limit or 100), 500))
+
+        where = []
+        params: list = []
+        for column in ("media_type", "category", "source"):
+            value = filters.get(column)
+            if value:
+                where.append(f"mi.{column} = %s")
+                params.append(value)
+        query_text = (filters.get("q") or "").strip()
+        if query_text:
+            like = _like_pattern(query_text)
+            where.append("(mi.title ILIKE %s OR mi.original_title ILIKE %s)")
+            params.extend([like, like])
+        import_path = filters.get("import_path")
+        if import_path:
+            where.append(f"mi.source = 'plex db' AND {WANTED_IMPORT_PATH_SQL} = %s")
+            params.extend([WANTED_IMPORT_PATH_RE, import_path])
+        for flag, ext_source in (
+            ("has_tmdb", "tmdb"),
+            ("has_tvdb", "tvdb"),
+            ("in_radarr", "radarr"),
+            ("in_sonarr", "sonarr")
+        ):
+            value = filters.get(flag)
+            if value is None:
+                continue
+            where.append(
+                f"{'' if value else 'NOT '}EXISTS ("
+                "SELECT 1 FROM external_ids e WHERE e.media_item_id = mi.id AND e.source = %s)"
+            )
+            params.append(ext_source)
+        downloaded = filters.get("downloaded")
+        if downloaded is not None:
+            downloaded_ids = filters.get("downloaded_ids") or {}
+            where.append(f"""{'' if downloaded else 'NOT '}EXISTS (
+                SELECT 1 FROM external_ids e
+                WHERE e.media_item_id = mi.id
+                  AND (
+                    (mi.media_type = 'movie' AND e.source = 'tmdb' AND e.external_id = ANY(%s))
+                    OR (mi.media_type <> 'movie' AND e.source = 'tvdb' AND e.external_id = ANY(%s))
+                  )
+            )""")
+            params.extend([
+                [str(v) for v in downloaded_ids.get("tmdb") or []],
+                [str(v) for v in downloaded_ids.get("tvdb") or []]
+            ])
+        if cursor:
+            position = _decode_page_cursor(cursor, sort)
+            if position:
+                where.append(f"({sort_expr}, mi.id) {'<' if descending else '>'} (%s, %s)")
+                params.extend(position)
+
+        direction = "DESC" if descending else "ASC"
+        query = f"SELECT mi.*, {sort_expr} AS sort_key FROM media_items mi"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += f" ORDER BY {sort_expr} {direction}, mi.id {direction} LIMIT %s"
+        params.append(limit + 1)
+
+        with self._cursor(RealDictCursor) as cur:
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            items = [_media_from_row(r) for r in rows]
+            if items:
+                by_id = {item.id: item for item in items}
+                cur.execute("""
+                    SELECT media_item_id, source, external_id
+                    FROM external_ids
+                    WHERE media_item_id = ANY(%s)
+                    ORDER BY id
+                """, (list(by_id.keys()),))
+                for r in cur.fetchall():
+                    by_id[r["media_item_id"]].external_ids[r["source"]] = r["external_id"]
+
+        next_cursor = None
+        if has_more and rows:
+            next_cursor = _encode_page_cursor(sort, rows[-1]["sort_key"], rows[-1]["id"])
+        return {"items": items, "next_cursor": next_cursor}
     
+    def get_wanted_stats(self) -> dict[str, int]:
+        """
+        Counters of the wanted page header over the whole list: items, movies, series,
+        items missing at least one external ID (tmdb for movies, tvdb for series, anilist
+        for anime, each item counted once) and items in Radarr/Sonarr according to the
+        local library copy.
+        """
+        with self._cursor(RealDictCursor) as cur:
+            cur.execute("""
+                SELECT
+                    COUNT(*) AS total,
+                    COUNT(*) FILTER (WHERE mi.media_type = 'movie') AS movies,
+                    COUNT(*) FILTER (WHERE mi.media_type = 'series') AS series,
+                    COUNT(*) FILTER (WHERE
+                        (mi.media_type = 'movie' AND x.tmdb IS NULL)
+                        OR (mi.media_type = 'series' AND x.tvdb IS NULL)
+                        OR (mi.category = 'anime' AND x.anilist IS NULL)
+                    ) AS missing,
+                    COUNT(*) FILTER (WHERE EXISTS (
+                        SELECT 1 FROM arr_movies a WHERE a.tmdb_id::text = x.tmdb
+                    )) AS in_radarr,
+                    COUNT(*) FILTER (WHERE EXISTS (
+                        SELECT 1 FROM arr_series a WHERE a.tvdb_id::text = x.tvdb
+                    )) AS in_sonarr
+                FROM media_items mi
+                -- Un ID per sorgente, l'ultimo inserito come in Media.external_ids
+                LEFT JOIN LATERAL (
+                    SELECT
+                        (array_agg(e.external_id ORDER BY e.id DESC) FILTER (WHERE e.source = 'tmdb'))[1] AS tmdb,
+                        (array_agg(e.external_id ORDER BY e.id DESC) FILTER (WHERE e.source = 'tvdb'))[1] AS tvdb,
+                        (array_agg(e.external_id ORDER BY e.id DESC) FILTER (WHERE e.source = 'anilist'))[1] AS anilist
+                    FROM external_ids e
+                    WHERE e.media_item_id = mi.id
+                ) x ON TRUE
+            """)
+            return dict(cur.fetchone())
+
+    def get_wanted_import_paths(self) -> list[str]:
+        """Distinct import folders of the "plex db" items (see WANTED_IMPORT_PATH_RE), sorted."""
+        with self._cursor() as cur:
+            cur.execute(f"""
+                SELECT DISTINCT {WANTED_IMPORT_PATH_SQL} AS import_path
+                FROM media_items mi
+                WHERE mi.source = 'plex db' AND mi.source_ref IS NOT NULL
+                ORDER BY import_path
+            """, (WANTED_IMPORT_PATH_RE,))
+            return [row[0] for row in cur.fetchall() if row[0]]
+
     def mark_as_processed(self, title, year, status="processed") -> bool:
         """
         Mark a media item as processed.
@@ -228,7 +959,7 @@ class MediaDB:
             year (int): Release year.
             status (str, optional): Status to set ('processed', 'error').
         """
-        with self.conn.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute("""
                 UPDATE media_items
                 SET status=%s
@@ -243,7 +974,7 @@ class MediaDB:
         Returns:
             dict or None: Media item if found.
         """
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self._cursor(RealDictCursor) as cur:
             cur.execute("""
                 SELECT * FROM media_items
                 WHERE title=%s AND year=%s
@@ -251,12 +982,12 @@ class MediaDB:
             return cur.fetchone()
     
     def count_media(self):
-        with self.conn.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute("SELECT COUNT(*) FROM media_items")
             return cur.fetchone()[0]
     
     def count_present(self):
-        with self.conn.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute("""
                 SELECT COUNT(DISTINCT mi.id)
                 FROM media_items mi
@@ -266,7 +997,7 @@ class MediaDB:
             return cur.fetchone()[0]
     
     def count_missing(self):
-        with self.conn.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute("""
                 SELECT COUNT(*)
                 FROM media_items mi
@@ -287,11 +1018,210 @@ class MediaDB:
             WHERE source IN ({placeholders})
             GROUP BY source
         """
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self._cursor(RealDictCursor) as cur:
             cur.execute(query, sources)
             rows = cur.fetchall()
         return {row["source"]: row["total"] for row in rows}
     
+    def get_dashboard_stats(self, sources: list[str], limit: int = 5) -> dict:
+        """
+        Every dashboard figure in one round trip: counters, items per source and the
+        newest `limit` movies, series and imports (aggregated to JSON in SQL).
+        """
+        query = """
+            SELECT
+                (SELECT COUNT(*) FROM media_items) AS total,
+                (
+                    SELECT COUNT(DISTINCT media_item_id)
+                    FROM external_ids
+                    WHERE source IN ('radarr', 'sonarr')
+                ) AS present,
+                (
+                    SELECT COALESCE(jsonb_object_agg(s.source, s.total), '{}'::jsonb)
+                    FROM (
+                        SELECT source, COUNT(*) AS total
+                        FROM media_items
+                        WHERE source = ANY(%(sources)s)
+                        GROUP BY source
+                    ) s
+                ) AS by_source,
+                (
+                    SELECT COALESCE(jsonb_agg(to_jsonb(m) ORDER BY m.created_at DESC), '[]'::jsonb)
+                    FROM (
+                        SELECT title, year, created_at
+                        FROM media_items
+                        WHERE media_type = 'movie'
+                        ORDER BY created_at DESC
+                        LIMIT %(limit)s
+                    ) m
+                ) AS wanted_movies,
+                (
+                    SELECT COALESCE(jsonb_agg(to_jsonb(s) ORDER BY s.created_at DESC), '[]'::jsonb)
+                    FROM (
+                        SELECT title, year, created_at
+                        FROM media_items
+                        WHERE media_type = 'series'
+                        ORDER BY created_at DESC
+                        LIMIT %(limit)s
+                    ) s
+                ) AS wanted_series,
+                (
+                    SELECT COALESCE(jsonb_agg(to_jsonb(l) ORDER BY l.created_at DESC), '[]'::jsonb)
+                    FROM (
+                        SELECT title, year, source, created_at
+                        FROM media_items
+                        ORDER BY created_at DESC
+                        LIMIT %(limit)s
+                    ) l
+                ) AS last_imports
+        """
+        with self._cursor(RealDictCursor) as cur:
+            cur.execute(query, {"sources": list(sources), "limit": limit})
+            row = cur.fetchone()
+        return {
+            "counts": {
+                "total": row["total"],
+                "present": row["present"],
+                "missing": row["total"] - row["present"]
+            },
+            "by_source": row["by_source"],
+            "wanted_movies": row["wanted_movies"],
+            "wanted_series": row["wanted_series"],
+            "last_imports": row["last_imports"]
+        }
+
+    def _upsert_arr_rows(self, cur, service: str, rows: list[dict], keep: tuple[str, ...] = ()) -> None:
+        spec = ARR_MIRROR[service]
+        columns = (spec["key"],) + spec["columns"] + ("row_hash",)
+        # Le colonne in `keep` mantengono il valore esistente sulle righe gia presenti
+        assignments = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns[1:] if column not in keep)
+        execute_values(cur, f"""
+            INSERT INTO {spec["table"]} ({", ".join(columns)})
+            VALUES %s
+            ON CONFLICT ({spec["key"]}) DO UPDATE
+            SET {assignments}, synced_at = now()
+        """, [tuple(row.get(column) for column in columns) for row in rows], page_size=BULK_PAGE_SIZE)
+
+    def sync_arr_mirror(self, service: str, rows: list[dict]) -> dict[str, int]:
+        """
+        Replace the local copy of a Radarr/Sonarr library with `rows` (dicts keyed by the
+        ARR_MIRROR columns plus row_hash). Only new or changed rows are written and rows
+        missing from the library are deleted, all in one transaction.
+        """
+        spec = ARR_MIRROR[service]
+        table, key = spec["table"], spec["key"]
+        incoming = {row[key]: row for row in rows if row.get(key)}
+        with self.transaction(), self._cursor() as cur:
+            cur.execute(f"SELECT {key}, row_hash FROM {table}")
+            current = dict(cur.fetchall())
+            changed = [row for row_key, row in incoming.items() if current.get(row_key) != row["row_hash"]]
+            removed = [row_key for row_key in current if row_key not in incoming]
+            if changed:
+                self._upsert_arr_rows(cur, service, changed)
+            if removed:
+                cur.execute(f"DELETE FROM {table} WHERE {key} = ANY(%s)", (removed,))
+            cur.execute("""
+                INSERT INTO arr_sync_state (service, last_success_at, last_attempt_at, last_error, item_count)
+                VALUES (%s, now(), now(), NULL, %s)
+                ON CONFLICT (service) DO UPDATE
+                SET last_success_at = now(),
+                    last_attempt_at = now(),
+                    last_error = NULL,
+                    item_count = EXCLUDED.item_count
+            """, (service, len(incoming)))
+        inserted = sum(1 for row in changed if row[key] not in current)
+        return {
+            "inserted": inserted,
+            "updated": len(changed) - inserted,
+            "deleted": len(removed),
+            "unchanged": len(incoming) - len(changed)
+        }
+
+    def upsert_arr_mirror(self, service: str, rows: list[dict], keep: tuple[str, ...] = ()) -> None:
+        """Write single Radarr/Sonarr rows changed by the app, without a full sync."""
+        if not rows:
+            return
+        with self._cursor() as cur:
+            self._upsert_arr_rows(cur, service, rows, keep)
+
+    def delete_arr_mirror(self, service: str, arr_ids: list[int]) -> int:
+        """Remove rows by Radarr/Sonarr internal id."""
+        if not arr_ids:
+            return 0
+        with self._cursor() as cur:
+            cur.execute(f"DELETE FROM {ARR_MIRROR[service]['table']} WHERE arr_id = ANY(%s)", (list(arr_ids),))
+            return cur.rowcount
+
+    def set_arr_sync_error(self, service: str, error: str) -> None:
+        with self._cursor() as cur:
+            cur.execute("""
+                INSERT INTO arr_sync_state (service, last_attempt_at, last_error)
+                VALUES (%s, now(), %s)
+                ON CONFLICT (service) DO UPDATE
+                SET last_attempt_at = now(), last_error = EXCLUDED.last_error
+            """, (service, error))
+
+    def get_arr_sync_state(self) -> dict[str, dict]:
+        with self._cursor(RealDictCursor) as cur:
+            cur.execute("SELECT * FROM arr_sync_state")
+            return {row["service"]: dict(row) for row in cur.fetchall()}
+
+    def get_arr_sync_age(self, service: str) -> float | None:
+        """Seconds since the last sync attempt of `service` by any worker (None if never attempted)."""
+        with self._cursor() as cur:
+            cur.execute("""
+                SELECT EXTRACT(EPOCH FROM now() - last_attempt_at)
+                FROM arr_sync_state
+                WHERE service = %s AND last_attempt_at IS NOT NULL
+            """, (service,))
+            row = cur.fetchone()
+        return float(row[0]) if row else None
+
+    def get_arr_counters(self) -> dict[str, dict | None]:
+        """
+        Dashboard counters (total, monitored, downloaded) of the local Radarr/Sonarr copy;
+        None for a service that has never completed a sync.
+        """
+        with self._cursor(RealDictCursor) as cur:
+            cur.execute("""
+                SELECT
+                    (
+                        SELECT jsonb_build_object(
+                            'total', COUNT(*),
+                            'monitored', COUNT(*) FILTER (WHERE monitored),
+                            'downloaded', COUNT(*) FILTER (WHERE has_file)
+                        )
+                        FROM arr_movies
+                    ) AS radarr,
+                    (
+                        SELECT jsonb_build_object(
+                            'total', COUNT(*),
+                            'monitored', COUNT(*) FILTER (WHERE monitored),
+                            'downloaded', COUNT(*) FILTER (WHERE episode_count > 0 AND episode_file_count >= episode_count)
+                        )
+                        FROM arr_series
+                    ) AS sonarr,
+                    (
+                        SELECT COALESCE(array_agg(service), '{}')
+                        FROM arr_sync_state
+                        WHERE last_success_at IS NOT NULL
+                    ) AS synced
+            """)
+            row = cur.fetchone()
+        synced = set(row["synced"])
+        return {service: (row[service] if service in synced else None) for service in ("radarr", "sonarr")}
+
+    def get_arr_mirror(self, service: str, columns: tuple[str, ...] | None = None) -> list[dict]:
+        """Rows of the local Radarr/Sonarr copy (all ARR_MIRROR columns unless `columns` is given)."""
+        spec = ARR_MIRROR[service]
+        allowed = (spec["key"],) + spec["columns"]
+        selected = [column for column in (columns or allowed) if column in allowed]
+        if spec["key"] not in selected:
+            selected.insert(0, spec["key"])
+        with self._cursor(RealDictCursor) as cur:
+            cur.execute(f"SELECT {', '.join(selected)} FROM {spec['table']}")
+            return [dict(row) for row in cur.fetchall()]
+
     def get_last_imports(self, limit=5):
         return self.get_wanted_items(limit=limit)
 
@@ -306,7 +1236,7 @@ class MediaDB:
             WHERE mi.id = %s
         """
 
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self._cursor(RealDictCursor) as cur:
             cur.execute(query, (media_item_id,))
             rows = cur.fetchall()
 
@@ -333,6 +1263,39 @@ class MediaDB:
 
         return item
 
+    def get_media_items(self, media_item_ids: list[int]) -> dict[int, Media]:
+        """
+        Load many media items with their external IDs in a single query.
+        Returns a dict keyed by media item id; missing ids are simply absent.
+        """
+        ids = list({int(mid) for mid in media_item_ids})
+        if not ids:
+            return {}
+        query = """
+            SELECT
+                mi.*,
+                ei.source AS ext_source,
+                ei.external_id
+            FROM media_items mi
+            LEFT JOIN external_ids ei ON ei.media_item_id = mi.id
+            WHERE mi.id = ANY(%s)
+            ORDER BY mi.id, ei.id
+        """
+
+        with self._cursor(RealDictCursor) as cur:
+            cur.execute(query, (ids,))
+            rows = cur.fetchall()
+
+        items: dict[int, Media] = {}
+        for r in rows:
+            item = items.get(r["id"])
+            if item is None:
+                item = _media_from_row(r)
+                items[r["id"]] = item
+            if r.get("ext_source"):
+                item.external_ids[r["ext_source"]] = r["external_id"]
+        return items
+
     def merge_media_items(self, keep_id: int, merge_ids: list[int]) -> int:
         """
         Merge media items by moving references to keep_id and deleting merge_ids.
@@ -345,7 +1308,7 @@ class MediaDB:
         if not merge_ids:
             return 0
 
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self.transaction(), self._cursor(RealDictCursor) as cur:
             cur.execute(
                 "SELECT 1 FROM media_items WHERE id = %s",
                 (keep_id,)
@@ -359,6 +1322,8 @@ class MediaDB:
                 SELECT %s, source, external_id
                 FROM external_ids
                 WHERE media_item_id = ANY(%s)
+                ORDER BY id
+                ON CONFLICT (media_item_id, source, external_id) DO NOTHING
                 """,
                 (keep_id, merge_ids)
             )
@@ -376,14 +1341,17 @@ class MediaDB:
                 "DELETE FROM media_items WHERE id = ANY(%s)",
                 (merge_ids,)
             )
-            return cur.rowcount
+            deleted = cur.rowcount
+            if deleted:
+                self._wanted_changed("media_merged", keep_id=keep_id, merge_ids=merge_ids)
+            return deleted
         
     def get_services(self) -> 'list[Service]':
             """
             Load all services with their settings from the database
             and return them as a list of Service objects.
             """
-            with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            with self._cursor(RealDictCursor) as cur:
                 cur.execute("""
                     SELECT s.id AS service_id, s.name AS service_name, s.description AS service_desc, s.enabled AS service_enabled,
                         ss.id AS setting_id, ss.key AS setting_key, ss.label, ss.value, ss.value_type, ss.required
@@ -420,7 +1388,7 @@ class MediaDB:
             return list(services_dict.values())
     
     def get_service_settings(self, service_name):
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self._cursor(RealDictCursor) as cur:
             cur.execute("""
                 SELECT  ss.id, ss.service_id, ss.key, ss.label, ss.value, ss.value_type, ss.required
                 FROM service_settings ss
@@ -430,7 +1398,55 @@ class MediaDB:
             """, (service_name,))
             return cur.fetchall()
 
+    def _check_config_version(self) -> None:
+        """
+        Svuota la cache di configurazione se un altro worker ha modificato i settings.
+        Il contatore config_version viene letto al massimo ogni CONFIG_CACHE_CHECK secondi.
+        """
+        now = time.monotonic()
+        with self._config_lock:
+            if now - self._config_checked_at < CONFIG_CACHE_CHECK:
+                return
+            self._config_checked_at = now
+        try:
+            with self._cursor() as cur:
+                cur.execute("SELECT version FROM config_version WHERE id")
+                row = cur.fetchone()
+            version = row[0] if row else None
+        except psycopg2.Error as exc:
+            # Schema non aggiornato: senza contatore la cache vale solo CONFIG_CACHE_CHECK secondi
+            print(f"config_version non disponibile: {exc}")
+            version = None
+        with self._config_lock:
+            if version is None or version != self._config_version:
+                self._config_cache.clear()
+                self._config_generation += 1
+            self._config_version = version
+
+    def invalidate_service_config(self) -> None:
+        with self._config_lock:
+            self._config_cache.clear()
+            self._config_generation += 1
+            self._config_checked_at = 0.0
+
     def get_service_config(self, service_name: str) -> dict[str, object]:
+        """
+        Configurazione tipizzata di un servizio, servita dalla cache in memoria del processo.
+        Viene invalidata da set_service_setting(s) e, tra worker, da config_version.
+        """
+        self._check_config_version()
+        with self._config_lock:
+            cached = self._config_cache.get(service_name)
+            generation = self._config_generation
+        if cached is not None:
+            return dict(cached)
+        config = self._load_service_config(service_name)
+        with self._config_lock:
+            if generation == self._config_generation:
+                self._config_cache[service_name] = config
+        return dict(config)
+
+    def _load_service_config(self, service_name: str) -> dict[str, object]:
         rows = self.get_service_settings(service_name)
         config: dict[str, object] = {}
         for row in rows:
@@ -448,18 +1464,19 @@ class MediaDB:
         return config
         
     def set_service_setting(self, setting_id: int, value: str | None) -> bool:
-        with self.conn.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute("""
                 UPDATE service_settings
                 SET value=%s
                 WHERE id=%s
             """, (value, setting_id))
-            self.conn.commit()
-            return cur.rowcount > 0
+            updated = cur.rowcount > 0
+        self.invalidate_service_config()
+        return updated
 
     def set_service_settings(self, settings: 'list[ServiceSetting]') -> int:
         updated = 0
-        with self.conn.cursor() as cur:
+        with self._cursor() as cur:
             for setting in settings:
                 cur.execute("""
                     UPDATE service_settings
@@ -467,26 +1484,27 @@ class MediaDB:
                     WHERE id=%s
                 """, (setting.value, setting.id))
                 updated += cur.rowcount
-        self.conn.commit()
+        self.invalidate_service_config()
         return updated
 
     def get_ddunlimited_sources(self, include_disabled: bool = False) -> list[dict]:
         query = """
             SELECT
                 id, name, url, media_type, category, quality, language,
-                enabled, last_count, last_checked, created_at, updated_at
+                enabled, last_count, last_checked, created_at, updated_at,
+                etag, last_modified, content_hash, items_signature
             FROM ddunlimited_sources
         """
         params = []
         if not include_disabled:
             query += " WHERE enabled = TRUE"
         query += " ORDER BY name"
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self._cursor(RealDictCursor) as cur:
             cur.execute(query, params)
             return cur.fetchall()
 
     def add_ddunlimited_source(self, data: dict) -> int | None:
-        with self.conn.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute("""
                 INSERT INTO ddunlimited_sources
                     (name, url, media_type, category, quality, language, enabled)
@@ -502,7 +1520,6 @@ class MediaDB:
                 data.get("enabled", True)
             ))
             row = cur.fetchone()
-            self.conn.commit()
             return row[0] if row else None
 
     def update_ddunlimited_source(self, source_id: int, data: dict) -> bool:
@@ -517,29 +1534,28 @@ class MediaDB:
             return False
         fields.append("updated_at=now()")
         values.append(source_id)
-        with self.conn.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute(
                 f"UPDATE ddunlimited_sources SET {', '.join(fields)} WHERE id=%s",
                 values
             )
-            self.conn.commit()
             return cur.rowcount > 0
 
     def delete_ddunlimited_source(self, source_id: int) -> bool:
-        with self.conn.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute(
                 "DELETE FROM ddunlimited_sources WHERE id=%s",
                 (source_id,)
             )
-            self.conn.commit()
             return cur.rowcount > 0
 
     def get_ddunlimited_source(self, source_id: int) -> dict | None:
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self._cursor(RealDictCursor) as cur:
             cur.execute("""
                 SELECT
                     id, name, url, media_type, category, quality, language,
-                    enabled, last_count, last_checked, created_at, updated_at
+                    enabled, last_count, last_checked, created_at, updated_at,
+                    etag, last_modified, content_hash
                 FROM ddunlimited_sources
                 WHERE id = %s
             """, (source_id,))
@@ -548,7 +1564,7 @@ class MediaDB:
     def get_ddunlimited_source_by_url(self, url: str) -> dict | None:
         if not url:
             return None
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+        with self._cursor(RealDictCursor) as cur:
             cur.execute("""
                 SELECT
                     id, name, url, media_type, category, quality, language,
@@ -560,11 +1576,340 @@ class MediaDB:
             return cur.fetchone()
 
     def set_ddunlimited_source_stats(self, source_id: int, last_count: int) -> bool:
-        with self.conn.cursor() as cur:
+        with self._cursor() as cur:
             cur.execute("""
                 UPDATE ddunlimited_sources
                 SET last_count=%s, last_checked=now(), updated_at=now()
                 WHERE id=%s
             """, (last_count, source_id))
-            self.conn.commit()
+            return cur.rowcount > 0
+
+    def set_ddunlimited_source_fetch(
+        self,
+        source_id: int,
+        etag: str | None,
+        last_modified: str | None,
+        content_hash: str | None,
+        last_count: int | None = None
+    ) -> bool:
+        """Store the validators of the last downloaded list page (conditional refresh)."""
+        with self._cursor() as cur:
+            cur.execute("""
+                UPDATE ddunlimited_sources
+                SET etag=%s, last_modified=%s, content_hash=%s,
+                    last_count=COALESCE(%s, last_count), last_checked=now(), updated_at=now()
+                WHERE id=%s
+            """, (etag, last_modified, content_hash, last_count, source_id))
             return cur.rowcount > 0
+
+    def sync_ddunlimited_source_items(self, source_id: int, rows: list[dict], signature: str) -> dict[str, int]:
+        """
+        Replace the parsed items of one list source with `rows` (dicts with item_key,
+        position, data, row_hash), one per page position: only new or changed positions are
+        written and missing ones deleted, in one transaction that also stores the source signature.
+        """
+        incoming = {row["position"]: row for row in rows}
+        with self.transaction(), self._cursor() as cur:
+            cur.execute(
+                "SELECT position, row_hash FROM ddunlimited_source_items WHERE source_id = %s",
+                (source_id,)
+            )
+            current = dict(cur.fetchall())
+            changed = [row for position, row in incoming.items() if current.get(position) != row["row_hash"]]
+            removed = [position for position in current if position not in incoming]
+            if changed:
+                execute_values(cur, """
+                    INSERT INTO ddunlimited_source_items (source_id, item_key, position, data, row_hash)
+                    VALUES %s
+                    ON CONFLICT (source_id, position) DO UPDATE
+                    SET item_key = EXCLUDED.item_key, data = EXCLUDED.data, row_hash = EXCLUDED.row_hash
+                """, [
+                    (source_id, row["item_key"], row["position"], Json(row["data"]), row["row_hash"])
+                    for row in changed
+                ], page_size=BULK_PAGE_SIZE)
+            if removed:
+                cur.execute(
+                    "DELETE FROM ddunlimited_source_items WHERE source_id = %s AND position = ANY(%s)",
+                    (source_id, removed)
+                )
+            cur.execute(
+                "UPDATE ddunlimited_sources SET items_signature = %s WHERE id = %s",
+                (signature, source_id)
+            )
+        inserted = sum(1 for row in changed if row["position"] not in current)
+        return {
+            "inserted": inserted,
+            "updated": len(changed) - inserted,
+            "deleted": len(removed),
+            "unchanged": len(incoming) - len(changed)
+        }
+
+    def get_ddunlimited_source_items(self, source_ids: list[int]) -> dict[int, list[dict]]:
+        """Stored items (the `data` dicts) of the given sources, in page order."""
+        result: dict[int, list[dict]] = {source_id: [] for source_id in source_ids}
+        if not source_ids:
+            return result
+        with self._cursor() as cur:
+            cur.execute("""
+                SELECT source_id, data
+                FROM ddunlimited_source_items
+                WHERE source_id = ANY(%s)
+                ORDER BY source_id, position
+            """, (list(source_ids),))
+            for source_id, data in cur:
+                result[source_id].append(data)
+        return result
+
+    def sync_ddunlimited_items(self, rows: list[dict], source_ids: list[int]) -> dict[str, int]:
+        """
+        Replace the merged release cache with `rows` (dicts keyed by DDU_ITEM_COLUMNS plus
+        row_hash), writing only changed rows, and record the sources it was built from.
+        """
+        columns = DDU_ITEM_COLUMNS + ("row_hash",)
+        incoming = {row["item_key"]: row for row in rows}
+        with self.transaction(), self._cursor() as cur:
+            cur.execute("SELECT item_key, row_hash FROM ddunlimited_items")
+            current = dict(cur.fetchall())
+            changed = [row for item_key, row in incoming.items() if current.get(item_key) != row["row_hash"]]
+            removed = [item_key for item_key in current if item_key not in incoming]
+            if changed:
+                assignments = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns[1:])
+                execute_values(cur, f"""
+                    INSERT INTO ddunlimited_items ({", ".join(columns)})
+                    VALUES %s
+                    ON CONFLICT (item_key) DO UPDATE
+                    SET {assignments}, updated_at = now()
+                """, [tuple(row.get(column) for column in columns) for row in changed], page_size=BULK_PAGE_SIZE)
+            if removed:
+                cur.execute("DELETE FROM ddunlimited_items WHERE item_key = ANY(%s)", (removed,))
+            if changed or removed:
+                # Gli indici di ricerca dei worker si ricostruiscono quando cambia la versione
+                cur.execute("UPDATE ddunlimited_cache_state SET items_version = items_version + 1 WHERE id")
+            self._touch_ddunlimited_cache(cur, source_ids)
+        inserted = sum(1 for row in changed if row["item_key"] not in current)
+        return {
+            "inserted": inserted,
+            "updated": len(changed) - inserted,
+            "deleted": len(removed),
+            "unchanged": len(incoming) - len(changed)
+        }
+
+    @staticmethod
+    def _touch_ddunlimited_cache(cur, source_ids: list[int]) -> None:
+        cur.execute(
+            "UPDATE ddunlimited_cache_state SET source_ids = %s, updated_at = now() WHERE id",
+            (list(source_ids),)
+        )
+
+    def touch_ddunlimited_cache(self, source_ids: list[int]) -> None:
+        """Mark the merged cache as refreshed when no source changed."""
+        with self._cursor() as cur:
+            self._touch_ddunlimited_cache(cur, source_ids)
+
+    def get_ddunlimited_cache_state(self) -> dict:
+        """count, sources (ids in merge order) and updated_at of the merged release cache."""
+        with self._cursor(RealDictCursor) as cur:
+            cur.execute("""
+                SELECT
+                    (SELECT count(*) FROM ddunlimited_items) AS count,
+                    s.source_ids,
+                    s.updated_at
+                FROM ddunlimited_cache_state s
+                WHERE s.id
+            """)
+            row = cur.fetchone()
+        if not row:
+            return {"count": 0, "source_ids": [], "updated_at": None}
+        return {"count": row["count"], "source_ids": list(row["source_ids"] or []), "updated_at": row["updated_at"]}
+
+    def get_ddunlimited_items_version(self) -> int | None:
+        try:
+            with self._cursor() as cur:
+                cur.execute("SELECT items_version FROM ddunlimited_cache_state WHERE id")
+                row = cur.fetchone()
+        except psycopg2.Error as exc:
+            print(f"Versione della cache DDU non disponibile: {exc}")
+            return None
+        return row[0] if row else None
+
+    def get_ddunlimited_search_texts(self) -> tuple[int | None, list[tuple[str, str]]]:
+        """items_version and (item_key, search_text) of every merged release, in merge order."""
+        with self.transaction(), self._cursor() as cur:
+            # Versione letta prima delle righe: una scrittura concorrente la fa risultare
+            # vecchia e provoca un'altra ricostruzione, mai un indice incompleto
+            cur.execute("SELECT items_version FROM ddunlimited_cache_state WHERE id")
+            row = cur.fetchone()
+            cur.execute("SELECT item_key, search_text FROM ddunlimited_items ORDER BY position")
+            return (row[0] if row else None), cur.fetchall()
+
+    def search_ddunlimited_items(self, tokens: list[str]) -> list[tuple[str, str]]:
+        """
+        (item_key, search_text) of the releases whose search text contains every token,
+        in merge order. Each LIKE uses the trigram index on search_text.
+        """
+        if not tokens:
+            return []
+        patterns = [_like_pattern(token) for token in tokens]
+        where = " AND ".join("search_text LIKE %s" for _ in patterns)
+        with self._cursor() as cur:
+            cur.execute(
+                f"SELECT item_key, search_text FROM ddunlimited_items WHERE {where} ORDER BY position",
+                patterns
+            )
+            return cur.fetchall()
+
+    def get_ddunlimited_items(self, item_keys: list[str]) -> dict[str, dict]:
+        """Merged releases by item_key."""
+        if not item_keys:
+            return {}
+        with self._cursor(RealDictCursor) as cur:
+            cur.execute(
+                f"SELECT {', '.join(DDU_ITEM_COLUMNS)} FROM ddunlimited_items WHERE item_key = ANY(%s)",
+                (list(item_keys),)
+            )
+            return {row["item_key"]: row for row in cur.fetchall()}
+
+    @staticmethod
+    def normalize_lookup_term(term: str) -> str:
+        return " ".join(str(term).split()).casefold()
+
+    def get_lookup_cache(self, service: str, term: str, year: int | None = None) -> list[dict] | None:
+        """
+        Cached lookup results for (service, normalized term, year), or None on miss/expiry.
+        Empty results are cached too (negative caching) with a shorter TTL. A hit refreshes last_used_at (LRU).
+        """
+        try:
+            with self._cursor(RealDictCursor) as cur:
+                cur.execute("""
+                    UPDATE lookup_cache
+                    SET last_used_at = now(), hits = hits + 1
+                    WHERE service = %s AND term = %s AND year = %s
+                      AND created_at > now() - make_interval(
+                          secs => CASE WHEN result_count = 0 THEN %s ELSE %s END
+                      )
+                    RETURNING results
+                """, (service, self.normalize_lookup_term(term), year or 0, LOOKUP_CACHE_NEGATIVE_TTL, LOOKUP_CACHE_TTL))
+                row = cur.fetchone()
+        except psycopg2.Error as exc:
+            print(f"Lookup cache read failed: {exc}")
+            return None
+        return row["results"] if row else None
+
+    def set_lookup_cache(self, service: str, term: str, year: int | None, results: list[dict]) -> None:
+        try:
+            with self._cursor() as cur:
+                cur.execute("""
+                    INSERT INTO lookup_cache (service, term, year, results, result_count)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (service, term, year) DO UPDATE
+                    SET results = EXCLUDED.results,
+                        result_count = EXCLUDED.result_count,
+                        created_at = now(),
+                        last_used_at = now()
+                """, (service, self.normalize_lookup_term(term), year or 0, Json(results), len(results)))
+        except psycopg2.Error as exc:
+            print(f"Lookup cache write failed: {exc}")
+            return
+        self._lookup_writes += 1
+        if self._lookup_writes % LOOKUP_CACHE_PRUNE_EVERY == 0:
+            self.prune_lookup_cache()
+
+    def prune_lookup_cache(self, max_entries: int = LOOKUP_CACHE_MAX_ENTRIES) -> int:
+        """Drop expired entries and the least recently used ones beyond max_entries."""
+        try:
+            with self._cursor() as cur:
+                cur.execute("""
+                    DELETE FROM lookup_cache
+                    WHERE created_at < now() - make_interval(
+                        secs => CASE WHEN result_count = 0 THEN %s ELSE %s END
+                    )
+                """, (LOOKUP_CACHE_NEGATIVE_TTL, LOOKUP_CACHE_TTL))
+                removed = cur.rowcount
+                cur.execute("""
+                    DELETE FROM lookup_cache
+                    WHERE (service, term, year) IN (
+                        SELECT service, term, year
+                        FROM lookup_cache
+                        ORDER BY last_used_at DESC
+                        OFFSET %s
+                    )
+                """, (max_entries,))
+                return removed + cur.rowcount
+        except psycopg2.Error as exc:
+            print(f"Lookup cache prune failed: {exc}")
+            return 0
+
+    def get_ddunlimited_release(self, release_key: str) -> dict | None:
+        """
+        Cached ed2k payload of a DDUnlimited release, or None on miss/expiry. Pages
+        without links expire sooner (negative caching). A hit refreshes last_used_at (LRU).
+        """
+        try:
+            with self._cursor(RealDictCursor) as cur:
+                cur.execute("""
+                    UPDATE ddunlimited_release_cache
+                    SET last_used_at = now(), hits = hits + 1
+                    WHERE release_key = %s
+                      AND created_at > now() - make_interval(
+                          secs => CASE WHEN link_count = 0 THEN %s ELSE %s END
+                      )
+                    RETURNING payload
+                """, (release_key, DDU_RELEASE_CACHE_NEGATIVE_TTL, DDU_RELEASE_CACHE_TTL))
+                row = cur.fetchone()
+        except psycopg2.Error as exc:
+            print(f"DDU release cache read failed: {exc}")
+            return None
+        return row["payload"] if row else None
+
+    def set_ddunlimited_release(self, release_key: str, detail_url: str, payload: dict, link_count: int) -> None:
+        try:
+            with self._cursor() as cur:
+                cur.execute("""
+                    INSERT INTO ddunlimited_release_cache (release_key, detail_url, payload, link_count)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (release_key) DO UPDATE
+                    SET detail_url = EXCLUDED.detail_url,
+                        payload = EXCLUDED.payload,
+                        link_count = EXCLUDED.link_count,
+                        created_at = now(),
+                        last_used_at = now()
+                """, (release_key, detail_url, Json(payload), link_count))
+        except psycopg2.Error as exc:
+            print(f"DDU release cache write failed: {exc}")
+            return
+        self._release_cache_writes += 1
+        if self._release_cache_writes % LOOKUP_CACHE_PRUNE_EVERY == 0:
+            self.prune_ddunlimited_releases()
+
+    def prune_ddunlimited_releases(self, max_entries: int = DDU_RELEASE_CACHE_MAX_ENTRIES) -> int:
+        """Drop expired releases and the least recently used ones beyond max_entries."""
+        try:
+            with self._cursor() as cur:
+                cur.execute("""
+                    DELETE FROM ddunlimited_release_cache
+                    WHERE created_at < now() - make_interval(
+                        secs => CASE WHEN link_count = 0 THEN %s ELSE %s END
+                    )
+                """, (DDU_RELEASE_CACHE_NEGATIVE_TTL, DDU_RELEASE_CACHE_TTL))
+                removed = cur.rowcount
+                cur.execute("""
+                    DELETE FROM ddunlimited_release_cache
+                    WHERE release_key IN (
+                        SELECT release_key
+                        FROM ddunlimited_release_cache
+                        ORDER BY last_used_at DESC
+                        OFFSET %s
+                    )
+                """, (max_entries,))
+                return removed + cur.rowcount
+        except psycopg2.Error as exc:
+            print(f"DDU release cache prune failed: {exc}")
+            return 0
+
+    def clear_lookup_cache(self, service: str | None = None) -> int:
+        with self._cursor() as cur:
+            if service:
+                cur.execute("DELETE FROM lookup_cache WHERE service = %s", (service,))
+            else:
+                cur.execute("DELETE FROM lookup_cache")
+            return cur.rowcount
@@ -0,0 +1,133 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ===== CONFIG =====
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("MMC_HTTP_CONNECT_TIMEOUT", "5"))  # secondi per aprire la connessione
+HTTP_READ_TIMEOUT = float(os.environ.get("MMC_HTTP_READ_TIMEOUT", "15"))       # secondi di attesa della risposta
+HTTP_RETRIES = int(os.environ.get("MMC_HTTP_RETRIES", "2"))                    # tentativi extra su 5xx/timeout
+HTTP_BACKOFF = float(os.environ.get("MMC_HTTP_BACKOFF", "0.5"))                # backoff esponenziale tra i tentativi
+HTTP_POOL_SIZE = int(os.environ.get("MMC_HTTP_POOL_SIZE", "10"))               # connessioni keep-alive per host
+HTTP_MAX_CONCURRENCY = int(os.environ.get("MMC_HTTP_MAX_CONCURRENCY", "8"))    # richieste parallele per servizio
+HTTP_SERVICE_CONCURRENCY = {
+    "emule": 2,  # la WebUI di eMule regge poche richieste contemporanee
+}
+RETRY_STATUSES = (500, 502, 503, 504)
+# Solo i metodi idempotenti vengono ritentati dopo che la richiesta e partita
+RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# ==================
+
+
+def _service_concurrency(name: str) -> int:
+    env_value = os.environ.get(f"MMC_HTTP_MAX_CONCURRENCY_{name.upper()}")
+    if env_value:
+        return max(1, int(env_value))
+    return max(1, HTTP_SERVICE_CONCURRENCY.get(name, HTTP_MAX_CONCURRENCY))
+
+
+class ServiceClient:
+    """
+    Pooled HTTP client for one upstream service.
+
+    Wraps a requests.Session with keep-alive connections, a default (connect, read)
+    timeout, bounded retries with exponential backoff on 5xx/connection errors and a
+    semaphore capping the number of in-flight requests to the service.
+    Non-2xx responses are returned as-is, exactly like bare requests calls.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float | tuple[float, float] | None = None,
+        retries: int = HTTP_RETRIES,
+        backoff: float = HTTP_BACKOFF,
+        pool_size: int = HTTP_POOL_SIZE,
+        max_concurrency: int | None = None
+    ):
+        self.name = name
+        self.timeout = timeout if timeout is not None else (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency or _service_concurrency(name)
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._session: requests.Session | None = None
+        self._pid: int | None = None
+
+    def _build_session(self) -> requests.Session:
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            raise_on_status=False,
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.headers.update({"User-Agent": "MyMediaCollection/1.0"})
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        pid = os.getpid()
+        with self._lock:
+            # Dopo un fork (gunicorn) le connessioni del padre non vanno riusate
+            if self._session is None or self._pid != pid:
+                self._session = self._build_session()
+                self._pid = pid
+            return self._session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        session = self.session
+        with self._semaphore:
+            return session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+
+
+_CLIENTS: dict[str, ServiceClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(name: str) -> ServiceClient:
+    """Return the process-wide client for a service (radarr, sonarr, plex_web, emule, ...)."""
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(name)
+        if client is None:
+            client = ServiceClient(name)
+            _CLIENTS[name] = client
+        return client
+
+
+def close_all() -> None:
+    with _CLIENTS_LOCK:
+        clients = list(_CLIENTS.values())
+    for client in clients:
+        client.close()
@@ -0,0 +1,271 @@
+import os
+import threading
+import time
+
+from core.db_core import Media, MediaDB
+
+# ===== CONFIG =====
+WANTED_INDEX_CHECK = float(os.environ.get("MMC_WANTED_INDEX_CHECK", "5"))  # secondi tra i controlli di wanted_version
+# ==================
+
+INDEX_COLUMNS = ("title", "year", "media_type", "category", "original_title")
+
+
+def title_key(title: str | None, year: int | None) -> tuple[str, int | None]:
+    """Exact (title, year) key used by the Radarr/Sonarr/Plex views."""
+    return ((title or "").strip().lower(), year)
+
+
+def loose_title(value: str | None) -> str:
+    """Lowercase, alphanumerics and single spaces only (AnimeWorld matching)."""
+    if not value:
+        return ""
+    cleaned = "".join(ch for ch in value.lower() if ch.isalnum() or ch.isspace()).strip()
+    return " ".join(cleaned.split())
+
+
+def _media_kind(media_type: str | None) -> str:
+    return "movie" if media_type == "movie" else "series"
+
+
+def _int_year(year) -> int | None:
+    try:
+        return int(year) if year not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _add_to(mapping: dict, key, media_id: int) -> None:
+    mapping.setdefault(key, set()).add(media_id)
+
+
+def _remove_from(mapping: dict, key, media_id: int) -> None:
+    ids = mapping.get(key)
+    if ids is None:
+        return
+    ids.discard(media_id)
+    if not ids:
+        del mapping[key]
+
+
+class _WantedMaps:
+    """Hash maps of one index generation; callers hold the WantedIndex lock."""
+
+    def __init__(self):
+        self.items: dict[int, Media] = {}
+        self.externals: dict[int, set[tuple[str, str]]] = {}
+        self.by_external: dict[tuple[str, str], set[int]] = {}
+        self.by_title_year: dict[tuple[str, int | None], set[int]] = {}
+        self.by_loose_title_year: dict[tuple[str, int], set[int]] = {}
+        self.by_loose_title: dict[str, set[int]] = {}
+
+    @staticmethod
+    def _title_keys(item: Media) -> tuple[list, list, list]:
+        exact = [title_key(item.title, item.year)] if item.title else []
+        year = _int_year(item.year)
+        loose = []
+        loose_year = []
+        for value in (item.title, item.original_title):
+            key = loose_title(value)
+            if key:
+                loose.append(key)
+                if year:
+                    loose_year.append((key, year))
+        return exact, loose, loose_year
+
+    def add_item(self, item: Media) -> None:
+        self.items[item.id] = item
+        exact, loose, loose_year = self._title_keys(item)
+        for key in exact:
+            _add_to(self.by_title_year, key, item.id)
+        for key in loose:
+            _add_to(self.by_loose_title, key, item.id)
+        for key in loose_year:
+            _add_to(self.by_loose_title_year, key, item.id)
+
+    def add_external(self, media_id: int, source: str, external_id: str) -> None:
+        pair = (source, str(external_id))
+        self.externals.setdefault(media_id, set()).add(pair)
+        _add_to(self.by_external, pair, media_id)
+
+    def remove_external(self, media_id: int, source: str, external_id: str) -> None:
+        pair = (source, str(external_id))
+        pairs = self.externals.get(media_id)
+        if pairs is not None:
+            pairs.discard(pair)
+        _remove_from(self.by_external, pair, media_id)
+
+    def remove_item(self, media_id: int) -> None:
+        item = self.items.pop(media_id, None)
+        for pair in self.externals.pop(media_id, ()):
+            _remove_from(self.by_external, pair, media_id)
+        if item is None:
+            return
+        exact, loose, loose_year = self._title_keys(item)
+        for key in exact:
+            _remove_from(self.by_title_year, key, media_id)
+        for key in loose:
+            _remove_from(self.by_loose_title, key, media_id)
+        for key in loose_year:
+            _remove_from(self.by_loose_title_year, key, media_id)
+
+
+class WantedIndex:
+    """
+    In-memory membership index of the wanted list, shared by every view of the worker.
+
+    Maps (source, external_id), exact (title, year) and loose title keys to media item ids.
+    MediaDB notifies every committed transaction together with the new wanted_version: when
+    it is the next version the index is patched in place, otherwise (writes from another
+    worker, missed events) it is rebuilt on the next lookup. The PostgreSQL counter is
+    read at most every WANTED_INDEX_CHECK seconds.
+    """
+
+    def __init__(self, db: MediaDB):
+        self.db = db
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._maps = _WantedMaps()
+        self._version: int | None = None
+        self._loaded = False
+        self._checked_at = 0.0
+        db.add_wanted_listener(self._on_change)
+
+    # ----- mantenimento -----
+
+    def _ensure_fresh(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._loaded and now - self._checked_at < WANTED_INDEX_CHECK:
+                return
+            self._checked_at = now
+            loaded = self._loaded
+            version = self._version
+        if loaded:
+            current = self.db.get_wanted_version()
+            if current is not None and current == version:
+                return
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """Reload the whole index from media_items/external_ids."""
+        requested = time.monotonic()
+        with self._build_lock:
+            with self._lock:
+                # Un altro thread ha appena ricostruito mentre si aspettava il lock
+                if self._loaded and self._version is not None and self._checked_at >= requested:
+                    return
+            # La versione va letta prima della scansione: scritture concorrenti la fanno
+            # risultare vecchia e provocano un'altra ricostruzione, mai un indice incompleto
+            version = self.db.get_wanted_version()
+            maps = _WantedMaps()
+            for item in self.db.iter_media_items(columns=INDEX_COLUMNS):
+                maps.add_item(item)
+                for source, external_id in item.external_ids.items():
+                    maps.add_external(item.id, source, external_id)
+            with self._lock:
+                self._maps = maps
+                self._version = version
+                self._loaded = True
+                self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Force a rebuild on the next lookup."""
+        with self._lock:
+            self._version = None
+            self._checked_at = 0.0
+
+    def _on_change(self, version: int | None, events: list) -> None:
+        with self._lock:
+            if not self._loaded:
+                return
+            if version is None or self._version is None or version != self._version + 1:
+                # Mancano modifiche intermedie: meglio ricostruire che indovinare
+                self._version = None
+                self._checked_at = 0.0
+                return
+            maps = self._maps
+            for event, payload in events:
+                if event == "media_added":
+                    for item in payload.get("items", []):
+                        maps.add_item(item)
+                elif event == "external_added":
+                    for media_id, source, external_id in payload.get("rows", []):
+                        maps.add_external(media_id, source, external_id)
+                elif event == "external_removed":
+                    for media_id, source, external_id in payload.get("rows", []):
+                        maps.remove_external(media_id, source, external_id)
+                elif event == "media_deleted":
+                    for media_id in payload.get("ids", []):
+                        maps.remove_item(media_id)
+                elif event == "media_merged":
+                    keep_id = payload["keep_id"]
+                    for media_id in payload.get("merge_ids", []):
+                        for source, external_id in list(maps.externals.get(media_id, ())):
+                            maps.add_external(keep_id, source, external_id)
+                        maps.remove_item(media_id)
+            self._version = version
+
+    # ----- lookup -----
+
+    def has_external(self, sources: str | tuple[str, ...], external_id) -> bool:
+        """True if any wanted item has external_id under one of the given sources."""
+        if external_id in (None, ""):
+            return False
+        if isinstance(sources, str):
+            sources = (sources,)
+        value = str(external_id)
+        self._ensure_fresh()
+        with self._lock:
+            return any((source, value) in self._maps.by_external for source in sources)
+
+    def items_for_title(self, title: str | None, year: int | None, media_type: str | None = None) -> list[dict]:
+        """Wanted items with the same stripped, lowercased title and year (optionally movie vs series)."""
+        if not title:
+            return []
+        self._ensure_fresh()
+        with self._lock:
+            maps = self._maps
+            ids = sorted(maps.by_title_year.get(title_key(title, year), ()))
+            items = [maps.items[media_id] for media_id in ids if media_id in maps.items]
+        if media_type is not None:
+            kind = _media_kind(media_type)
+            items = [item for item in items if _media_kind(item.media_type) == kind]
+        return [
+            {
+                "id": item.id,
+                "title": item.title,
+                "year": item.year,
+                "media_type": item.media_type,
+                "category": item.category
+            }
+            for item in items
+        ]
+
+    def has_title(self, title: str | None, year: int | None, media_type: str | None = None) -> bool:
+        return bool(self.items_for_title(title, year, media_type))
+
+    def has_loose_title(self, title: str | None, year=None) -> bool:
+        """
+        Loose match on title or original title: with a year the (title, year) pair must
+        match, without one any wanted item with that title counts.
+        """
+        key = loose_title(title)
+        if not key:
+            return False
+        year = _int_year(year)
+        self._ensure_fresh()
+        with self._lock:
+            if year:
+                return (key, year) in self._maps.by_loose_title_year
+            return key in self._maps.by_loose_title
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "version": self._version,
+                "items": len(self._maps.items),
+                "external_ids": len(self._maps.by_external),
+                "titles": len(self._maps.by_title_year)
+            }
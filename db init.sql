@@ -76,6 +76,9 @@ ON media_items(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_media_items_media_type
 ON media_items(media_type);
 
+CREATE INDEX IF NOT EXISTS idx_media_items_type_created_at
+ON media_items(media_type, created_at DESC);
+
 CREATE INDEX IF NOT EXISTS idx_external_ids_lookup
 ON external_ids(source, external_id);
 
@@ -83,6 +86,36 @@ CREATE INDEX IF NOT EXISTS idx_media_items_title_year_notnull
 ON media_items(title, year)
 WHERE year IS NOT NULL;
 
+-- Wanted list keyset pagination (sort key + id)
+CREATE INDEX IF NOT EXISTS idx_media_items_page_created
+ON media_items ((COALESCE(created_at, to_timestamp(0))), id);
+
+CREATE INDEX IF NOT EXISTS idx_media_items_page_title
+ON media_items ((lower(title)), id);
+
+CREATE INDEX IF NOT EXISTS idx_media_items_page_year
+ON media_items ((COALESCE(year, 0)), id);
+
+CREATE INDEX IF NOT EXISTS idx_media_items_category
+ON media_items(category);
+
+CREATE INDEX IF NOT EXISTS idx_media_items_source
+ON media_items(source);
+
+-- external_ids: elimina i duplicati (tiene la riga piu vecchia) e impone l'unicita
+DELETE FROM external_ids a
+USING external_ids b
+WHERE a.media_item_id = b.media_item_id
+  AND a.source = b.source
+  AND a.external_id = b.external_id
+  AND a.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_external_ids_item_source_value
+ON external_ids(media_item_id, source, external_id);
+
+-- Coperto dal prefisso dell'indice univoco
+DROP INDEX IF EXISTS idx_external_ids_media_source;
+
 -- Services
 CREATE TABLE IF NOT EXISTS services (
     id SERIAL PRIMARY KEY,
@@ -239,6 +272,105 @@ ON CONFLICT (service_id, key) DO NOTHING;
 CREATE INDEX IF NOT EXISTS idx_service_settings_service
 ON service_settings(service_id);
 
+-- Versione della configurazione servizi: ogni worker confronta questo contatore
+-- con quello della propria cache in memoria e la svuota quando cambia
+CREATE TABLE IF NOT EXISTS config_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+INSERT INTO config_version (id, version) VALUES (TRUE, 0)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_config_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE config_version SET version = version + 1, updated_at = now() WHERE id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_service_settings_version ON service_settings;
+CREATE TRIGGER trg_service_settings_version
+AFTER INSERT OR UPDATE OR DELETE ON service_settings
+FOR EACH STATEMENT EXECUTE FUNCTION bump_config_version();
+
+DROP TRIGGER IF EXISTS trg_services_version ON services;
+CREATE TRIGGER trg_services_version
+AFTER INSERT OR UPDATE OR DELETE ON services
+FOR EACH STATEMENT EXECUTE FUNCTION bump_config_version();
+
+-- Versione della lista wanted: MediaDB la incrementa nella stessa transazione di ogni
+-- scrittura su media_items/external_ids, cosi l'indice in memoria di ogni worker
+-- capisce se puo aggiornarsi in modo incrementale o deve ricostruirsi
+CREATE TABLE IF NOT EXISTS wanted_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+INSERT INTO wanted_version (id, version) VALUES (TRUE, 0)
+ON CONFLICT (id) DO NOTHING;
+
+-- Cache persistente dei lookup Radarr/Sonarr (chiave: servizio, termine normalizzato, anno; 0 = nessun anno)
+CREATE TABLE IF NOT EXISTS lookup_cache (
+    service TEXT NOT NULL,          -- radarr | sonarr
+    term TEXT NOT NULL,
+    year INTEGER NOT NULL DEFAULT 0,
+    results JSONB NOT NULL,
+    result_count INTEGER NOT NULL DEFAULT 0,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    last_used_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (service, term, year)
+);
+
+CREATE INDEX IF NOT EXISTS idx_lookup_cache_last_used
+ON lookup_cache(last_used_at);
+
+-- Copia locale delle librerie Radarr/Sonarr, aggiornata dal sync in background
+-- (core/arr_sync_core.py): row_hash permette di riscrivere solo le righe cambiate
+CREATE TABLE IF NOT EXISTS arr_movies (
+    tmdb_id INTEGER PRIMARY KEY,
+    arr_id INTEGER,
+    title TEXT,
+    year INTEGER,
+    imdb_id TEXT,
+    monitored BOOLEAN NOT NULL DEFAULT TRUE,
+    has_file BOOLEAN NOT NULL DEFAULT FALSE,
+    path TEXT,
+    root_folder TEXT,
+    size_on_disk BIGINT,
+    row_hash TEXT NOT NULL,
+    synced_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS arr_series (
+    tvdb_id INTEGER PRIMARY KEY,
+    arr_id INTEGER,
+    title TEXT,
+    year INTEGER,
+    imdb_id TEXT,
+    slug TEXT,
+    monitored BOOLEAN NOT NULL DEFAULT TRUE,
+    path TEXT,
+    root_folder TEXT,
+    episode_count INTEGER,
+    episode_file_count INTEGER NOT NULL DEFAULT 0,
+    size_on_disk BIGINT,
+    row_hash TEXT NOT NULL,
+    synced_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+-- Esito dell'ultimo sync per servizio (radarr | sonarr)
+CREATE TABLE IF NOT EXISTS arr_sync_state (
+    service TEXT PRIMARY KEY,
+    last_success_at TIMESTAMP WITH TIME ZONE,
+    last_attempt_at TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    item_count INTEGER NOT NULL DEFAULT 0
+);
+
 -- DDUnlimited list sources
 CREATE TABLE IF NOT EXISTS ddunlimited_sources (
     id SERIAL PRIMARY KEY,
@@ -258,6 +390,11 @@ CREATE TABLE IF NOT EXISTS ddunlimited_sources (
 CREATE INDEX IF NOT EXISTS idx_ddunlimited_sources_enabled
 ON ddunlimited_sources(enabled);
 
+-- Validatori HTTP e hash dell'ultima pagina scaricata, per il refresh condizionale
+ALTER TABLE ddunlimited_sources ADD COLUMN IF NOT EXISTS etag TEXT;
+ALTER TABLE ddunlimited_sources ADD COLUMN IF NOT EXISTS last_modified TEXT;
+ALTER TABLE ddunlimited_sources ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
 INSERT INTO ddunlimited_sources (name, url, media_type, category, quality, enabled)
 VALUES
 ('Serie TV HD', 'https://ddunlimited.net/viewtopic.php?t=3747331', 'series', 'tv', 'HD', TRUE),
@@ -265,3 +402,83 @@ VALUES
 ('Serie TV A-Z', 'https://ddunlimited.net/viewtopic.php?t=61463', 'series', 'tv', NULL, TRUE),
 ('Movie A', 'https://ddunlimited.net/viewtopic.php?f=1988&t=3941486', 'movie', 'film', NULL, TRUE)
 ON CONFLICT (url) DO NOTHING;
+
+-- Configurazione (url, nome, tipo, categoria, qualita, lingua) con cui sono stati letti gli elementi salvati
+ALTER TABLE ddunlimited_sources ADD COLUMN IF NOT EXISTS items_signature TEXT;
+
+-- Cache delle release DDUnlimited: ricerca per sottostringa con indice trigrammi
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Elementi letti da ogni pagina lista, nell'ordine della pagina: uno per posizione, anche
+-- con chiavi ripetute, cosi la fusione li rilegge tutti nello stesso ordine
+CREATE TABLE IF NOT EXISTS ddunlimited_source_items (
+    source_id INTEGER NOT NULL REFERENCES ddunlimited_sources(id) ON DELETE CASCADE,
+    item_key TEXT NOT NULL,        -- detail_url o topic_id
+    position INTEGER NOT NULL,
+    data JSONB NOT NULL,
+    row_hash TEXT NOT NULL,
+    PRIMARY KEY (source_id, position)
+);
+
+-- Tabelle create con la chiave (source_id, item_key): passano alla chiave per posizione e le
+-- pagine vengono rilette, perche gli elementi salvati avevano le chiavi ripetute gia fuse
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM pg_constraint c
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)
+        WHERE c.conrelid = 'ddunlimited_source_items'::regclass AND c.contype = 'p' AND a.attname = 'item_key'
+    ) THEN
+        ALTER TABLE ddunlimited_source_items DROP CONSTRAINT ddunlimited_source_items_pkey;
+        ALTER TABLE ddunlimited_source_items ADD PRIMARY KEY (source_id, position);
+        UPDATE ddunlimited_sources SET items_signature = NULL;
+    END IF;
+END $$;
+
+-- Release fuse da tutte le sorgenti abilitate (position = ordine di fusione)
+CREATE TABLE IF NOT EXISTS ddunlimited_items (
+    item_key TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    detail_url TEXT,
+    topic_id TEXT,
+    info TEXT,
+    quality TEXT,
+    language TEXT,
+    media_type TEXT,
+    category TEXT,
+    year INTEGER,
+    source_name TEXT,
+    search_text TEXT NOT NULL,     -- titolo + inizio info normalizzati
+    row_hash TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_ddunlimited_items_search
+ON ddunlimited_items USING gin (search_text gin_trgm_ops);
+
+-- Stato della cache fusa: ultimo refresh e sorgenti (in ordine) da cui e stata costruita
+CREATE TABLE IF NOT EXISTS ddunlimited_cache_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    source_ids INTEGER[] NOT NULL DEFAULT '{}',
+    items_version BIGINT NOT NULL DEFAULT 0,  -- incrementata a ogni modifica di ddunlimited_items
+    updated_at TIMESTAMP WITH TIME ZONE
+);
+
+INSERT INTO ddunlimited_cache_state (id) VALUES (TRUE)
+ON CONFLICT (id) DO NOTHING;
+
+-- Cache delle pagine release DDUnlimited (link ed2k gia estratti), chiave: topic id o URL
+CREATE TABLE IF NOT EXISTS ddunlimited_release_cache (
+    release_key TEXT PRIMARY KEY,
+    detail_url TEXT NOT NULL,
+    payload JSONB NOT NULL,        -- ed2k_links, ed2k_items, ed2k_stats
+    link_count INTEGER NOT NULL DEFAULT 0,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    last_used_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_ddunlimited_release_cache_last_used
+ON ddunlimited_release_cache(last_used_at);
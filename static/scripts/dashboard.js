@@ -61,7 +61,7 @@ document.addEventListener("DOMContentLoaded", () => {
     }).join("");
   };
 
-  fetch("/api/dashboard/data")
+  const loadDashboard = (attempt) => fetch("/api/dashboard/data")
     .then((response) => response.json())
     .then((data) => {
       const counts = data.counts || {};
@@ -94,6 +94,11 @@ document.addEventListener("DOMContentLoaded", () => {
       if (loading) {
         loading.classList.add("d-none");
       }
+
+      // I contatori Radarr/Sonarr vengono calcolati in background al primo accesso
+      if (data.arr_pending && attempt < 5) {
+        setTimeout(() => loadDashboard(attempt + 1), 2000);
+      }
     })
     .catch(() => {
       renderLastImports([]);
@@ -118,4 +123,6 @@ document.addEventListener("DOMContentLoaded", () => {
         loading.innerHTML = '<i class="bi bi-exclamation-triangle me-1"></i>Errore nel caricamento.';
       }
     });
+
+  loadDashboard(0);
 });
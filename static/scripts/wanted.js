@@ -3,7 +3,30 @@ var pendingDownloadAttempts = 0;
 var pendingDownloadTimer = null;
 var MAX_PENDING_DOWNLOAD_ATTEMPTS = 4;
 var PENDING_REFRESH_DELAY_MS = 3500;
-var wantedCustomFilter = null;
+var WANTED_SEARCH_DELAY_MS = 300;
+var wantedSort = { sort: 'created_at', order: 'desc' };
+var wantedLoadObserver = null;
+var wantedLoadingMore = null;
+var wantedLoadMore = null;
+
+function getWantedQueryParams() {
+    var params = new URLSearchParams();
+    var search = ($('#wanted-title-search').val() || '').trim();
+    var type = $('#wanted-type-filter').val() || 'all';
+    var importPath = $('#wanted-import-filter').val() || 'all';
+    if (search) {
+        params.set('q', search);
+    }
+    if (type !== 'all') {
+        params.set('media_type', type);
+    }
+    if (importPath !== 'all') {
+        params.set('import_path', importPath);
+    }
+    params.set('sort', wantedSort.sort);
+    params.set('order', wantedSort.order);
+    return params;
+}
 
 function markRowDownloadPendingInRow($row) {
     var $cell = $row.find('td').eq(5);
@@ -77,9 +100,6 @@ function schedulePendingRefresh(delayMs) {
 }
 
 function initWantedUI() {
-    var wantedSearchTerm = '';
-    var wantedTypeFilter = 'all';
-    var wantedImportFilter = 'all';
     var isSyncingSelection = false;
     var selectedIds = new Set();
     var rowInfo = {};
@@ -96,56 +116,21 @@ function initWantedUI() {
         return info.mediaType === 'movie' && info.hasTmdb && !info.inRadarr;
     }
 
+    // Filtri, ricerca e ordinamento sono lato server (/api/wanted/content): la tabella mostra
+    // solo le pagine gia' caricate, le successive arrivano da /api/wanted/rows durante lo scroll.
     var table = $('#wanted_table').DataTable({
-        paging: true,
-        ordering: true,
-        searching: true,
-        order: [],
+        paging: false,
+        ordering: false,
+        searching: false,
+        info: false,
         autoWidth: false,
-        deferRender: true,
         processing: true,
-        orderClasses: false,
-        searchDelay: 150,
-        pageLength: 50,
-        lengthMenu: [25, 50, 100, 200],
         select: {
             style: 'os',
             selector: 'td:not(.wanted-actions-cell)'
         },
-        columnDefs: [
-            { orderable: false, targets: [0, 7] },
-            { searchable: false, targets: [0, 4, 7] }
-        ],
-        dom: 'rt<"d-flex justify-content-between align-items-center mt-3"lip>'
+        dom: 'rt'
     });
-
-    $.fn.dataTable.ext.search = $.fn.dataTable.ext.search.filter(function(fn) {
-        return !fn.__wantedFilter;
-    });
-    wantedCustomFilter = function(settings, data, dataIndex) {
-        if (settings.nTable.id !== 'wanted_table') {
-            return true;
-        }
-        var node = table.row(dataIndex).node();
-        if (!node) {
-            return true;
-        }
-        if (wantedTypeFilter !== 'all') {
-            var mediaType = $(node).data('media-type');
-            if (mediaType !== wantedTypeFilter) {
-                return false;
-            }
-        }
-        if (wantedImportFilter !== 'all') {
-            var importPath = $(node).data('import-path') || '';
-            if (importPath !== wantedImportFilter) {
-                return false;
-            }
-        }
-        return true;
-    };
-    wantedCustomFilter.__wantedFilter = true;
-    $.fn.dataTable.ext.search.push(wantedCustomFilter);
 
     function getRowInfo(id) {
         if (!id) {
@@ -240,37 +225,19 @@ function initWantedUI() {
     }
 
     function updateStatsCounts() {
-        var total = 0;
-        var movies = 0;
-        var series = 0;
-        var missing = 0;
-        var inRadarr = 0;
-        var inSonarr = 0;
-        table.rows().nodes().to$().each(function() {
-            var $row = $(this);
-            total += 1;
-            var mediaType = $row.data('media-type');
-            if (mediaType === 'movie') {
-                movies += 1;
-            } else if (mediaType === 'series') {
-                series += 1;
-            }
-            if ($row.data('missing-external') === 1 || $row.data('missing-external') === '1') {
-                missing += 1;
-            }
-            if ($row.data('in-radarr') === 1 || $row.data('in-radarr') === '1') {
-                inRadarr += 1;
-            }
-            if ($row.data('in-sonarr') === 1 || $row.data('in-sonarr') === '1') {
-                inSonarr += 1;
+        // I contatori coprono tutta la lista, non solo le righe caricate
+        $.getJSON('/api/wanted/stats').done(function(resp) {
+            if (!resp || !resp.ok) {
+                return;
             }
+            var stats = resp.stats;
+            $('#wanted-count-total').text(stats.total);
+            $('#wanted-count-movies').text(stats.movies);
+            $('#wanted-count-series').text(stats.series);
+            $('#wanted-count-missing').text(stats.missing);
+            $('#wanted-count-in-radarr').text(stats.in_radarr);
+            $('#wanted-count-in-sonarr').text(stats.in_sonarr);
         });
-        $('#wanted-count-total').text(total);
-        $('#wanted-count-movies').text(movies);
-        $('#wanted-count-series').text(series);
-        $('#wanted-count-missing').text(missing);
-        $('#wanted-count-in-radarr').text(inRadarr);
-        $('#wanted-count-in-sonarr').text(inSonarr);
     }
 
     function updateRowRoot(mediaId, serviceKey, rootPath) {
@@ -473,55 +440,130 @@ function initWantedUI() {
         }
     }
 
-    function applyFilters() {
-        table.column(1).search(wantedSearchTerm || '');
-        table.draw();
-        updateBulkState();
-    }
-
-    function applySearch() {
-        var value = $('#wanted-title-search').val() || '';
-        wantedSearchTerm = value.toLowerCase();
-        applyFilters();
-    }
-
     function getSelectedIds() {
         return Array.from(selectedIds);
     }
 
-    $('#wanted-type-filter').off('change.wanted').on('change.wanted', function() {
-        wantedTypeFilter = $(this).val() || 'all';
-        applyFilters();
-    });
-
     function populateImportFilter() {
-        var values = new Set();
-        table.rows().nodes().to$().each(function() {
-            var val = $(this).data('import-path');
-            if (val) {
-                values.add(String(val));
-            }
-        });
         var $select = $('#wanted-import-filter');
-        if (!$select.length) {
+        var pageData = document.getElementById('wanted-page-data');
+        if (!$select.length || !pageData) {
             return;
         }
+        var values = [];
+        try {
+            values = JSON.parse(pageData.dataset.importPaths || '[]');
+        } catch (err) {
+            values = [];
+        }
+        var current = $select.val() || 'all';
         var opts = ['<option value="all">Tutti</option>'];
-        Array.from(values).sort().forEach(function(val) {
-            opts.push('<option value="' + val.replace(/"/g, '&quot;') + '">' + val + '</option>');
+        values.forEach(function(val) {
+            var escaped = $('<div>').text(val).html();
+            opts.push('<option value="' + escaped.replace(/"/g, '&quot;') + '">' + escaped + '</option>');
         });
         $select.html(opts.join(''));
-        $select.prop('disabled', values.size === 0);
+        $select.val(values.indexOf(current) !== -1 ? current : 'all');
+        $select.prop('disabled', values.length === 0 && current === 'all');
     }
 
-    $('#wanted-import-filter').off('change.wanted').on('change.wanted', function() {
-        wantedImportFilter = $(this).val() || 'all';
-        applyFilters();
-    });
+    function updateSortIndicators() {
+        $('#wanted_table thead th.wanted-sortable').each(function() {
+            var $th = $(this);
+            $th.find('.wanted-sort-icon').remove();
+            if ($th.data('sort') === wantedSort.sort) {
+                var icon = wantedSort.order === 'asc' ? 'bi-caret-up-fill' : 'bi-caret-down-fill';
+                $th.append(' <i class="bi ' + icon + ' wanted-sort-icon"></i>');
+            }
+        });
+    }
 
+    function watchLoadMore() {
+        if (wantedLoadObserver) {
+            wantedLoadObserver.disconnect();
+            wantedLoadObserver = null;
+        }
+        var wrap = document.getElementById('wanted-load-more-wrap');
+        if (!wrap || wrap.classList.contains('d-none') || !('IntersectionObserver' in window)) {
+            return;
+        }
+        // observe() notifica subito lo stato corrente: se il fondo e' ancora visibile carica la pagina dopo
+        wantedLoadObserver = new IntersectionObserver(function(entries) {
+            if (entries.some(function(entry) { return entry.isIntersecting; })) {
+                loadMoreRows();
+            }
+        }, { rootMargin: '400px 0px' });
+        wantedLoadObserver.observe(wrap);
+    }
+
+    // Promise con true se sono arrivate altre righe, false se non ce ne sono o la richiesta fallisce
+    function loadMoreRows() {
+        var pageData = document.getElementById('wanted-page-data');
+        var cursor = pageData ? (pageData.dataset.nextCursor || '') : '';
+        if (!cursor) {
+            return Promise.resolve(false);
+        }
+        if (wantedLoadingMore) {
+            return wantedLoadingMore;
+        }
+        var tableEl = table.table().node();
+        var params = getWantedQueryParams();
+        params.set('cursor', cursor);
+        $('#wanted-load-more').prop('disabled', true);
+        var request = fetch('/api/wanted/rows?' + params.toString())
+            .then(function(resp) {
+                if (!resp.ok) {
+                    throw new Error('HTTP ' + resp.status);
+                }
+                var nextCursor = resp.headers.get('X-Next-Cursor') || '';
+                return resp.text().then(function(html) {
+                    return { html: html, nextCursor: nextCursor };
+                });
+            })
+            .then(function(page) {
+                if (wantedLoadingMore === request) {
+                    wantedLoadingMore = null;
+                }
+                if (!document.body.contains(tableEl)) {
+                    // contenuto ricaricato nel frattempo (filtri cambiati)
+                    return false;
+                }
+                // Stesso parsing del caricamento iniziale: i modali per riga finiscono prima della tabella
+                var doc = new DOMParser().parseFromString(
+                    '<table id="wanted-page-rows"><tbody>' + page.html + '</tbody></table>',
+                    'text/html'
+                );
+                var holder = doc.getElementById('wanted-page-rows');
+                Array.from(doc.body.children).forEach(function(el) {
+                    if (el !== holder) {
+                        tableEl.parentNode.insertBefore(el, tableEl);
+                    }
+                });
+                table.rows.add(Array.from(holder.tBodies[0].rows)).draw(false);
+                pageData.dataset.nextCursor = page.nextCursor;
+                $('#wanted-load-more').prop('disabled', false);
+                $('#wanted-load-more-wrap').toggleClass('d-none', !page.nextCursor);
+                buildRowIndex();
+                syncSelectionToTable();
+                updateBulkState();
+                applyPendingDownloadState();
+                watchLoadMore();
+                return true;
+            })
+            .catch(function() {
+                if (wantedLoadingMore === request) {
+                    wantedLoadingMore = null;
+                }
+                $('#wanted-load-more').prop('disabled', false);
+                return false;
+            });
+        wantedLoadingMore = request;
+        return request;
+    }
+    wantedLoadMore = loadMoreRows;
 
-    $('#wanted-title-search').off('input.wanted').on('input.wanted', function() {
-        applySearch();
+    $('#wanted-load-more').off('click.wanted').on('click.wanted', function() {
+        loadMoreRows();
     });
 
     $(document).off('change.wanted', '.wanted-select').on('change.wanted', '.wanted-select', function() {
@@ -892,61 +934,76 @@ function initWantedUI() {
         }
     }
 
-    function renderBulkMatchResults(source, items) {
+    function appendBulkMatchRow(source, item) {
         var $tbody = $('#bulk-match-table tbody');
-        $tbody.empty();
-        var found = 0;
-        var missing = 0;
-        items.forEach(function(item) {
-            var hasCandidates = item.candidates && item.candidates.length;
-            if (hasCandidates) {
-                found += 1;
-            } else {
-                missing += 1;
-            }
-            var options = ['<option value="">Nessun match</option>'];
-            if (hasCandidates) {
-                item.candidates.forEach(function(candidate) {
-                    var label = candidate.title || '';
-                    if (candidate.year) {
-                        label += ' (' + candidate.year + ')';
+        var hasCandidates = item.candidates && item.candidates.length;
+        var options = ['<option value="">Nessun match</option>'];
+        if (hasCandidates) {
+            item.candidates.forEach(function(candidate) {
+                var label = candidate.title || '';
+                if (candidate.year) {
+                    label += ' (' + candidate.year + ')';
+                }
+                var link = candidate.link || '';
+                options.push(
+                    '<option value="' + candidate.external_id + '" data-link="' + link + '">' + label + '</option>'
+                );
+            });
+        }
+        var checkedAttr = hasCandidates ? ' checked' : '';
+        var queryText = item.query || '';
+        var rowHtml = [
+            '<tr data-media-id="', item.media_id, '" data-source="', source, '">',
+            '<td class="text-center"><input class="form-check-input bulk-match-check" type="checkbox"', checkedAttr, '></td>',
+            '<td>', item.title || '', '</td>',
+            '<td>', item.year || '', '</td>',
+            '<td>', item.media_type || '', '</td>',
+            '<td>', queryText, '</td>',
+            '<td>',
+            '<div class="d-flex align-items-center gap-2">',
+            '<select class="form-select form-select-sm bulk-match-select">', options.join(''), '</select>',
+            '<a class="small text-decoration-none bulk-match-link d-none" target="_blank" rel="noopener">Apri</a>',
+            '</div>',
+            '</td>',
+            '</tr>'
+        ].join('');
+        var $row = $(rowHtml);
+        $tbody.append($row);
+        var $select = $row.find('.bulk-match-select');
+        if ($select.find('option').length > 1) {
+            $select.prop('selectedIndex', 1);
+        }
+        updateBulkMatchLink($select);
+        var $counter = $(hasCandidates ? '#bulk-match-found' : '#bulk-match-missing');
+        $counter.text((parseInt($counter.text(), 10) || 0) + 1);
+        $('#bulk-match-selected').text($tbody.find('tr').length);
+        updateBulkMatchConfirm();
+    }
+
+    function readBulkMatchStream(response, onLine) {
+        var reader = response.body.getReader();
+        var decoder = new TextDecoder();
+        var buffer = '';
+        function pump() {
+            return reader.read().then(function(chunk) {
+                if (chunk.done) {
+                    if (buffer.trim()) {
+                        onLine(JSON.parse(buffer));
+                    }
+                    return;
+                }
+                buffer += decoder.decode(chunk.value, { stream: true });
+                var lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.forEach(function(line) {
+                    if (line.trim()) {
+                        onLine(JSON.parse(line));
                     }
-                    var link = candidate.link || '';
-                    options.push(
-                        '<option value="' + candidate.external_id + '" data-link="' + link + '">' + label + '</option>'
-                    );
                 });
-            }
-            var checkedAttr = hasCandidates ? ' checked' : '';
-            var queryText = item.query || '';
-            var rowHtml = [
-                '<tr data-media-id="', item.media_id, '" data-source="', source, '">',
-                '<td class="text-center"><input class="form-check-input bulk-match-check" type="checkbox"', checkedAttr, '></td>',
-                '<td>', item.title || '', '</td>',
-                '<td>', item.year || '', '</td>',
-                '<td>', item.media_type || '', '</td>',
-                '<td>', queryText, '</td>',
-                '<td>',
-                '<div class="d-flex align-items-center gap-2">',
-                '<select class="form-select form-select-sm bulk-match-select">', options.join(''), '</select>',
-                '<a class="small text-decoration-none bulk-match-link d-none" target="_blank" rel="noopener">Apri</a>',
-                '</div>',
-                '</td>',
-                '</tr>'
-            ].join('');
-            $tbody.append(rowHtml);
-        });
-        $('#bulk-match-selected').text(items.length);
-        $('#bulk-match-found').text(found);
-        $('#bulk-match-missing').text(missing);
-        $tbody.find('.bulk-match-select').each(function() {
-            var $select = $(this);
-            if ($select.find('option').length > 1) {
-                $select.prop('selectedIndex', 1);
-            }
-            updateBulkMatchLink($select);
-        });
-        updateBulkMatchConfirm();
+                return pump();
+            });
+        }
+        return pump();
     }
 
     function openBulkMatchModal(source) {
@@ -969,19 +1026,34 @@ function initWantedUI() {
         }
 
         $('#bulkMatchModal').data('source', source);
-        $.ajax({
-            url: '/api/wanted/bulk_lookup/' + source,
+        var total = 0;
+        var received = 0;
+        fetch('/api/wanted/bulk_lookup/' + source, {
             method: 'POST',
-            contentType: 'application/json',
-            data: JSON.stringify({ media_ids: ids })
-        }).done(function(resp) {
-            $('#bulk-match-status').addClass('d-none');
-            if (!resp || !resp.items) {
-                $('#bulk-match-error').removeClass('d-none').text('Risposta non valida.');
-                return;
+            headers: { 'Content-Type': 'application/json', 'Accept': 'application/x-ndjson' },
+            body: JSON.stringify({ media_ids: ids, stream: true })
+        }).then(function(response) {
+            if (!response.ok || !response.body) {
+                throw new Error('HTTP ' + response.status);
             }
-            renderBulkMatchResults(source, resp.items);
-        }).fail(function() {
+            return readBulkMatchStream(response, function(msg) {
+                if ($('#bulkMatchModal').data('source') !== source) {
+                    return;
+                }
+                if (msg.type === 'start') {
+                    total = msg.total || 0;
+                    $('#bulk-match-status').text('Ricerca in corso... 0/' + total);
+                } else if (msg.type === 'item') {
+                    received += 1;
+                    appendBulkMatchRow(source, msg.item);
+                    $('#bulk-match-status').text('Ricerca in corso... ' + received + '/' + total);
+                } else if (msg.type === 'done') {
+                    $('#bulk-match-status').addClass('d-none');
+                }
+            });
+        }).then(function() {
+            $('#bulk-match-status').addClass('d-none');
+        }).catch(function() {
             $('#bulk-match-status').addClass('d-none');
             $('#bulk-match-error').removeClass('d-none').text('Errore durante la ricerca.');
         });
@@ -1675,8 +1747,8 @@ function initWantedUI() {
     });
 
     buildRowIndex();
-    applyFilters();
     syncSelectionToTable();
+    updateBulkState();
 
     table.off('draw.wanted').on('draw.wanted', function() {
         syncSelectionToTable();
@@ -1719,79 +1791,77 @@ function initWantedUI() {
     });
 
     populateImportFilter();
+    updateSortIndicators();
+    watchLoadMore();
 }
 
 document.addEventListener('DOMContentLoaded', function() {
+    var refreshSeq = 0;
+    var searchTimer = null;
+
     function captureWantedState() {
         var state = {
-            search: $('#wanted-title-search').val() || '',
-            type: $('#wanted-type-filter').val() || 'all',
-            importPath: $('#wanted-import-filter').val() || 'all',
-            page: 0,
-            order: [],
-            length: null
+            scrollY: window.scrollY,
+            loaded: 0
         };
         if ($.fn.DataTable.isDataTable('#wanted_table')) {
-            var table = $('#wanted_table').DataTable();
-            state.page = table.page();
-            state.order = table.order();
-            state.length = table.page.len();
+            state.loaded = $('#wanted_table').DataTable().rows().count();
         }
         return state;
     }
 
     function restoreWantedState(state) {
-        if (!state) {
-            return;
+        if (state && state.scrollY) {
+            window.scrollTo(0, state.scrollY);
         }
-        var $search = $('#wanted-title-search');
-        var $type = $('#wanted-type-filter');
-        var $import = $('#wanted-import-filter');
-        if ($search.length) {
-            $search.val(state.search);
-            $search.trigger('input');
-        }
-        if ($type.length) {
-            $type.val(state.type);
-            $type.trigger('change');
-        }
-        if ($import.length) {
-            if ($import.find('option[value="' + state.importPath + '"]').length) {
-                $import.val(state.importPath);
-            } else {
-                $import.val('all');
-            }
-            $import.trigger('change');
+    }
+
+    function loadWantedRowsUntil(count, seq) {
+        // Il server restituisce al massimo 500 righe per richiesta: le altre arrivano a pagine
+        if (!count || seq !== refreshSeq || !wantedLoadMore || !$.fn.DataTable.isDataTable('#wanted_table')) {
+            return Promise.resolve();
         }
-        if ($.fn.DataTable.isDataTable('#wanted_table')) {
-            var table = $('#wanted_table').DataTable();
-            if (state.length) {
-                table.page.len(state.length);
-            }
-            if (state.order && state.order.length) {
-                table.order(state.order);
-            }
-            if (typeof state.page === 'number') {
-                table.page(state.page);
-            }
-            table.draw(false);
+        if ($('#wanted_table').DataTable().rows().count() >= count) {
+            return Promise.resolve();
         }
+        return wantedLoadMore().then(function(added) {
+            if (added) {
+                return loadWantedRowsUntil(count, seq);
+            }
+        });
     }
 
-    function refreshWantedContent() {
+    function refreshWantedContent(resetPosition) {
         var container = document.getElementById('wanted-content');
         var skeleton = document.getElementById('wanted-skeleton');
         if (!container) {
             return Promise.resolve();
         }
-        var savedState = captureWantedState();
-        return fetch('/api/wanted/content')
-            .then(function(resp) { return resp.text(); })
+        // Dopo un'azione ricarica almeno le righe gia' visibili e resta nello stesso punto;
+        // al cambio di filtri/ordinamento riparte dalla prima pagina
+        var savedState = resetPosition ? null : captureWantedState();
+        var params = getWantedQueryParams();
+        if (savedState && savedState.loaded) {
+            params.set('limit', savedState.loaded);
+        }
+        var seq = ++refreshSeq;
+        return fetch('/api/wanted/content?' + params.toString())
+            .then(function(resp) {
+                if (!resp.ok) {
+                    throw new Error('HTTP ' + resp.status);
+                }
+                return resp.text();
+            })
             .then(function(html) {
+                if (seq !== refreshSeq) {
+                    return;
+                }
                 if ($.fn.DataTable.isDataTable('#wanted_table')) {
                     $('#wanted_table').DataTable().destroy();
                 }
                 container.innerHTML = html;
+                // una pagina ancora in arrivo appartiene alla tabella sostituita
+                wantedLoadingMore = null;
                 container.classList.remove('d-none');
                 if (skeleton) {
                     skeleton.style.display = 'none';
@@ -1816,8 +1886,13 @@ document.addEventListener('DOMContentLoaded', function() {
                 $('#select-sonarr-btn').prop('disabled', false);
                 $('#clear-selection-btn').prop('disabled', false);
                 initWantedUI();
-                restoreWantedState(savedState);
-                applyPendingDownloadState();
+                return loadWantedRowsUntil(savedState ? savedState.loaded : 0, seq).then(function() {
+                    if (seq !== refreshSeq) {
+                        return;
+                    }
+                    restoreWantedState(savedState);
+                    applyPendingDownloadState();
+                });
             })
             .catch(function() {
                 if (skeleton) {
@@ -1826,6 +1901,32 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
 
-    window.reloadWantedContent = refreshWantedContent;
-    refreshWantedContent();
+    $('#wanted-title-search').on('input', function() {
+        if (searchTimer) {
+            clearTimeout(searchTimer);
+        }
+        searchTimer = setTimeout(function() {
+            refreshWantedContent(true);
+        }, WANTED_SEARCH_DELAY_MS);
+    });
+
+    $('#wanted-type-filter, #wanted-import-filter').on('change', function() {
+        refreshWantedContent(true);
+    });
+
+    $(document).on('click', '#wanted_table thead th.wanted-sortable', function() {
+        var sort = $(this).data('sort');
+        if (wantedSort.sort === sort) {
+            wantedSort.order = wantedSort.order === 'asc' ? 'desc' : 'asc';
+        } else {
+            wantedSort.sort = sort;
+            wantedSort.order = sort === 'title' ? 'asc' : 'desc';
+        }
+        refreshWantedContent(true);
+    });
+
+    window.reloadWantedContent = function() {
+        return refreshWantedContent(false);
+    };
+    refreshWantedContent(true);
 });
@@ -0,0 +1,105 @@
+"""
+Benchmark of the DDUnlimited page parsers (release ed2k links and list anchors): tag scanner
+against the BeautifulSoup path.
+
+    python tests/bench_ddunlimited.py              # fixtures, generated pages, adversarial input
+    python tests/bench_ddunlimited.py --repeat 10
+
+Every case also checks that both paths return the same result.
+"""
+import argparse
+import html as html_lib
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api import ddunlimited_api  # noqa: E402
+from ddunlimited_pages import list_page, release_page  # noqa: E402
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "ddunlimited"
+
+# Markup non chiuso ripetuto: con una ricerca della chiusura per ogni apertura diventa quadratico.
+# comment/quote/opentag sono quadratici anche in html.parser, quindi lenti in entrambi i percorsi.
+ADVERSARIAL = {
+    "script": "<script>a " * 4000,
+    "style": "<style>a " * 4000,
+    "comment": "<!-- a " * 4000,
+    "quote": '<a x="' * 4000,
+    "opentag": "<div a " * 4000,
+}
+
+
+def _timed(fn, page: str, repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(page)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def _soup_release(page: str) -> list[str]:
+    return ddunlimited_api._extract_ed2k_links_soup(html_lib.unescape(page))
+
+
+def _release_cases() -> list[tuple[str, str]]:
+    cases = []
+    for folder in ("releases", "releases_malformed"):
+        for path in sorted((FIXTURES_DIR / folder).glob("*.html")):
+            cases.append((f"{folder}/{path.stem}", path.read_bytes().decode("utf-8")))
+    for style in ("href", "filearray", "loose"):
+        cases.append((f"generated/{style}-3000", release_page(3000, seed=0, style=style)))
+    for name, markup in ADVERSARIAL.items():
+        cases.append((f"adversarial/{name}", '<div class="postbody"><div class="content">' + markup))
+    return cases
+
+
+def _list_cases() -> list[tuple[str, str]]:
+    cases = []
+    for folder in ("lists", "lists_malformed"):
+        for path in sorted((FIXTURES_DIR / folder).glob("*.html")):
+            cases.append((f"{folder}/{path.stem}", path.read_bytes().decode("utf-8")))
+    for size in (300, 10000):
+        cases.append((f"generated/list-{size}", list_page(size, seed=size)))
+    for name, markup in ADVERSARIAL.items():
+        cases.append((f"adversarial/{name}", "<div>" + markup))
+    return cases
+
+
+def _scan_list(page: str):
+    # Come parse_list_page: la scansione, e BeautifulSoup solo se la scansione rinuncia
+    anchors = ddunlimited_api._scan_list_anchors(page)
+    return anchors if anchors is not None else ddunlimited_api._soup_list_anchors(page)
+
+
+def _run(title: str, cases: list[tuple[str, str]], fast, slow, repeat: int) -> bool:
+    print(f"\n{title}")
+    print(f"{'case':42s} {'scanner':>10s} {'soup':>10s} {'speedup':>8s}  same")
+    ok = True
+    for name, page in cases:
+        runs = 1 if name.startswith("adversarial/") else repeat
+        fast_result, fast_time = _timed(fast, page, runs)
+        slow_result, slow_time = _timed(slow, page, runs)
+        same = fast_result == slow_result
+        ok = ok and same
+        speedup = slow_time / fast_time if fast_time else 0.0
+        print(f"{name:42s} {fast_time * 1000:9.2f}ms {slow_time * 1000:9.2f}ms {speedup:7.1f}x  {'yes' if same else 'NO'}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (the best one is reported)")
+    args = parser.parse_args()
+
+    ok = _run("extract_ed2k_links", _release_cases(), ddunlimited_api.extract_ed2k_links, _soup_release, args.repeat)
+    ok = _run("list anchors", _list_cases(), _scan_list, ddunlimited_api._soup_list_anchors, args.repeat) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
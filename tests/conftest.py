@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# I test importano i moduli dell'app (api, core) dalla root del repository
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
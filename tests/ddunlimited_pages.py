@@ -0,0 +1,163 @@
+"""
+Synthetic DDUnlimited pages for the parser tests and benchmarks.
+
+The pages follow the phpBB 3 markup of the forum (post > postbody > content, signature,
+filearray scripts) with generated names and hashes; they are not saved copies of real topics.
+"""
+import random
+
+HEX = "0123456789ABCDEF"
+
+_RELEASE_HEAD = (
+    '<!DOCTYPE html><html><head><meta charset="utf-8" /><title>Release &amp; info &bull; DDUnlimited</title>'
+    '<script type="text/javascript">var x = "<div>";</script></head><body id="phpbb"><div id="wrap">'
+    '<div class="navbar"><a href="./ucp.php?mode=logout&amp;sid=1">Esci</a></div>'
+)
+
+_RELEASE_FRAGMENTS = [
+    '<div>', '</div>', '<span class="content">', '</span>', '<div class="postbody">', '<p>', '</p>', '<br>', '</br>',
+    '<!-- <div class="content"> -->', '<script>var a="</div>";</script>', '<div class="content"/>', '<b>', '</b>', '</td>',
+    '<a href="ed2k://|file|X{n}.mkv|{s}|{h}|/">x</a>', "<a href='ed2k://|file|Y{n}.avi|{s}|{h}|/'>y</a>",
+    '<a href=ed2k://|file|Z{n}|1|{h}|/>z</a>', 'ed2k://|file|L{n}.mkv|{s}|{h}|h=ABC|/',
+    '<script>filearray1[{n}] = "ed2k://|file|F{n}.mkv|{s}|{h}|/";</script>',
+    '&amp;para; ', 'Tom&amp;Jerry ', '&lt;b&gt; ', '<a href="./viewtopic.php?t=1&amp;p=2">l</a>', 'text ', '\n',
+    '<DIV CLASS="content">', '<HR/>', '<img src="x.png">', '<a  href = "ed2k://|file|S{n}|1|{h}|/">s</a>', '&#124;',
+    '<a href="ed2k://|file|Q{n}|1||/">q</a>', 'ed2k://|file|\\s{n}|1|{h}|/|/', '</ div>', '<!-- ', ' -->',
+    '<script>', '</script>', '<STYLE>.a{}</STYLE >', '<![CDATA[ x ]]>', '<?xml x?>',
+]
+
+
+def _hash(rng: random.Random) -> str:
+    return "".join(rng.choice(HEX) for _ in range(32))
+
+
+def release_page(n: int = 3000, seed: int = 0, style: str = "href") -> str:
+    """A release topic with n ed2k links as href anchors, filearray entries or bare text."""
+    rng = random.Random(seed)
+    links = []
+    for i in range(n):
+        name = f"Serie.S01E{i:04d}.ITA.720p.mkv".replace(".", rng.choice([".", "%20", "."]))
+        link = f"ed2k://|file|{name}|{rng.randint(10**8, 10**9)}|{_hash(rng)}|/"
+        if style == "href":
+            links.append(f'<a href="{link}" class="postlink">{name}</a><br />')
+        elif style == "filearray":
+            links.append(f'<script>filearray1[{i}] = "{link}";</script>')
+        else:
+            links.append(f"{link}<br />")
+    post = (
+        '<div id="p1" class="post bg2"><div class="inner"><div class="postbody"><h3><a href="#p1">Titolo</a></h3>'
+        '<div class="content"><span style="color: red">Info &amp; note</span><br />' + "\n".join(links) +
+        '</div><div class="signature">sig ed2k://|file|sig.mkv|1|ABCDEF0123456789ABCDEF0123456789|/</div></div></div></div>'
+    )
+    reply = (
+        '<div id="p2" class="post bg1"><div class="postbody"><div class="content">grazie! '
+        '<a href="ed2k://|file|other.avi|5|00000000000000000000000000000000|/">x</a></div></div></div>'
+    )
+    return _RELEASE_HEAD + post + reply + '<div class="copyright">&copy; phpBB</div></div></body></html>'
+
+
+def random_release_markup(rng: random.Random) -> str:
+    """Loose mix of post markup, broken tags and ed2k links, for the differential tests."""
+    parts = []
+    for n in range(rng.randint(5, 80)):
+        fragment = rng.choice(_RELEASE_FRAGMENTS)
+        digest = _hash(rng) if rng.random() < 0.75 else ""
+        parts.append(fragment.replace("{n}", str(n)).replace("{s}", str(rng.randint(1, 10**9))).replace("{h}", digest))
+        if rng.random() < 0.1:
+            parts.append('<div class="postbody">')
+        if rng.random() < 0.1:
+            parts.append('<div class="content">')
+    return "".join(parts)
+
+
+_QUALITIES = ["BDRip 720p", "BluRay 1080p", "Blu-Ray", "WEBRip", "WEB-DL", "HDTV", "DVDRip", "DVB", "Mux", "HD", "SD", "rip found", "2160p HDR", ""]
+_LANGUAGES = ["ITA", "ITA ENG", "ITA-JPN", "Ita Eng Jpn", "Italiano", "Inglese", "JAP sub ITA", "ENG", ""]
+_LIST_TITLES = ["Il Padrino", "L'&egrave;ra glaciale", "Tom &amp; Jerry", "Amélie", "Lista extra", "Ran", "Alien³", "C'era una volta"]
+
+
+def list_page(n: int = 10000, seed: int = 1) -> str:
+    """A list topic with n `postlink-local` anchors, info after each one and letter headers."""
+    rng = random.Random(seed)
+    out = [
+        '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Strict//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-strict.dtd">',
+        '<html><head><meta charset="utf-8" /><title>Lista Film A-Z &bull; DDUnlimited</title>',
+        '<script type="text/javascript">// <![CDATA[\nvar a = 1 < 2 && "</div>";\n// ]]></script>',
+        '<style type="text/css">.postbody { color: red; }</style><!-- head end --></head><body id="phpbb">',
+        '<div id="wrap"><ul class="linklist"><li><a href="./index.php">Indice</a> &raquo; <a href="./viewforum.php?f=1">Film</a></li></ul>',
+        '<div id="p1" class="post bg2"><div class="inner"><div class="postbody"><h3><a href="#p1">Lista Film A-Z</a></h3>',
+        '<div class="content"><span style="font-weight: bold">Lista aggiornata</span><br /><br />',
+    ]
+    for i in range(n):
+        topic = 10000 + i
+        title = rng.choice(_LIST_TITLES) + f" {i} ({rng.randint(1950, 2024)})"
+        quality = rng.choice(_QUALITIES)
+        language = rng.choice(_LANGUAGES)
+        info = rng.choice([
+            f" [{quality} - {language}]",
+            f' <span style="color: #0000FF">[{quality}]</span> <span style="color: #008000">{language}</span>',
+            f" - {quality}&nbsp;{language}", "", f" <b>{quality}</b> <i>{language} <u>sub</u></i>", " (x)",
+        ])
+        href = rng.choice([
+            f"./viewtopic.php?f=21&amp;t={topic}", f"viewtopic.php?t={topic}&amp;sid=abc",
+            f"http://ddunlimited.net/viewtopic.php?p=1&amp;t={topic}#p5", f"./viewtopic.php?f=21&amp;t={topic}",
+        ])
+        if rng.random() < 0.02:
+            href = "#top"
+        if rng.random() < 0.02:
+            href = f"./viewtopic.php?f=21&amp;t={topic - 5}"
+        out.append(f'<a href="{href}" class="postlink-local">{title}</a>{info}<br />\n')
+        if rng.random() < 0.05:
+            out.append('<br /><span style="font-size: 150%; line-height: normal">' + rng.choice("ABCD") + '</span><br />\n')
+    out.append('</div><div id="sig1" class="signature"><a href="http://example.com" class="postlink">firma</a></div></div></div></div>')
+    out.append('<div class="copyright">Powered by phpBB &copy; <a href="https://www.phpbb.com/">phpBB</a></div></div></body></html>')
+    return "".join(out)
+
+
+_LIST_CLASSES = [
+    'class="postlink-local"', 'class="postlink postlink-local"', "class='postlink-local x'", 'class=postlink-local',
+    'CLASS="postlink-local"', 'class="postlink"', 'class="Postlink-local"', 'class="postlink-local" class="x"',
+    'class="x" class="postlink-local"', '',
+]
+_LIST_HREFS = [
+    'href="./viewtopic.php?f=1&amp;t={n}"', "href='viewtopic.php?t={n}'", 'href="#t={n}"',
+    'href="http://ddunlimited.net/viewtopic.php?t={n}#p1"', 'href="viewtopic.php?t={m}"', 'href=viewtopic.php?t={n}',
+    'href="./viewforum.php?f={n}"', '', 'href="viewtopic.php?t=%31{n}"', 'HREF="viewtopic.php?t={n}"',
+]
+_LIST_TEXTS = [
+    "Film {n} (2001)", "Tom &amp; Jerry {n}", "L&egrave; {n} 1999", "ab", "Lista {n}", "  Spazi {n}  ", "Ti<b>to</b>lo {n}",
+    "X<br/>Y {n}", "A&nbsp;B {n}", "&#39;Quote&#39; {n}", "C&#150;D {n}",
+]
+_LIST_INFOS = [
+    " [720p ITA]", " <span>BluRay 1080p</span> ENG", " - WEB-DL ita eng jpn", "", " <b>HD <i>Mux</i></b> sub <u>JAP</u>",
+    " <span>x<br>y</span> z", " a </br> b", " Italiano", " DVD Rip Found", " HDTV, DVB", " a < b", " <3 ", " x > y",
+    " BLU RAY", " blu-ray HDR",
+]
+_LIST_MARKUP = [
+    "<div>", "</div>", "<p>", "</p>", "<li>", "</li>", "<span>", "</span>", "<br />", "<br>", "<BR/>", "\n",
+    '<td class="x">', "</td>", '<img src="x.png" />', '<span style="color: #0000FF">', '<div class="content"/>',
+    "</a>", "</b>", "<pre>", "</pre>", "<textarea>", "</textarea>", "&#32;&#10;", " \r\n\t ",
+]
+# Markup per cui la scansione deve passare a BeautifulSoup: raro, perche il resto della pagina resti coperto
+_LIST_RARE = [
+    "AT&T x", "&foo; y", "&#1;", "Am&eacute x", "T<!--c-->X", " <!-- c --> q", " <script>var a='<b>'</script> s",
+    " </ p> t", " <!DOCTYPE x> d", " <?php x ?> p", " <![CDATA[z]]> c", '<span title="a>b">', '<span a"b="c">',
+    '<span b=x"y>', '<div class=x/>', "<a href=x/>", "<span/x>", "<p <b>", "</3", "<!x <b>", "<!-- ", "<script>", "-- >",
+    "<!-- c -->", "<script>x<y</script>", "<STYLE>a</style >", "<?x?>", "<!DOCTYPE x>",
+]
+
+
+def random_list_markup(rng: random.Random) -> str:
+    """Anchors with every class/href/text variant mixed with loose markup, for the differential tests."""
+    parts = []
+    for n in range(rng.randint(1, 40)):
+        if rng.random() < 0.01:
+            parts.append(rng.choice(_LIST_RARE))
+        elif rng.random() < 0.45:
+            attrs = [rng.choice(_LIST_CLASSES), rng.choice(_LIST_HREFS).format(n=n, m=n - rng.randint(1, 3))]
+            rng.shuffle(attrs)
+            close = "" if rng.random() < 0.05 else "</a>"
+            text = rng.choice(_LIST_TEXTS).format(n=n)
+            parts.append(f'<a {" ".join(attr for attr in attrs if attr)}>{text}{close}{rng.choice(_LIST_INFOS)}')
+        else:
+            parts.append(rng.choice(_LIST_MARKUP))
+    return "".join(parts)
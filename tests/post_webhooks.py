@@ -0,0 +1,64 @@
+"""
+Post the Radarr/Sonarr Connect payloads of tests/fixtures/webhooks to a running instance.
+
+    python tests/post_webhooks.py                          # every fixture
+    python tests/post_webhooks.py radarr_download sonarr_test
+    python tests/post_webhooks.py --url http://nas:5000 --token secret
+
+The service comes from the file name prefix (radarr_*, sonarr_*). The token defaults to
+MMC_WEBHOOK_TOKEN. The *_delete fixtures remove the radarr/sonarr external IDs of the
+matching wanted items, as a real delete event would.
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import requests
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "webhooks"
+
+
+def _fixture_paths(names: list[str]) -> list[Path]:
+    if not names:
+        return sorted(FIXTURES_DIR.glob("*.json"))
+    paths = []
+    for name in names:
+        path = FIXTURES_DIR / (name if name.endswith(".json") else f"{name}.json")
+        if not path.exists():
+            raise SystemExit(f"Fixture non trovata: {path}")
+        paths.append(path)
+    return paths
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", nargs="*", help="fixture names (default: all)")
+    parser.add_argument("--url", default="http://localhost:5000", help="base URL of the app")
+    parser.add_argument("--token", default=os.environ.get("MMC_WEBHOOK_TOKEN", ""), help="webhook token")
+    args = parser.parse_args()
+
+    failed = 0
+    for path in _fixture_paths(args.fixtures):
+        service = path.stem.split("_", 1)[0]
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        try:
+            resp = requests.post(
+                f"{args.url.rstrip('/')}/api/webhooks/{service}",
+                params={"token": args.token} if args.token else None,
+                json=payload,
+                timeout=30
+            )
+        except requests.RequestException as exc:
+            print(f"{path.stem}: errore di connessione: {exc}")
+            failed += 1
+            continue
+        print(f"{path.stem}: HTTP {resp.status_code} {resp.text.strip()}")
+        if resp.status_code != 200:
+            failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
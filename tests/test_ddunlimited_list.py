@@ -0,0 +1,121 @@
+"""
+Differential tests for the list page scanner: _scan_list_anchors must return what
+_soup_list_anchors reads from the BeautifulSoup tree (or None), and parse_list_page must
+return the same items on both paths.
+
+The expected JSON files hold the parse_list_page items of the BeautifulSoup path;
+regenerate them with
+    python tests/test_ddunlimited_list.py --update
+"""
+import json
+import random
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api import ddunlimited_api
+from ddunlimited_pages import list_page, random_list_markup
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "ddunlimited"
+CLEAN_PAGES = sorted((FIXTURES_DIR / "lists").glob("*.html"))
+MALFORMED_PAGES = sorted((FIXTURES_DIR / "lists_malformed").glob("*.html"))
+SOURCE = ddunlimited_api.DDUListSource(
+    name="Film A-Z", url="https://ddunlimited.net/viewtopic.php?t=1", media_type="movie", category="Film"
+)
+BASE_URL = "https://ddunlimited.net"
+
+
+def _items(page: str) -> list[dict]:
+    return [asdict(item) for item in ddunlimited_api.parse_list_page(page, SOURCE, BASE_URL)]
+
+
+def _soup_items(page: str) -> list[dict]:
+    original = ddunlimited_api._scan_list_anchors
+    ddunlimited_api._scan_list_anchors = lambda html: None
+    try:
+        return _items(page)
+    finally:
+        ddunlimited_api._scan_list_anchors = original
+
+
+def _read(path: Path) -> tuple[str, list[dict]]:
+    page = path.read_bytes().decode("utf-8")
+    expected = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+    return page, expected
+
+
+def _assert_scan_matches_soup(page: str) -> bool:
+    anchors = ddunlimited_api._scan_list_anchors(page)
+    if anchors is not None:
+        assert anchors == ddunlimited_api._soup_list_anchors(page), page
+    return anchors is not None
+
+
+@pytest.mark.parametrize("path", CLEAN_PAGES + MALFORMED_PAGES, ids=lambda path: f"{path.parent.name}/{path.stem}")
+def test_fixture_matches_golden(path):
+    page, expected = _read(path)
+    assert _soup_items(page) == expected
+    assert _items(page) == expected
+    _assert_scan_matches_soup(page)
+
+
+@pytest.mark.parametrize("path", CLEAN_PAGES, ids=lambda path: path.stem)
+def test_clean_fixture_is_scanned(path):
+    page, _ = _read(path)
+    assert _assert_scan_matches_soup(page)
+
+
+@pytest.mark.parametrize("name", ["unterminated_script", "unterminated_comment", "spaced_end_tag"])
+def test_malformed_fixture_falls_back(name):
+    page, _ = _read(FIXTURES_DIR / "lists_malformed" / f"{name}.html")
+    assert ddunlimited_api._scan_list_anchors(page) is None
+
+
+def test_generated_page_matches_soup():
+    page = list_page(2000, seed=7)
+    assert _assert_scan_matches_soup(page)
+    assert _items(page) == _soup_items(page)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_random_markup_matches_soup(seed):
+    rng = random.Random(seed)
+    scanned = 0
+    for _ in range(300):
+        page = random_list_markup(rng)
+        scanned += _assert_scan_matches_soup(page)
+        assert _items(page) == _soup_items(page), page
+    # Il markup casuale deve passare soprattutto dalla scansione, non solo dal fallback
+    assert scanned > 150
+
+
+@pytest.mark.parametrize("page", [
+    "<div>" + "<script>a " * 8000,
+    "<div>" + "<style>a " * 8000,
+    "<div>" + "<!-- a " * 8000,
+    "<div>" + '<a x="' * 8000,
+    "<div>" + "<div a " * 8000,
+], ids=["script", "style", "comment", "quote", "opentag"])
+def test_unterminated_markup_is_linear(page):
+    # Commenti, script e tag non chiusi: la scansione si ferma al primo, senza riprovare a ogni "<"
+    started = time.perf_counter()
+    assert ddunlimited_api._scan_list_anchors(page) is None
+    assert time.perf_counter() - started < 0.5
+
+
+def _update() -> None:
+    for path in CLEAN_PAGES + MALFORMED_PAGES:
+        expected = _soup_items(path.read_bytes().decode("utf-8"))
+        path.with_suffix(".json").write_text(json.dumps(expected, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"{path.parent.name}/{path.stem}: {len(expected)} item")
+
+
+if __name__ == "__main__":
+    if "--update" in sys.argv:
+        _update()
@@ -0,0 +1,108 @@
+"""
+Golden tests for extract_ed2k_links: the tag scanner must return exactly what the
+BeautifulSoup path returns, on the fixture pages and on generated markup.
+
+The expected JSON files were produced with _extract_ed2k_links_soup; regenerate them with
+    python tests/test_ddunlimited_release.py --update
+"""
+import html as html_lib
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api import ddunlimited_api
+from ddunlimited_pages import random_release_markup, release_page
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "ddunlimited"
+CLEAN_PAGES = sorted((FIXTURES_DIR / "releases").glob("*.html"))
+MALFORMED_PAGES = sorted((FIXTURES_DIR / "releases_malformed").glob("*.html"))
+
+
+def _soup_links(page: str) -> list[str]:
+    return ddunlimited_api._extract_ed2k_links_soup(html_lib.unescape(page))
+
+
+def _read(path: Path) -> tuple[str, list[str]]:
+    page = path.read_bytes().decode("utf-8")
+    expected = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+    return page, expected
+
+
+@pytest.fixture
+def soup_calls(monkeypatch):
+    calls = []
+    original = ddunlimited_api._extract_ed2k_links_soup
+
+    def counting(raw_html):
+        calls.append(raw_html)
+        return original(raw_html)
+
+    monkeypatch.setattr(ddunlimited_api, "_extract_ed2k_links_soup", counting)
+    return calls
+
+
+@pytest.mark.parametrize("path", CLEAN_PAGES + MALFORMED_PAGES, ids=lambda path: f"{path.parent.name}/{path.stem}")
+def test_fixture_matches_golden(path):
+    page, expected = _read(path)
+    assert _soup_links(page) == expected
+    assert ddunlimited_api.extract_ed2k_links(page) == expected
+
+
+@pytest.mark.parametrize("path", CLEAN_PAGES, ids=lambda path: path.stem)
+def test_clean_fixture_skips_soup(path, soup_calls):
+    page, expected = _read(path)
+    assert ddunlimited_api.extract_ed2k_links(page) == expected
+    assert not soup_calls
+
+
+@pytest.mark.parametrize("name", ["stray_end_tag", "unterminated_script", "unterminated_comment"])
+def test_malformed_fixture_falls_back(name, soup_calls):
+    page, expected = _read(FIXTURES_DIR / "releases_malformed" / f"{name}.html")
+    assert ddunlimited_api.extract_ed2k_links(page) == expected
+    assert soup_calls
+
+
+@pytest.mark.parametrize("style", ["href", "filearray", "loose"])
+def test_generated_page_matches_soup(style):
+    page = release_page(300, seed=11, style=style)
+    assert ddunlimited_api.extract_ed2k_links(page) == _soup_links(page)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_random_markup_matches_soup(seed):
+    rng = random.Random(seed)
+    for _ in range(250):
+        page = random_release_markup(rng)
+        assert ddunlimited_api.extract_ed2k_links(page) == _soup_links(page), page
+
+
+@pytest.mark.parametrize("page", [
+    '<div class="postbody"><div class="content">' + "<script>a " * 8000,
+    '<div class="postbody"><div class="content">' + "<style>a " * 8000,
+    '<div class="postbody"><div class="content">' + "<script>a</div>" * 8000,
+], ids=["script", "style", "script_div"])
+def test_unterminated_raw_text_is_linear(page):
+    # Un solo <script> non chiuso non deve rendere la scansione quadratica
+    started = time.perf_counter()
+    ddunlimited_api._post_content_spans(page)
+    assert time.perf_counter() - started < 0.5
+
+
+def _update() -> None:
+    for path in CLEAN_PAGES + MALFORMED_PAGES:
+        page = path.read_bytes().decode("utf-8")
+        expected = _soup_links(page)
+        path.with_suffix(".json").write_text(json.dumps(expected, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"{path.parent.name}/{path.stem}: {len(expected)} link")
+
+
+if __name__ == "__main__":
+    if "--update" in sys.argv:
+        _update()